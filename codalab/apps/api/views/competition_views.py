@@ -609,8 +609,9 @@ class CompetitionSubmissionViewSet(viewsets.ModelViewSet):
         try:
             response = dict()
             lb = webmodels.PhaseLeaderBoard.objects.get(phase=submission.phase)
-            lbe = webmodels.PhaseLeaderBoardEntry.objects.get(board=lb, result=submission)
-            lbe.delete()
+            with webmodels.update_leaderboard(submission.phase):
+                lbe = webmodels.PhaseLeaderBoardEntry.objects.get(board=lb, result=submission)
+                lbe.delete()
             response['status'] = lbe.id
             return Response(response, status=response['status'], content_type="application/json")
         except ObjectDoesNotExist:
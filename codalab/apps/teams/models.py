@@ -111,6 +111,37 @@ def get_user_team(user, competition):
     return team
 
 
+def get_user_teams(participants, competition):
+    """
+    Bulk version of `get_user_team` for the participants of a competition.
+
+    :return: Dictionary mapping the id of each participant to its team, or None.
+    """
+    user_ids = set(participant.user_id for participant in participants)
+    teams = {}
+    created_teams = Team.objects.filter(
+        competition=competition,
+        status__codename="approved",
+        creator__in=user_ids,
+    ).order_by('pk')
+    for team in created_teams:
+        teams.setdefault(team.creator_id, team)
+
+    member_ids = user_ids - set(teams)
+    if len(member_ids) > 0:
+        memberships = TeamMembership.objects.filter(
+            user__in=member_ids,
+            team__competition=competition,
+            team__status__codename="approved",
+            status__codename="approved",
+        ).select_related('team').order_by('pk')
+        for membership in memberships:
+            if membership.is_active:
+                teams[membership.user_id] = membership.team
+
+    return {participant.pk: teams.get(participant.user_id) for participant in participants}
+
+
 def get_team_submissions(team, phase=None):
     if phase is None:
         t_s = web.models.CompetitionSubmission.objects.filter(phase=phase, team=team)
@@ -80,5 +80,6 @@ admin.site.register(models.Page, PageAdmin)
 
 admin.site.register(models.OrganizerDataSet)
 admin.site.register(models.CompetitionSubmission)
+admin.site.register(models.SubmissionQuota)
 admin.site.register(models.CompetitionSubmissionMetadata)
 admin.site.register(models.CompetitionDefBundle)
@@ -91,6 +91,11 @@ class CompetitionPhaseForm(forms.ModelForm):
             'scoring_program_docker_image',
             'default_docker_image',
             'disable_custom_docker_image',
+            'warm_scoring_container',
+            'scoring_program_uses_scores',
+            'scoring_program_uses_history',
+            'scoring_program_uses_coopetition',
+            'memoize_results',
         )
         widgets = {
             'leaderboard_management_mode' : forms.Select(
@@ -123,6 +128,14 @@ class CompetitionPhaseForm(forms.ModelForm):
 
         return self.cleaned_data["scoring_program_organizer_dataset"]
 
+    def clean_memoize_results(self):
+        # Scores depending on other submissions can't be reused
+        if self.cleaned_data["memoize_results"] and any(self.cleaned_data.get("scoring_program_uses_%s" % name)
+                                                        for name in models.AUXILIARY_INPUTS):
+            raise forms.ValidationError("Scores can only be reused when the scoring program reads none of the "
+                                        "leaderboard scores, the submission history and the coopetition data")
+        return self.cleaned_data["memoize_results"]
+
 
 class PageForm(forms.ModelForm):
     class Meta:
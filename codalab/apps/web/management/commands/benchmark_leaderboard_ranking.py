@@ -0,0 +1,106 @@
+import random
+import time
+
+from decimal import Decimal
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.web.models import CompetitionPhase
+from apps.web.ranking import LeaderboardRanking, MatrixRanking, numpy
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the leaderboard ranking engines on a synthetic phase."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--submissions',
+                    dest='submissions',
+                    type='int',
+                    default=10000,
+                    help="Number of submissions on the leaderboard"),
+        make_option('--scoredefs',
+                    dest='scoredefs',
+                    type='int',
+                    default=20,
+                    help="Number of score columns, the last fifth are computed averages"),
+        make_option('--repeat',
+                    dest='repeat',
+                    type='int',
+                    default=3,
+                    help="Number of runs per engine, the best one is reported"),
+    )
+
+    def handle(self, *args, **options):
+        if options['submissions'] < 1 or options['scoredefs'] < 2:
+            raise CommandError("Need at least one submission and two score columns")
+        rng = random.Random(0)
+        ids = range(1, options['submissions'] + 1)
+        computed_count = max(1, options['scoredefs'] // 5)
+        scoredefs = {sdef_id: sdef_id % 2 == 0 for sdef_id in range(1, options['scoredefs'] - computed_count + 1)}
+        computed_deps = {}
+        for sdef_id in range(len(scoredefs) + 1, options['scoredefs'] + 1):
+            computed_deps[sdef_id] = (True, rng.sample(scoredefs.keys(), min(3, len(scoredefs))))
+        values = {}
+        for sdef_id in scoredefs:
+            # Scores come out of the database as decimals, with plenty of ties and a few missing values
+            values[sdef_id] = {id: Decimal(rng.randint(0, 100000)) / 1000 for id in ids if rng.random() > 0.05}
+        formats = {sdef_id: str(sdef_id % 5) for sdef_id in scoredefs.keys() + computed_deps.keys()}
+
+        engines = [('rank_values (previous)', self._rank_legacy),
+                   ('LeaderboardRanking', self._rank_engine(LeaderboardRanking))]
+        if numpy is not None:
+            engines.append(('MatrixRanking (numpy)', self._rank_engine(MatrixRanking)))
+        else:
+            self.stdout.write("numpy is not installed, skipping MatrixRanking")
+
+        self.stdout.write("%d submissions x %d scoredefs (%d computed)" % (
+            len(ids), options['scoredefs'], len(computed_deps)))
+        baseline = None
+        for name, rank in engines:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.time()
+                rank(ids, scoredefs, computed_deps, values, formats)
+                timings.append(time.time() - start)
+            best = min(timings)
+            baseline = baseline or best
+            self.stdout.write("%-24s %8.3fs  x%.1f" % (name, best, baseline / best))
+
+    @staticmethod
+    def _rank_legacy(ids, scoredefs, computed_deps, values, formats):
+        """ The ranking and formatting loops of CompetitionPhase.scores before the ranking engines. """
+        ranks = {}
+        for sdef_id, v in values.iteritems():
+            ranks[sdef_id] = CompetitionPhase.rank_values(ids, v, sort_ascending=scoredefs[sdef_id])
+        all_values = dict(values)
+        for sdef_id, (sort_ascending, deps) in computed_deps.iteritems():
+            computed_values = {}
+            for id in ids:
+                computed_values[id] = sum([ranks[d][id] for d in deps]) / float(len(deps))
+            all_values[sdef_id] = computed_values
+            ranks[sdef_id] = CompetitionPhase.rank_values(ids, computed_values, sort_ascending=sort_ascending)
+        rows = {id: [] for id in ids}
+        for sdef_id, sdef_values in all_values.iteritems():
+            for id in ids:
+                v = "-"
+                if id in sdef_values:
+                    v = CompetitionPhase.format_value(sdef_values[id], formats[sdef_id])
+                rows[id].append({'val': v, 'rnk': ranks[sdef_id].get(id, "-")})
+        overall_ranks = ranks[max(computed_deps)]
+        return sorted(ids, cmp=CompetitionPhase.rank_submissions(overall_ranks)), rows
+
+    @staticmethod
+    def _rank_engine(engine):
+        """ The ranking and formatting done by CompetitionPhase.compute_scores with the given engine. """
+        def rank(ids, scoredefs, computed_deps, values, formats):
+            ranking = engine(ids, scoredefs, computed_deps, values)
+            rows = {id: [] for id in ids}
+            for sdef_id in values.keys() + computed_deps.keys():
+                sdef_ranks = ranking.ranks(sdef_id)
+                sdef_values = ranking.formatted_values(sdef_id, CompetitionPhase.value_digits(formats[sdef_id]))
+                for id in ids:
+                    rows[id].append({'val': sdef_values.get(id, "-"), 'rnk': sdef_ranks.get(id, "-")})
+            overall_ranks = ranking.ranks(max(computed_deps))
+            return sorted(ids, key=overall_ranks.get), rows
+        return rank
@@ -0,0 +1,103 @@
+import datetime
+import time
+
+from optparse import make_option
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from apps.web.tasks import _make_urls_sassy
+from codalab.azure_storage import (AccessPolicy,
+                                   BlobService,
+                                   SharedAccessPolicy,
+                                   SharedAccessSignature,
+                                   get_blob_sas_signer)
+
+
+ACCOUNT_NAME = 'benchmark'
+ACCOUNT_KEY = 'YmVuY2htYXJrLWtleQ=='
+CONTAINER = 'bundles'
+
+
+class Command(BaseCommand):
+    help = "Benchmarks signing the blob URLs of submission dispatches, with a synthetic Azure account."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--submissions',
+                    dest='submissions',
+                    type='int',
+                    default=1000,
+                    help="Number of dispatched submissions"),
+        make_option('--repeat',
+                    dest='repeat',
+                    type='int',
+                    default=3,
+                    help="Number of runs per strategy, the best one is reported"),
+    )
+
+    def handle(self, *args, **options):
+        if options['submissions'] < 1:
+            raise CommandError("Need at least one submission")
+        # Per submission: the scoring program and reference data shared by the phase, the read-only inputs and
+        # the write-only outputs of the submission
+        dispatches = []
+        for number in range(options['submissions']):
+            dispatches.append((
+                ['phase/program.zip', 'phase/reference.zip'],
+                ['%d/%s' % (number, name) for name in ('res.zip', 'history.txt', 'scores.txt', 'input.txt',
+                                                       'run.txt')],
+                ['%d/%s' % (number, name) for name in ('stdout.txt', 'stderr.txt', 'output.zip',
+                                                       'private_output.zip', 'detailed_results.zip')],
+            ))
+        strategies = [('make_blob_sas_url (previous)', self._sign_legacy),
+                      ('BlobSasSigner, one by one', self._sign_one_by_one),
+                      ('_make_urls_sassy', self._sign_batched)]
+
+        self.stdout.write("%d submissions, %d URLs each, %s cache" % (
+            len(dispatches), sum(len(d) for d in dispatches[0]), cache.__class__.__name__))
+        baseline = None
+        with override_settings(USE_AWS=False,
+                               BUNDLE_AZURE_ACCOUNT_NAME=ACCOUNT_NAME,
+                               BUNDLE_AZURE_ACCOUNT_KEY=ACCOUNT_KEY,
+                               BUNDLE_AZURE_CONTAINER=CONTAINER):
+            for name, sign in strategies:
+                timings = []
+                for _ in range(options['repeat']):
+                    cache.clear()
+                    start = time.time()
+                    for dispatch in dispatches:
+                        sign(*dispatch)
+                    timings.append(time.time() - start)
+                best = min(timings)
+                baseline = baseline or best
+                self.stdout.write("%-30s %8.3fs  x%.1f" % (name, best, baseline / best))
+
+    @staticmethod
+    def _sign_legacy(immutable, readable, writable):
+        """ make_blob_sas_url before BlobSasSigner: new clients and a new policy for every URL. """
+        for blob_names, permission in ((immutable + readable, 'r'), (writable, 'w')):
+            for blob_name in blob_names:
+                sas = SharedAccessSignature(ACCOUNT_NAME, ACCOUNT_KEY)
+                start = datetime.datetime.utcnow() - datetime.timedelta(minutes=5)
+                expiry = start + datetime.timedelta(minutes=60 * 60 * 24)
+                sap = SharedAccessPolicy(AccessPolicy(
+                    start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    expiry.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    permission))
+                sas_token = sas.generate_signed_query_string('%s/%s' % (CONTAINER, blob_name), 'b', sap)
+                BlobService(ACCOUNT_NAME, ACCOUNT_KEY).make_blob_url(container_name=CONTAINER, blob_name=blob_name,
+                                                                     sas_token=sas_token)
+
+    @staticmethod
+    def _sign_one_by_one(immutable, readable, writable):
+        signer = get_blob_sas_signer(ACCOUNT_NAME, ACCOUNT_KEY)
+        for blob_names, permission in ((immutable + readable, 'r'), (writable, 'w')):
+            for blob_name in blob_names:
+                signer.sign(CONTAINER, [blob_name], permission=permission, duration=60 * 60 * 24)
+
+    @staticmethod
+    def _sign_batched(immutable, readable, writable):
+        _make_urls_sassy(immutable, immutable=True)
+        _make_urls_sassy(readable)
+        _make_urls_sassy(writable, permission='w')
@@ -0,0 +1,97 @@
+import time
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+
+from apps.web.management.commands.random_competitions import create_random_competition, get_or_create_user
+from apps.web.models import ParticipantStatus
+
+
+def hot_view_urls(competition):
+    """
+    Returns (name, url) pairs for the views that are requested the most, for the first phase of a competition.
+    """
+    phase = competition.phases.all()[0]
+    return [
+        ('CompetitionDetailView', reverse('competitions:view', kwargs={'pk': competition.pk})),
+        ('CompetitionResultsPage', reverse('competitions:competition_results_page',
+                                           kwargs={'id': competition.pk, 'phase': phase.pk})),
+        ('MyCompetitionSubmissionsPage', reverse('my_competition_submissions',
+                                                 kwargs={'competition_id': competition.pk}) + '?phase=%d' % phase.pk),
+        ('MyCompetitionParticipantView', reverse('my_competition_participants',
+                                                 kwargs={'competition_id': competition.pk})),
+        ('CompetitionCompleteResultsDownload', reverse('competitions:competition_results_complete_download',
+                                                       kwargs={'id': competition.pk, 'phase': phase.pk})),
+        ('LeaderBoardDataViewSet', reverse('api_phase_leaderboarddata',
+                                           kwargs={'competition_id': competition.pk, 'phase_id': phase.phasenumber})),
+    ]
+
+
+def measure_view(client, url):
+    """
+    Requests a view and reads the whole response.
+
+    :return: (number of SQL queries, wall time in seconds, status code)
+    """
+    start = time.time()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+        if response.streaming:
+            ''.join(response.streaming_content)
+        else:
+            response.content
+    return len(context.captured_queries), time.time() - start, response.status_code
+
+
+class Command(BaseCommand):
+    help = "Records SQL query counts and wall time of the hot views on competitions of growing size."
+
+    option_list = BaseCommand.option_list + (
+        make_option('--sizes',
+                    dest='sizes',
+                    default='2,10,50',
+                    help="Comma separated numbers of participants of the seeded competitions"),
+        make_option('--submission_count',
+                    dest='submission_count',
+                    type='int',
+                    default=2,
+                    help="Number of scored submissions per participant"),
+    )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        creator = get_or_create_user('benchmark_organizer', 'benchmark_organizer@test.com')
+        client = Client()
+        if not client.login(username=creator.username, password='testing'):
+            raise CommandError("Could not log in as %s" % creator.username)
+
+        # The site wide configuration is created and cached on the first request, keep it out of the counts
+        warm_up = create_random_competition(creator, 'Benchmark warm up', 'benchmark_participant', 1,
+                                            participant_status=ParticipantStatus.APPROVED, submission_count=1)
+        for _, url in hot_view_urls(warm_up):
+            measure_view(client, url)
+
+        query_counts = {}
+        self.stdout.write("%-36s %12s %8s %8s %10s %10s" % ('view', 'participants', 'status', 'queries',
+                                                             'cold (s)', 'warm (s)'))
+        for size in sizes:
+            competition = create_random_competition(creator,
+                                                    'Benchmark %d' % size,
+                                                    'benchmark_participant',
+                                                    size,
+                                                    participant_status=ParticipantStatus.APPROVED,
+                                                    submission_count=options['submission_count'])
+            for name, url in hot_view_urls(competition):
+                queries, cold, status_code = measure_view(client, url)
+                _, warm, _ = measure_view(client, url)
+                query_counts.setdefault(name, []).append(queries)
+                self.stdout.write("%-36s %12d %8d %8d %10.3f %10.3f" % (name, size, status_code, queries, cold, warm))
+
+        growing = [name for name, counts in query_counts.iteritems() if len(set(counts)) > 1]
+        if growing:
+            raise CommandError("Query counts grow with competition size for: %s" % ', '.join(sorted(growing)))
@@ -1,15 +1,151 @@
 from django.core.management.base import BaseCommand
-from django.utils.text import slugify
-from django.contrib.auth.models import User
-from apps.web.models import Competition, CompetitionPhase, CompetitionDataset, CompetitionParticipant, ExternalFile, ExternalFileType, ParticipantStatus
+from django.contrib.auth import get_user_model
+from apps.web.models import (add_submission_to_leaderboard,
+                             invalidate_leaderboards,
+                             Competition,
+                             CompetitionPhase,
+                             CompetitionParticipant,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             ParticipantStatus,
+                             SubmissionComputedScore,
+                             SubmissionComputedScoreField,
+                             SubmissionResultGroup,
+                             SubmissionResultGroupPhase,
+                             SubmissionScore,
+                             SubmissionScoreDef,
+                             SubmissionScoreDefGroup,
+                             SubmissionScoreSet)
 
 from optparse import make_option
 
 import datetime
+import random
 
 import pytz
 
 
+User = get_user_model()
+
+
+def get_or_create_user(username, email):
+    """
+    Returns the user with the given username, creating it with the password 'testing' if it does not exist.
+    """
+    user, created = User.objects.get_or_create(username=username, defaults={'email': email})
+    if created:
+        user.set_password('testing')
+        user.save()
+    return user
+
+
+def create_leaderboard(competition, phases):
+    """
+    Creates a leaderboard with two scores and their average rank for the given phases.
+
+    :return: The non computed score definitions.
+    """
+    group = SubmissionResultGroup.objects.create(competition=competition, key='results', label='Results')
+    for phase in phases:
+        SubmissionResultGroupPhase.objects.create(group=group, phase=phase)
+    scoredefs = []
+    for ordering, (key, sorting) in enumerate([('accuracy', 'desc'), ('error', 'asc'), ('avg', 'asc')]):
+        scoredef = SubmissionScoreDef.objects.create(
+            competition=competition,
+            key=key,
+            label=key.title(),
+            sorting=sorting,
+            computed=key == 'avg',
+            show_rank=True,
+            selection_default=1 if key == 'avg' else 0,
+            ordering=ordering + 1
+        )
+        SubmissionScoreDefGroup.objects.create(scoredef=scoredef, group=group)
+        SubmissionScoreSet.objects.create(competition=competition, key=key, label=key.title(), scoredef=scoredef)
+        scoredefs.append(scoredef)
+    computed = SubmissionComputedScore.objects.create(scoredef=scoredefs[-1], operation='Avg')
+    for scoredef in scoredefs[:-1]:
+        SubmissionComputedScoreField.objects.create(computed=computed, scoredef=scoredef)
+    return scoredefs[:-1]
+
+
+def create_submissions(phase, participants, scoredefs, submission_count):
+    """
+    Creates finished and scored submissions for each participant, the first one of each participant is
+    put on the leaderboard.
+    """
+    finished, _ = CompetitionSubmissionStatus.objects.get_or_create(
+        codename=CompetitionSubmissionStatus.FINISHED,
+        defaults={'name': 'Finished'}
+    )
+    submissions = []
+    for participant in participants:
+        for number in range(submission_count):
+            submission = CompetitionSubmission(
+                participant=participant,
+                phase=phase,
+                submission_number=number + 1,
+                readable_filename='submission_%d.zip' % (number + 1),
+                description='Random submission %d' % (number + 1)
+            )
+            submission.save(ignore_submission_limits=True)
+            submissions.append(submission)
+    # New submissions are saved as submitting, finish them all with a single update
+    CompetitionSubmission.objects.filter(pk__in=[s.pk for s in submissions]).update(status=finished)
+    invalidate_leaderboards(phase=phase)
+
+    for submission in submissions:
+        for scoredef in scoredefs:
+            SubmissionScore.objects.create(result=submission, scoredef=scoredef, value=random.randint(0, 1000) / 1000.0)
+        if submission.submission_number == 1:
+            add_submission_to_leaderboard(submission)
+    return submissions
+
+
+def create_random_competition(creator, title, participant_prefix, participant_count,
+                              participant_status=ParticipantStatus.PENDING, submission_count=0):
+    """
+    Creates a competition with two phases, participants and, when submission_count is positive, a
+    leaderboard with scored submissions in the first phase.
+    """
+    competition = Competition.objects.create(title=title,
+                                             description="This is the description for competition %s" % title,
+                                             creator=creator,
+                                             modified_by=creator)
+    pstatus, _ = ParticipantStatus.objects.get_or_create(codename=participant_status,
+                                                         defaults={'name': participant_status.title()})
+    participants = []
+    for i in range(1, participant_count + 1):
+        pname = "%s%d" % (participant_prefix, i)
+        pu = get_or_create_user(pname, "%s@test.com" % pname)
+
+        part, cr = CompetitionParticipant.objects.get_or_create(
+            competition=competition,
+            user=pu,
+            defaults={
+                'status': pstatus})
+        if cr:
+            part.status = pstatus
+            part.save()
+        participants.append(part)
+
+    delta = datetime.timedelta(days=0)
+    phases = []
+    for i in range(1, 3):
+        start_date = datetime.datetime.now(pytz.utc) + delta
+        phases.append(CompetitionPhase.objects.create(competition=competition,
+                                                      phasenumber=i,
+                                                      label="Phase %d" % i,
+                                                      start_date=start_date,
+                                                      max_submissions=max(4, submission_count)))
+        delta = datetime.timedelta(days=10)
+
+    if submission_count > 0:
+        scoredefs = create_leaderboard(competition, phases)
+        create_submissions(phases[0], participants, scoredefs, submission_count)
+    return competition
+
+
 class Command(BaseCommand):
     help = "Creates test competition."
 
@@ -39,7 +175,12 @@ class Command(BaseCommand):
                     dest='participant_status',
                     default=ParticipantStatus.PENDING,
                     help="The initial status of the created participants"
-                    )
+                    ),
+        make_option('--submission_count',
+                    dest='submission_count',
+                    type='int',
+                    default=0,
+                    help="Number of scored submissions per participant in the first phase."),
     )
 
     def handle(self, *args, **options):
@@ -53,54 +194,9 @@ class Command(BaseCommand):
                 u.save()
                 print "Pasword for user is: testing"
             competition_name = "%s %d" % (options['name'], count)
-            c = Competition.objects.create(title=competition_name,
-                                           description="This is the description for competition %s" % options[
-                                               'name'],
-                                           creator=u,
-                                           modified_by=u)
-            pstatus = ParticipantStatus.objects.get(
-                codename=options['participant_status'])
-            for i in range(1, options['participant_count'] + 1):
-                pname = "%s%d" % (
-                    options['participant'], options['participant_count'])
-
-                pu, cr = User.objects.get_or_create(username=pname,
-                                                    email="%s@test.com" % pname)
-                if cr:
-                    pu.set_password('testing')
-                    pu.save()
-
-                part, cr = CompetitionParticipant.objects.get_or_create(
-                    competition=c,
-                    user=pu,
-                    defaults={
-                        'status': pstatus})
-                if cr:
-                    part.status = pstatus
-                    part.save()
-
-            delta = datetime.timedelta(days=0)
-            ftype = ExternalFileType.objects.get(codename='test')
-
-            for i in range(1, 3):
-
-                start_date = datetime.datetime.now(pytz.utc) + delta
-
-                f = ExternalFile.objects.create(type=ftype,
-                                                source_url="http://test.com/test/%s" % slugify("%s%d" %
-                                                                                               (unicode(competition_name), i)),
-                                                source_address_info="SPECIFIC_INFO",
-                                                creator=u)
-
-                d = CompetitionDataset.objects.create(competition=c,
-                                                      number=i,
-                                                      datafile=f)
-
-                CompetitionPhase.objects.create(competition=c,
-                                                phasenumber=i,
-                                                label="Phase %d" % i,
-                                                start_date=start_date,
-                                                max_submissions=4,
-                                                dataset=d)
-
-                delta = datetime.timedelta(days=10)
+            create_random_competition(u,
+                                      competition_name,
+                                      options['participant'],
+                                      options['participant_count'],
+                                      participant_status=options['participant_status'],
+                                      submission_count=options['submission_count'])
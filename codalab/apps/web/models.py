@@ -6,12 +6,13 @@ import json
 import logging
 import operator
 import os
-import StringIO
+import re
 import urllib
 import uuid
 import yaml
 import zipfile
 
+from contextlib import contextmanager
 from os.path import split
 
 from django.conf import settings
@@ -26,7 +27,7 @@ from django.db import IntegrityError
 from django.db import models
 from django.db import transaction
 from django.db.models import Max
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.utils.dateparse import parse_datetime
 from django.utils.timezone import now
 
@@ -39,10 +40,11 @@ from django.utils.functional import cached_property
 from s3direct.fields import S3DirectField
 
 from apps.forums.models import Forum
-from apps.coopetitions.models import DownloadRecord
+from apps.coopetitions.models import Dislike, DownloadRecord, Like
 from apps.authenz.models import ClUser
-from apps.web.utils import PublicStorage, BundleStorage
-from apps.teams.models import Team, get_user_team
+from apps.web.ranking import LeaderboardRanking, leaderboard_ranking
+from apps.web.utils import PublicStorage, BundleStorage, Echo
+from apps.teams.models import Team, get_user_team, get_user_teams
 
 
 User = settings.AUTH_USER_MODEL
@@ -251,6 +253,11 @@ class Competition(models.Model):
     enable_teams = models.BooleanField(default=True, verbose_name="Enable Competition level teams")
     require_team_approval = models.BooleanField(default=True, verbose_name="Organizers need to approve the new teams")
     teams = models.ManyToManyField(Team, related_name='competition_teams', blank=True, null=True)
+    # Coopetition data shared by the submissions of the competition, rebuilt when it gets stale
+    coopetition_file = models.FileField(upload_to=_uuidify('competition_coopetition'), storage=BundleStorage,
+                                        null=True, blank=True)
+    coopetition_version = models.PositiveIntegerField(default=0)
+    coopetition_built_key = models.CharField(max_length=40, default='', blank=True)
 
     @property
     def pagecontent(self):
@@ -281,11 +288,18 @@ class Competition(models.Model):
         if len(phases) > 0:
             self.start_date = phases[0].start_date.replace(tzinfo=None)
 
+        # The end date of the last phase is the one of the competition
+        self.__dict__.pop('phase_timeline', None)
+
         # Do the real save
         # cache bust TODO.
         # cache.set("c(id)_one at a time", None, 30)
         return super(Competition, self).save(*args, **kwargs)
 
+    @cached_property
+    def phase_timeline(self):
+        return PhaseTimeline(self)
+
     @cached_property
     def image_url(self):
         # Return the transformed image_url
@@ -317,24 +331,9 @@ class Competition(models.Model):
             logger.info("Checking for migrations on competition pk=%s, but it is already being migrated" % self.pk)
             return
 
-        current_phase = None
-        next_phase = None
-
-        phases = self.phases.all()
-        if len(phases) == 0:
-            return
-
-        last_phase = phases.reverse()[0]
-
-        for index, phase in enumerate(phases):
-            # Checking for active phase
-            if phase.is_active:
-                current_phase = phase
-                # Checking if active phase is less than last phase
-                if current_phase.phasenumber < last_phase.phasenumber:
-                    # Getting next phase
-                    next_phase = phases[index + 1]
-                break
+        timeline = self.phase_timeline
+        current_phase = timeline.current_phase()
+        next_phase = timeline.next_phase(current_phase) if current_phase is not None else None
 
         # Making sure current_phase or next_phase is not None
         if current_phase is None or next_phase is None:
@@ -376,35 +375,29 @@ class Competition(models.Model):
         self.save()
 
         try:
-            submissions = []
             leader_board = PhaseLeaderBoard.objects.get(phase=current_phase)
 
-            leader_board_entries = PhaseLeaderBoardEntry.objects.filter(board=leader_board)
-            for submission in leader_board_entries:
-                submissions.append(submission.result)
+            leader_board_entries = PhaseLeaderBoardEntry.objects.filter(
+                board=leader_board
+            ).select_related('result__participant').order_by('pk')
 
             participants = {}
 
-            for s in submissions:
-                if s.is_migrated is False:
-                    participants[s.participant] = s
-
-            from tasks import evaluate_submission
-
-            for participant, submission in participants.items():
-                logger.info('Moving submission %s over' % submission)
-
-                new_submission = CompetitionSubmission(
-                    participant=participant,
-                    file=submission.file,
-                    phase=next_phase
-                )
-                new_submission.save(ignore_submission_limits=True)
-
-                submission.is_migrated = True
-                submission.save()
-
-                evaluate_submission.apply_async((new_submission.pk, current_phase.is_scoring_only))
+            for entry in leader_board_entries:
+                if entry.result.is_migrated is False:
+                    participants[entry.result.participant_id] = entry.result
+
+            submissions = participants.values()
+            logger.info('Moving %s submissions of competition pk=%s over' % (len(submissions), self.pk))
+            new_submission_pks = copy_submissions(submissions, next_phase)
+            migrated_pks = [submission.pk for submission in submissions]
+            for start in range(0, len(migrated_pks), SUBMISSION_BULK_BATCH_SIZE):
+                CompetitionSubmission.objects.filter(
+                    pk__in=migrated_pks[start:start + SUBMISSION_BULK_BATCH_SIZE]
+                ).update(is_migrated=True)
+
+            from tasks import start_evaluations
+            start_evaluations(new_submission_pks, current_phase.is_scoring_only, phase_pk=next_phase.pk)
         except PhaseLeaderBoard.DoesNotExist:
             pass
 
@@ -426,15 +419,28 @@ class Competition(models.Model):
         :param include_scores_not_on_leaderboard: Flag to includes scores that are not part of leaderboard.
         :return: csv file.
 
+        """
+        return ''.join(self.iter_results_csv(phase_pk,
+                                             include_scores_not_on_leaderboard=include_scores_not_on_leaderboard,
+                                             request=request))
+
+    def iter_results_csv(self, phase_pk, include_scores_not_on_leaderboard=False, request=None):
+        """
+        Same as `get_results_csv` but yields the csv file line by line.
         """
         phase = self.phases.get(pk=phase_pk)
         if phase.is_blind:
-            return 'Not allowed, phase is blind.'
+            yield 'Not allowed, phase is blind.'
+            return
 
         groups = phase.scores(include_scores_not_on_leaderboard=include_scores_not_on_leaderboard)
 
-        csvfile = StringIO.StringIO()
-        csvwriter = csv.writer(csvfile)
+        show_usernames = not self.anonymous_leaderboard
+        if not show_usernames and request is not None:
+            show_usernames = self.creator.username == request.user.username or \
+                self.admins.filter(pk=request.user.pk).exists()
+
+        csvwriter = csv.writer(Echo())
 
         for group in groups:
             headers = ["User"]
@@ -455,23 +461,19 @@ class Competition(models.Model):
                         sub_headers.append(sub['label'])
                 else:
                     headers.append(header['label'])
-            csvwriter.writerow(['submission_pk',] + headers)
+            yield csvwriter.writerow(['submission_pk',] + headers)
             if sub_headers != ['']:
-                csvwriter.writerow(sub_headers)
+                yield csvwriter.writerow(sub_headers)
 
             try:
                 if len(group['scores']) <= 0:
-                    csvwriter.writerow(["No data available"])
+                    yield csvwriter.writerow(["No data available"])
                 else:
                     for pk, scores in group['scores']:
-                        if phase.competition.anonymous_leaderboard:
-                            if phase.competition.creator.username == request.user.username or \
-                            request.user in phase.competition.admins.all():
-                                row = [scores['username']] + ([''] * (len(ordering) + 1)) # Appending list
-                            else:
-                                row = ['Anonymous'] + ([''] * (len(ordering) + 1)) # Appending list
-                        else:
+                        if show_usernames:
                             row = [scores['username']] + ([''] * (len(ordering) + 1)) # Appending list
+                        else:
+                            row = ['Anonymous'] + ([''] * (len(ordering) + 1)) # Appending list
                         for v in scores['values']:
                             if 'rnk' in v:
                                 # Based on the header label insert the score into the proper column
@@ -479,13 +481,11 @@ class Competition(models.Model):
                                 row[ordering[v['name']] + 1] = "%s (%s)" % (v['val'], v['rnk'])
                             else:
                                 row[ordering[v['name']] + 1] = "%s (%s)" % (v['val'], v['hidden_rnk'])
-                        csvwriter.writerow([scores['id'],] + row)
-            except:
-                csvwriter.writerow(["Exception parsing scores!"])
+                        yield csvwriter.writerow([scores['id'],] + row)
+            except Exception:
+                yield csvwriter.writerow(["Exception parsing scores!"])
                 logger.error("Error parsing scores for competition PK=%s" % self.pk)
 
-        return csvfile.getvalue()
-
     def get_score_headers(self):
         """
         Gets the label for Leaderboard columns
@@ -502,32 +502,14 @@ class Competition(models.Model):
         """
         Returns top three in leaderboard
         """
-        current_phase = None
-        next_phase = None
-        phases = self.phases.all()
-        if len(phases) == 0:
+        timeline = self.phase_timeline
+        if len(timeline.phases) == 0:
             return
 
-        last_phase = phases.reverse()[0]
-
-        for index, phase in enumerate(phases):
-            # Checking for active phase
-            if phase.is_active:
-                current_phase = phase
-                # Checking if active phase is less than last phase
-                if current_phase.phasenumber < last_phase.phasenumber:
-                    # Getting next phase
-                    next_phase = phases[index + 1]
-                break
-
+        current_phase = timeline.current_phase()
         if current_phase is not None:
             local_scores = current_phase.scores()
-
-            for group in local_scores:
-                for _, scoredata in group['scores']:
-                    sub = CompetitionSubmission.objects.get(pk=scoredata['id'])
-                    scoredata['date'] = sub.submitted_at
-                    scoredata['count'] = sub.phase.submissions.filter(participant=sub.participant).count()
+            current_phase.add_submission_details(local_scores)
 
             top_three = []
 
@@ -612,6 +594,32 @@ def phase_data_prefix(phase):
 # choose to not use it. See FileField.upload_to at https://docs.djangoproject.com/en/dev/ref/models/fields/.
 
 
+# Inputs the site can add to the input folder of scoring programs, next to the reference data and the results
+AUXILIARY_INPUTS = ('scores', 'history', 'coopetition')
+
+
+def scoring_program_auxiliary_inputs(program_file, max_file_size=1024 * 1024):
+    """
+    Returns the auxiliary inputs a scoring program seems to refer to, found by looking for their folder names in
+    the files of the program. Files larger than max_file_size are skipped, unreadable programs get all of them.
+    This is a guess which can miss inputs, it is only used to suggest flags to the organizer.
+
+    program_file: File like object of the scoring program bundle.
+    """
+    try:
+        program_zip = zipfile.ZipFile(program_file)
+        members = [program_zip.read(info) for info in program_zip.infolist() if info.file_size <= max_file_size]
+    except zipfile.BadZipfile:
+        logger.warning("Could not read scoring program, assuming it uses all the auxiliary inputs")
+        return set(AUXILIARY_INPUTS)
+    used = set()
+    for name in AUXILIARY_INPUTS:
+        pattern = re.compile(r"""(^|['"/\\$])%s(['"/\\]|$)""" % name, re.MULTILINE)
+        if any(pattern.search(content) for content in members):
+            used.add(name)
+    return used
+
+
 def phase_scoring_program_file(phase, filename="program.zip"):
     return os.path.join(phase_data_prefix(phase), filename)
 
@@ -735,6 +743,60 @@ class _LeaderboardManagementMode(object):
 LeaderboardManagementMode = _LeaderboardManagementMode()
 
 
+class PhaseTimeline(object):
+    """
+    The phases of a competition and the intervals during which they are active, loaded with one query.
+
+    A phase is active from its start date until the start of the phase numbered after it or, for the last one,
+    until the end of the competition. Phases which never end are always active. Get it from
+    Competition.phase_timeline, which is dropped when a phase of the competition is saved.
+    """
+    def __init__(self, competition, phases=None):
+        self.competition = competition
+        self.phases = list(competition.phases.all() if phases is None else phases)
+        self._by_number = dict((phase.phasenumber, phase) for phase in self.phases)
+        self._ends = dict((phase.phasenumber, self._end(phase.phasenumber)) for phase in self.phases)
+
+    def _end(self, phasenumber):
+        following = self._by_number.get(phasenumber + 1)
+        if following is not None:
+            return following.start_date
+        return self.competition.end_date
+
+    def is_active(self, phase, when=None):
+        """ Returns true when the given phase is on-going at the given time, now by default. """
+        if phase.phase_never_ends:
+            return True
+        when = when or now()
+        end = self._ends[phase.phasenumber] if phase.phasenumber in self._ends else self._end(phase.phasenumber)
+        return phase.start_date <= when and (end is None or when < end)
+
+    def is_future(self, phase, when=None):
+        """ Returns true if the given phase has yet to start. """
+        return (when or now()) < phase.start_date
+
+    def is_past(self, phase, when=None):
+        """ Returns true if the given phase has already ended. """
+        when = when or now()
+        return not self.is_active(phase, when) and not self.is_future(phase, when)
+
+    def current_phase(self, when=None):
+        """ Returns the first phase active at the given time, or None. """
+        when = when or now()
+        for phase in self.phases:
+            if self.is_active(phase, when):
+                return phase
+        return None
+
+    def next_phase(self, phase):
+        """ Returns the phase following the given one, or None for the last phase. """
+        numbers = [other.phasenumber for other in self.phases]
+        if phase.phasenumber not in numbers:
+            return None
+        index = numbers.index(phase.phasenumber)
+        return self.phases[index + 1] if index + 1 < len(self.phases) else None
+
+
 # Competition Phase
 class CompetitionPhase(models.Model):
     """
@@ -777,6 +839,19 @@ class CompetitionPhase(models.Model):
     scoring_program_docker_image = models.CharField(max_length=128, default='', blank=True)
     default_docker_image = models.CharField(max_length=128, default='', blank=True)
     disable_custom_docker_image = models.BooleanField(default=False)
+    # Scoring only phases may keep a container per compute worker slot running to score their submissions
+    warm_scoring_container = models.BooleanField(default=False, verbose_name="Reuse the scoring container between submissions")
+    # Auxiliary inputs generated for the scoring program, see scoring_program_auxiliary_inputs
+    scoring_program_uses_scores = models.BooleanField(default=True, verbose_name="Scoring program reads the leaderboard scores")
+    scoring_program_uses_history = models.BooleanField(default=True, verbose_name="Scoring program reads the submission history")
+    scoring_program_uses_coopetition = models.BooleanField(default=True, verbose_name="Scoring program reads the coopetition data")
+    # Submissions of identical results are scored once, see CachedSubmissionResult
+    memoize_results = models.BooleanField(
+        default=False,
+        verbose_name="Reuse the scores of identical submissions (deterministic scoring programs only)",
+        help_text="Only applies when the scoring program reads none of the leaderboard scores, the submission "
+                  "history and the coopetition data."
+    )
 
     class Meta:
         ordering = ['phasenumber']
@@ -787,28 +862,17 @@ class CompetitionPhase(models.Model):
     @property
     def is_active(self):
         """ Returns true when this phase of the competition is on-going. """
-        if self.phase_never_ends:
-            return True
-        else:
-            next_phase = self.competition.phases.filter(phasenumber=self.phasenumber+1)
-            if (next_phase is not None) and (len(next_phase) > 0):
-                # there is a phase following this phase, thus this phase is active if the current date
-                # is between the start of this phase and the start of the next phase
-                return self.start_date <= now() and (now() < next_phase[0].start_date)
-            else:
-                # there is no phase following this phase, thus this phase is active if the current data
-                # is after the start date of this phase and the competition is "active"
-                return self.start_date <= now() and self.competition.is_active
+        return self.competition.phase_timeline.is_active(self)
 
     @property
     def is_future(self):
         """ Returns true if this phase of the competition has yet to start. """
-        return now() < self.start_date
+        return self.competition.phase_timeline.is_future(self)
 
     @property
     def is_past(self):
         """ Returns true if this phase of the competition has already ended. """
-        return (not self.is_active) and (not self.is_future)
+        return self.competition.phase_timeline.is_past(self)
 
     @property
     def is_blind(self):
@@ -817,6 +881,21 @@ class CompetitionPhase(models.Model):
         """
         return self.leaderboard_management_mode == LeaderboardManagementMode.HIDE_RESULTS
 
+    @property
+    def scoring_program_uses_auxiliary_inputs(self):
+        """
+        Indicates whether the scoring program reads any input which changes between submissions.
+        """
+        return any(getattr(self, 'scoring_program_uses_%s' % name) for name in AUXILIARY_INPUTS)
+
+    @property
+    def memoizes_results(self):
+        """
+        Indicates whether submissions with identical results reuse the scores of a previous run, which
+        requires the scoring program to only read the results and the reference data.
+        """
+        return self.memoize_results and not self.scoring_program_uses_auxiliary_inputs
+
     @staticmethod
     def rank_values(ids, id_value_pairs, sort_ascending=True, eps=1.0e-12):
         """ Given a set of identifiers (ids) and a set of (id, value)-pairs
@@ -863,23 +942,111 @@ class CompetitionPhase(models.Model):
         return compare_ranks
 
     @staticmethod
-    def format_value(v, precision="2"):
+    def value_digits(precision="2"):
+        """ Returns the number of decimals used to display values with the given precision. """
         p = 1
         try:
             if precision is not None:
                 p = min(10, max(1, int(precision)))
         except exceptions.ValueError:
             pass
-        return ("{:." + str(p) + "f}").format(v)
+        return p
+
+    @staticmethod
+    def value_format(precision="2"):
+        """ Returns the format string used to display values with the given precision. """
+        return "{:." + str(CompetitionPhase.value_digits(precision)) + "f}"
+
+    @staticmethod
+    def format_value(v, precision="2"):
+        return CompetitionPhase.value_format(precision).format(v)
 
     def scores(self, include_scores_not_on_leaderboard=False, **kwargs):
         """
         Method to get the scores of all submissions within a phase.
 
+        Results are served from a materialized snapshot of the leaderboard which is only recomputed after
+        the scores, entries or score definitions of the phase changed (see `invalidate_leaderboards`).
+        Calls with extra score set filters bypass the snapshot.
+
+        :param include_scores_not_on_leaderboard: Flag to include all scores, not only those in Leaderboard.
+        :rtype: list.
+        :return: Scores.
+        """
+        if kwargs:
+            return self.compute_scores(include_scores_not_on_leaderboard, **kwargs)
+
+        snapshot = PhaseLeaderBoardSnapshot.objects.filter(
+            board__phase=self,
+            include_scores_not_on_leaderboard=include_scores_not_on_leaderboard,
+            version=models.F('board__version')
+        ).values_list('data', flat=True)
+        if len(snapshot) > 0:
+            return json.loads(snapshot[0])
+
+        # Read the version before computing, so concurrent changes make the stored snapshot stale
+        lb, _ = PhaseLeaderBoard.objects.get_or_create(phase=self)
+        results, ranking = self._compute_scores(include_scores_not_on_leaderboard)
+        data = self._dump_scores(results)
+        PhaseLeaderBoardSnapshot.store(lb, include_scores_not_on_leaderboard, data, ranking)
+        return json.loads(data)
+
+    @staticmethod
+    def _dump_scores(results):
+        for result in results:
+            # Score definitions are only needed while computing the ranks
+            result.pop('scoredefs', None)
+        return json.dumps(results)
+
+    def leaderboard_submission_ids(self, board, include_scores_not_on_leaderboard=False):
+        """ Returns the ids of the submissions ranked on the given board of the phase. """
+        if include_scores_not_on_leaderboard:
+            return CompetitionSubmission.objects.filter(
+                phase=self,
+                status__codename=CompetitionSubmissionStatus.FINISHED
+            ).values_list('pk', flat=True)
+        return PhaseLeaderBoardEntry.objects.filter(board=board).values_list('result_id', flat=True)
+
+    def add_submission_details(self, groups):
+        """
+        Adds the submission date, the number of submissions of the participant in this phase and the team
+        of the submission, if any, to the rows of the given leaderboard groups.
+
+        :param groups: Scores returned by `scores`.
+        """
+        submission_ids = set(scoredata['id'] for group in groups for _, scoredata in group['scores'])
+        if len(submission_ids) == 0:
+            return
+        submissions = CompetitionSubmission.objects.filter(pk__in=submission_ids).select_related('team')
+        submissions = {submission.pk: submission for submission in submissions}
+        counts = self.submissions.values('participant').annotate(count=models.Count('pk'))
+        counts = {row['participant']: row['count'] for row in counts}
+        for group in groups:
+            for _, scoredata in group['scores']:
+                sub = submissions[scoredata['id']]
+                scoredata['date'] = sub.submitted_at
+                scoredata['count'] = counts.get(sub.participant_id, 0)
+                if sub.team:
+                    scoredata['team_name'] = sub.team.name
+
+    def compute_scores(self, include_scores_not_on_leaderboard=False, **kwargs):
+        """
+        Computes the scores of all submissions within a phase from the database, without using snapshots.
+
         :param include_scores_not_on_leaderboard: Flag to include all scores, not only those in Leaderboard.
         :rtype: list.
         :return: Scores.
         """
+        return self._compute_scores(include_scores_not_on_leaderboard, **kwargs)[0]
+
+    def _compute_scores(self, include_scores_not_on_leaderboard=False, ranking=None, **kwargs):
+        """
+        Computes the scores of all submissions within a phase, along with the ranking they were ranked with.
+
+        :param ranking: Up to date ranking of the submissions, their scores are not read when given.
+        :rtype: tuple.
+        :return: Scores and a `LeaderboardRanking` state, or None when the phase has no leaderboard yet.
+        """
 
         # Get the list of submissions in this leaderboard
         lb, created = PhaseLeaderBoard.objects.get_or_create(phase=self)
@@ -891,7 +1058,7 @@ class CompetitionPhase(models.Model):
                 )
                 submissions = submissions.select_related('participant', 'participant__user')
             else:
-                qs = PhaseLeaderBoardEntry.objects.filter(board=lb)
+                qs = PhaseLeaderBoardEntry.objects.filter(board=lb).select_related('result__participant__user')
                 submissions = [entry.result for entry in qs]
         else:
             submissions = []
@@ -905,15 +1072,6 @@ class CompetitionPhase(models.Model):
             # add the location of the results on the blob storage to the scores
             for submission in submissions:
                 user = submission.participant.user
-                team =  get_user_team(submission.participant, submission.participant.competition)
-                # If competition teams are enabled, and the user is in a team, use the team name as team_name.
-                # Otherwise, use the user default team_name
-                if self.competition.enable_teams:
-                    team_name = ''
-                    if team is not None:
-                        team_name = team.name
-                    else:
-                        team_name = user.team_name
                 scores[submission.pk] = {
                     'username': user.username,
                     'user_pk': user.pk,
@@ -971,86 +1129,84 @@ class CompetitionPhase(models.Model):
                 'scoredefs': scoreDefs
             })
 
-        if len(submissions) > 0:
-            # Figure out which submission scores we need to read from the database.
-            submission_ids = [s.id for s in submissions]
-            # not_computed_scoredefs: map (scoredef.id, scoredef) to keep track of non-computed scoredefs
-            not_computed_scoredefs = {}
-            computed_scoredef_ids = []
-            # computed_deps: maps id of a computed scoredef to a list of ids for scoredefs which are
-            #                input to the computation
-            computed_deps = {}
-            for result in results:
-                for sdef in result['scoredefs']:
-                    if sdef.computed is True:
-                        computed_scoredef_ids.append(sdef.id)
-                    else:
-                        not_computed_scoredefs[sdef.id] = sdef
-                if len(computed_scoredef_ids) > 0:
-                    computed_ids = SubmissionComputedScore.objects.filter(scoredef_id__in=computed_scoredef_ids).values_list('id')
-                    fields = SubmissionComputedScoreField.objects.filter(computed_id__in=computed_ids).select_related('scoredef', 'computed')
-                    for field in fields:
-                        if not field.scoredef.computed:
-                            not_computed_scoredefs[field.scoredef.id] = field.scoredef
-                        if field.computed.scoredef_id not in computed_deps:
-                            computed_deps[field.computed.scoredef_id] = []
-                        computed_deps[field.computed.scoredef_id].append(field.scoredef)
+        if created:
+            return results, None
+
+        # Figure out which submission scores we need to read from the database.
+        submission_ids = [s.id for s in submissions]
+        # not_computed_scoredefs: map (scoredef.id, scoredef) to keep track of non-computed scoredefs
+        not_computed_scoredefs = {}
+        computed_scoredef_ids = []
+        # computed_deps: maps id of a computed scoredef to a list of ids for scoredefs which are
+        #                input to the computation
+        computed_deps = {}
+        for result in results:
+            for sdef in result['scoredefs']:
+                if sdef.computed is True:
+                    computed_scoredef_ids.append(sdef.id)
+                else:
+                    not_computed_scoredefs[sdef.id] = sdef
+            if len(computed_scoredef_ids) > 0:
+                computed_ids = SubmissionComputedScore.objects.filter(scoredef_id__in=computed_scoredef_ids).values_list('id')
+                fields = SubmissionComputedScoreField.objects.filter(computed_id__in=computed_ids).select_related('scoredef', 'computed')
+                for field in fields:
+                    if not field.scoredef.computed:
+                        not_computed_scoredefs[field.scoredef.id] = field.scoredef
+                    if field.computed.scoredef_id not in computed_deps:
+                        computed_deps[field.computed.scoredef_id] = []
+                    computed_deps[field.computed.scoredef_id].append(field.scoredef)
+
+        # rank values per scoredef, computed 'Avg' scoredefs are ranked by the average rank of their inputs
+        computed_ranks = {}
+        for result in results:
+            for sdef in result['scoredefs']:
+                if sdef.computed:
+                    operation = getattr(models, sdef.computed_score.operation)
+                    if (operation.name == 'Avg') and len(computed_deps.get(sdef.id, [])) > 0:
+                        computed_ranks[sdef.id] = (sdef.sorting == 'asc', [d.id for d in computed_deps[sdef.id]])
+        if ranking is None:
             # Now read the submission scores
             values = {}
             scoredef_ids = [sdef_id for (sdef_id, sdef) in not_computed_scoredefs.iteritems()]
-            for s in SubmissionScore.objects.filter(scoredef_id__in=scoredef_ids, result_id__in=submission_ids):
-                if s.scoredef_id not in values:
-                    values[s.scoredef_id] = {}
-                values[s.scoredef_id][s.result_id] = s.value
+            if len(submission_ids) > 0:
+                for s in SubmissionScore.objects.filter(scoredef_id__in=scoredef_ids, result_id__in=submission_ids):
+                    if s.scoredef_id not in values:
+                        values[s.scoredef_id] = {}
+                    values[s.scoredef_id][s.result_id] = s.value
+            ranking = leaderboard_ranking(
+                submission_ids,
+                {sdef_id: sdef.sorting == 'asc' for (sdef_id, sdef) in not_computed_scoredefs.iteritems()},
+                computed_ranks,
+                values
+            )
 
-            # rank values per scoredef.key (not computed)
+        if len(submissions) > 0:
             ranks = {}
-            for (sdef_id, v) in values.iteritems():
-                sdef = not_computed_scoredefs[sdef_id]
-                ranks[sdef_id] = self.rank_values(submission_ids, v, sort_ascending=sdef.sorting=='asc')
-
-            # compute values for computed scoredefs
-            for result in results:
-                for sdef in result['scoredefs']:
-                    if sdef.computed:
-                        operation = getattr(models, sdef.computed_score.operation)
-                        if (operation.name == 'Avg'):
-                            cnt = len(computed_deps[sdef.id])
-                            if (cnt > 0):
-                                computed_values = {}
-                                for id in submission_ids:
-                                    computed_values[id] = sum([ranks[d.id][id] for d in computed_deps[sdef.id]]) / float(cnt)
-                                values[sdef.id] = computed_values
-                                ranks[sdef.id] = self.rank_values(submission_ids, computed_values, sort_ascending=sdef.sorting=='asc')
+            for sdef_id in not_computed_scoredefs.keys() + computed_ranks.keys():
+                if sdef_id in computed_ranks or ranking.has_values(sdef_id):
+                    ranks[sdef_id] = ranking.ranks(sdef_id)
 
             #format values
             for result in results:
                 scores = result['scores']
                 for sdef in result['scoredefs']:
                     knownValues = {}
-                    if sdef.id in values:
-                        knownValues = values[sdef.id]
                     knownRanks = {}
                     if sdef.id in ranks:
+                        knownValues = ranking.formatted_values(sdef.id, CompetitionPhase.value_digits(sdef.numeric_format))
                         knownRanks = ranks[sdef.id]
+                    rank_key = 'rnk' if sdef.show_rank else 'hidden_rnk'
                     for id in submission_ids:
-                        v = "-"
-                        if id in knownValues:
-                            v = CompetitionPhase.format_value(knownValues[id], sdef.numeric_format)
-                        r = "-"
-                        if id in knownRanks:
-                            r = knownRanks[id]
-                        if sdef.show_rank:
-                            scores[id]['values'].append({'val': v, 'rnk': r, 'name' : sdef.key})
-                        else:
-                            scores[id]['values'].append({'val': v, 'hidden_rnk': r, 'name' : sdef.key})
+                        v = knownValues.get(id, "-")
+                        scores[id]['values'].append({'val': v, rank_key: knownRanks.get(id, "-"), 'name' : sdef.key})
                     if (sdef.key == result['selection_key']):
                         overall_ranks = ranks[sdef.id]
-                ranked_submissions = sorted(submission_ids, cmp=CompetitionPhase.rank_submissions(overall_ranks))
+                # Ranks are integers, a stable sort on them matches rank_submissions
+                ranked_submissions = sorted(submission_ids, key=overall_ranks.get)
                 final_scores = [(overall_ranks[id], scores[id]) for id in ranked_submissions]
                 result['scores'] = final_scores
                 del result['scoredefs']
-        return results
+        return results, ranking
 
 
 # Competition Participant
@@ -1200,8 +1356,9 @@ class CompetitionSubmission(models.Model):
             if self.status.codename == CompetitionSubmissionStatus.FINISHED:
                 self.completed_at = datetime.datetime.utcnow()
 
-        self.like_count = self.likes.all().count()
-        self.dislike_count = self.dislikes.all().count()
+        if self.pk:
+            self.like_count = self.likes.all().count()
+            self.dislike_count = self.dislikes.all().count()
 
         if not self.readable_filename:
             if hasattr(self, 'file'):
@@ -1216,42 +1373,12 @@ class CompetitionSubmission(models.Model):
 
         # only at save on object creation should it be submitted
         if not self.pk:
+            self.status = CompetitionSubmissionStatus.objects.get_or_create(codename=CompetitionSubmissionStatus.SUBMITTING)[0]
             if not ignore_submission_limits:
-                print "This is a new submission, getting the submission number."
-                subnum = CompetitionSubmission.objects.filter(phase=self.phase, participant=self.participant).aggregate(Max('submission_number'))['submission_number__max']
-                if subnum is not None:
-                    self.submission_number = subnum + 1
-                else:
-                    self.submission_number = 1
-
-                failed_count = CompetitionSubmission.objects.filter(phase=self.phase,
-                                                                    participant=self.participant,
-                                                                    status__name=CompetitionSubmissionStatus.FAILED).count()
-
-                print "This is submission number %d, and %d submissions have failed" % (self.submission_number, failed_count)
-                offset_submission_count = self.submission_number - failed_count
-
-                if (offset_submission_count > self.phase.max_submissions):
-                    print "Checking to see if the offset_submission_count (%d) is greater than the maximum allowed (%d)" % (offset_submission_count, self.phase.max_submissions)
-                    raise PermissionDenied("The maximum number of submissions has been reached.")
-                else:
-                    print "Submission number below maximum."
-
-                if hasattr(self.phase, 'max_submissions_per_day'):
-                    print 'Checking submissions per day count'
-
-                    submissions_from_today_count = len(CompetitionSubmission.objects.filter(
-                        phase__competition=self.phase.competition,
-                        participant=self.participant,
-                        phase=self.phase,
-                        submitted_at__gte=datetime.date.today()
-                    ))
-
-                    print 'Count is %s and maximum is %s' % (submissions_from_today_count, self.phase.max_submissions_per_day)
-
-                    if submissions_from_today_count + 1 - failed_count > self.phase.max_submissions_per_day or self.phase.max_submissions_per_day == 0:
-                        print 'PERMISSION DENIED'
-                        raise PermissionDenied("The maximum number of submissions this day have been reached.")
+                # Numbered by the quota ledger, the insert happens before its row is unlocked
+                with transaction.atomic():
+                    self.submission_number = SubmissionQuota.admit(self.phase, self.participant)
+                    return self._save_submission(*args, **kwargs)
             else:
                 # Make sure we're incrementing the number if we're forcing in a new entry
                 while CompetitionSubmission.objects.filter(
@@ -1260,9 +1387,19 @@ class CompetitionSubmission(models.Model):
                     submission_number=self.submission_number
                 ).exists():
                     self.submission_number += 1
-
-            self.status = CompetitionSubmissionStatus.objects.get_or_create(codename=CompetitionSubmissionStatus.SUBMITTING)[0]
-
+                res = self._save_submission(*args, **kwargs)
+                if self.submission_number > 0:
+                    SubmissionQuota.count_forced(self.phase, {self.submission_number: [self.participant_id]})
+                return res
+        elif self.status.codename == CompetitionSubmissionStatus.FAILED:
+            # Only the save doing the transition to failed counts it
+            if CompetitionSubmission.objects.filter(pk=self.pk).exclude(
+                    status__codename=CompetitionSubmissionStatus.FAILED).update(status=self.status):
+                SubmissionQuota.objects.filter(phase=self.phase_id, participant=self.participant_id).update(
+                    failed_count=models.F('failed_count') + 1)
+        return self._save_submission(*args, **kwargs)
+
+    def _save_submission(self, *args, **kwargs):
         if not self.secret:
             # Set a compute worker password if one isn't set, the competition organizer
             # never needs to know this password, it's sent along with the tasks
@@ -1390,6 +1527,205 @@ class CompetitionSubmission(models.Model):
         return scores
 
 
+class SubmissionQuota(models.Model):
+    """
+    Ledger of the submissions of a participant in a phase, new submissions are numbered and checked against
+    the limits of the phase with a single conditional update of its counters.
+    """
+    phase = models.ForeignKey(CompetitionPhase, related_name='submission_quotas')
+    participant = models.ForeignKey(CompetitionParticipant, related_name='submission_quotas')
+    # Highest submission number handed out
+    submission_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    day = models.DateField()
+    day_submission_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = (('phase', 'participant'),)
+
+    def __unicode__(self):
+        return "%s %s: %s submissions" % (self.phase, self.participant.user, self.submission_count)
+
+    @classmethod
+    def get_for(cls, phase, participant):
+        """
+        Gets the ledger of a participant in a phase, created from their existing submissions the first time.
+        """
+        try:
+            return cls.objects.get(phase=phase, participant=participant)
+        except cls.DoesNotExist:
+            pass
+
+        today = datetime.date.today()
+        submissions = CompetitionSubmission.objects.filter(phase=phase, participant=participant)
+        quota = cls(
+            phase=phase,
+            participant=participant,
+            submission_count=submissions.aggregate(Max('submission_number'))['submission_number__max'] or 0,
+            failed_count=submissions.filter(status__codename=CompetitionSubmissionStatus.FAILED).count(),
+            day=today,
+            day_submission_count=submissions.filter(submitted_at__gte=today).count(),
+        )
+        try:
+            with transaction.atomic():
+                quota.save()
+        except IntegrityError:
+            # Another submission created it first
+            quota = cls.objects.get(phase=phase, participant=participant)
+        return quota
+
+    @classmethod
+    def admit(cls, phase, participant):
+        """
+        Counts a new submission of a participant in a phase, if the limits of the phase allow it. Run it in the
+        transaction saving the submission, so the ledger stays locked and unchanged if the save fails.
+
+        :return: The number of the new submission.
+        :raises PermissionDenied: When the maximum number of submissions, in total or this day, has been reached.
+        """
+        quota = cls.get_for(phase, participant)
+        today = datetime.date.today()
+        with transaction.atomic():
+            cls.objects.filter(pk=quota.pk, day__lt=today).update(day=today, day_submission_count=0)
+            admitted = phase.max_submissions_per_day > 0 and cls.objects.filter(
+                pk=quota.pk,
+                submission_count__lt=models.F('failed_count') + phase.max_submissions,
+                day_submission_count__lt=models.F('failed_count') + phase.max_submissions_per_day,
+            ).update(
+                submission_count=models.F('submission_count') + 1,
+                day_submission_count=models.F('day_submission_count') + 1,
+            )
+            quota = cls.objects.get(pk=quota.pk)
+
+        if not admitted:
+            if quota.submission_count - quota.failed_count >= phase.max_submissions:
+                raise PermissionDenied("The maximum number of submissions has been reached.")
+            raise PermissionDenied("The maximum number of submissions this day have been reached.")
+        return quota.submission_count
+
+    @classmethod
+    def count_forced(cls, phase, participants_by_number):
+        """
+        Counts submissions created without checking the limits of a phase, so the next admitted submissions
+        are numbered after them.
+
+        :param participants_by_number: Dictionary mapping the highest number given to a participant to the ids
+            of the participants.
+        """
+        for number, participant_ids in participants_by_number.items():
+            for start in range(0, len(participant_ids), SUBMISSION_BULK_BATCH_SIZE):
+                cls.objects.filter(
+                    phase=phase,
+                    participant__in=participant_ids[start:start + SUBMISSION_BULK_BATCH_SIZE],
+                    submission_count__lt=number
+                ).update(submission_count=number)
+
+
+# Rows inserted or looked up per query, SQLite allows at most 999 parameters per query
+SUBMISSION_BULK_BATCH_SIZE = 500
+
+
+def copy_submissions(submissions, phase):
+    """
+    Creates, in bulk, new submissions of the files of the given submissions in a phase, numbered and
+    teamed as `CompetitionSubmission.save(ignore_submission_limits=True)` would one by one.
+
+    :param submissions: The submissions to copy, with their participants (select_related) in the competition
+        of the phase.
+    :return: The primary keys of the new submissions, in the order of the given submissions.
+    """
+    submissions = list(submissions)
+    if len(submissions) == 0:
+        return []
+    participant_ids = set(submission.participant_id for submission in submissions)
+
+    # Give each copy the lowest number not used yet by its participant in the phase, in one pass
+    used_numbers = {}
+    for participant_id, number in CompetitionSubmission.objects.filter(
+            phase=phase,
+            participant__in=participant_ids).values_list('participant_id', 'submission_number'):
+        used_numbers.setdefault(participant_id, set()).add(number)
+
+    teams = {}
+    if phase.competition.enable_teams:
+        participants = dict((submission.participant_id, submission.participant) for submission in submissions)
+        teams = get_user_teams(participants.values(), phase.competition)
+
+    status = CompetitionSubmissionStatus.objects.get_or_create(codename=CompetitionSubmissionStatus.SUBMITTING)[0]
+    file_url_base = BundleStorage.url('')
+    copies = []
+    for submission in submissions:
+        numbers = used_numbers.setdefault(submission.participant_id, set())
+        number = 0
+        while number in numbers:
+            number += 1
+        numbers.add(number)
+
+        copies.append(CompetitionSubmission(
+            participant_id=submission.participant_id,
+            phase=phase,
+            file=submission.file.name,
+            s3_file=submission.s3_file,
+            file_url_base=file_url_base,
+            readable_filename=submission.readable_filename,
+            status=status,
+            submission_number=number,
+            secret=str(uuid.uuid4()),
+            team=teams.get(submission.participant_id),
+        ))
+    CompetitionSubmission.objects.bulk_create(copies, batch_size=SUBMISSION_BULK_BATCH_SIZE)
+
+    participants_by_number = {}
+    for participant_id, numbers in used_numbers.items():
+        if participant_id in participant_ids and max(numbers) > 0:
+            participants_by_number.setdefault(max(numbers), []).append(participant_id)
+    SubmissionQuota.count_forced(phase, participants_by_number)
+
+    # bulk_create doesn't return primary keys, the secrets identify the new rows
+    secrets = [copy.secret for copy in copies]
+    pks = {}
+    for start in range(0, len(secrets), SUBMISSION_BULK_BATCH_SIZE):
+        pks.update(CompetitionSubmission.objects.filter(
+            secret__in=secrets[start:start + SUBMISSION_BULK_BATCH_SIZE]
+        ).values_list('secret', 'pk'))
+
+    # No post_save signals were sent for the new rows
+    invalidate_leaderboards(phase=phase)
+    invalidate_coopetition(phases=phase)
+    return [pks[secret] for secret in secrets]
+
+
+class FileDigest(models.Model):
+    """
+    Content hash of a file in BundleStorage, see `apps.web.tasks.file_digest`.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    digest = models.CharField(max_length=40)
+
+    def __unicode__(self):
+        return "%s %s" % (self.digest, self.name)
+
+
+class CachedSubmissionResult(models.Model):
+    """
+    Result of the scoring of a submission, reused by the submissions of the same results scored by the same
+    program, reference data and docker image in the phases memoizing results.
+    """
+    competition = models.ForeignKey(Competition, related_name='cached_submission_results')
+    results_digest = models.CharField(max_length=40)
+    scoring_program_digest = models.CharField(max_length=40)
+    reference_data_digest = models.CharField(max_length=40, blank=True)
+    docker_image = models.CharField(max_length=128)
+    submission = models.ForeignKey(CompetitionSubmission, related_name='cached_results')
+
+    class Meta:
+        unique_together = (('competition', 'results_digest', 'scoring_program_digest', 'reference_data_digest',
+                            'docker_image'),)
+
+    def __unicode__(self):
+        return "%s: %s" % (self.results_digest, self.submission_id)
+
+
 class SubmissionResultGroup(models.Model):
     """Defines the Leaderboard of a Competition."""
     competition = models.ForeignKey(Competition)
@@ -1611,6 +1947,17 @@ class CompetitionDefBundle(models.Model):
 
             phase_spec['start_date'] = CompetitionDefBundle.localize_datetime(phase_spec['start_date'])
 
+            # Auxiliary inputs not declared by the phase are always generated, the scoring program is only
+            # searched for them to suggest which ones the organizer could turn off
+            undeclared_inputs = [name for name in AUXILIARY_INPUTS if 'scoring_program_uses_%s' % name not in phase_spec]
+            if undeclared_inputs and phase_spec.get('scoring_program', '').endswith('.zip'):
+                used_inputs = scoring_program_auxiliary_inputs(io.BytesIO(zf.read(phase_spec['scoring_program'])))
+                unused_inputs = [name for name in undeclared_inputs if name not in used_inputs]
+                if unused_inputs:
+                    logger.info("The scoring program of phase %s does not seem to read %s, setting %s to False "
+                                "would skip generating them", p_num, ", ".join(unused_inputs),
+                                ", ".join('scoring_program_uses_%s' % name for name in unused_inputs))
+
             # First phase can't have auto_migration=True, remove that here
             if index == 0:
                 phase_spec['auto_migration'] = False
@@ -1620,6 +1967,9 @@ class CompetitionDefBundle(models.Model):
 
             phase, created = CompetitionPhase.objects.get_or_create(**phase_spec)
             logger.debug("CompetitionDefBundle::unpack created phase (pk=%s)", self.pk)
+            if phase.memoize_results and not phase.memoizes_results:
+                logger.warning("Phase %s memoizes results but its scoring program reads auxiliary inputs, scores "
+                               "will not be reused", phase.phasenumber)
 
             # Set default for max submissions per day
             if not hasattr(phase, 'max_submissions_per_day'):
@@ -1903,6 +2253,8 @@ class SubmissionScore(models.Model):
 class PhaseLeaderBoard(models.Model):
     phase = models.OneToOneField(CompetitionPhase, related_name='board')
     is_open = models.BooleanField(default=True)
+    # Bumped every time the scores of this leaderboard change, see invalidate_leaderboards
+    version = models.PositiveIntegerField(default=0)
 
     def submissions(self):
         return CompetitionSubmission.objects.filter(leaderboard_entry_result__board=self)
@@ -1929,6 +2281,278 @@ class PhaseLeaderBoardEntry(models.Model):
         unique_together = (('board', 'result'),)
 
 
+class PhaseLeaderBoardSnapshot(models.Model):
+    """
+    Materialized output of `CompetitionPhase.scores` for a leaderboard.
+
+    A snapshot is valid while its version equals the version of its board. It keeps the ranking its scores
+    were computed with, so `update_leaderboard` can apply the changes of a few submissions to a valid
+    snapshot instead of leaving the next read to rank the whole phase again.
+    """
+    board = models.ForeignKey(PhaseLeaderBoard, related_name='snapshots')
+    include_scores_not_on_leaderboard = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=0)
+    data = models.TextField()
+    # JSON encoded LeaderboardRanking state, empty when the board had no ranking
+    ranking = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = (('board', 'include_scores_not_on_leaderboard'),)
+
+    @staticmethod
+    def store(board, include_scores_not_on_leaderboard, data, ranking=None):
+        """
+        Saves the JSON encoded scores computed for the given version of the board, and their ranking.
+        """
+        ranking = json.dumps(ranking.state()) if ranking is not None else ''
+        updated = PhaseLeaderBoardSnapshot.objects.filter(
+            board=board,
+            include_scores_not_on_leaderboard=include_scores_not_on_leaderboard
+        ).update(version=board.version, data=data, ranking=ranking, updated_at=now())
+        if updated == 0:
+            try:
+                with transaction.atomic():
+                    PhaseLeaderBoardSnapshot.objects.create(
+                        board=board,
+                        include_scores_not_on_leaderboard=include_scores_not_on_leaderboard,
+                        version=board.version,
+                        data=data,
+                        ranking=ranking
+                    )
+            except IntegrityError:
+                # Another request stored the snapshot first
+                pass
+
+
+@contextmanager
+def update_leaderboard(phase, rescored_ids=()):
+    """
+    Runs the block in a transaction holding the leaderboard of the phase and applies the submissions it
+    added, removed or rescored to the valid snapshots of the board, instead of marking them stale.
+
+    Use it around writes which only change the submissions of the board or their scores; any other change
+    made in the block is not seen by the snapshots. Snapshots which were already stale are left to be
+    recomputed on the next read.
+
+    :param phase: The CompetitionPhase whose leaderboard is changed.
+    :param rescored_ids: Ids of the submissions whose scores are written in the block.
+    """
+    with transaction.atomic():
+        board, _ = PhaseLeaderBoard.objects.get_or_create(phase=phase)
+        # Invalidations by other writers wait for this lock, the version can only move with the block writes
+        board = PhaseLeaderBoard.objects.select_for_update().get(pk=board.pk)
+        snapshots = list(board.snapshots.filter(version=board.version).exclude(ranking=''))
+        yield
+        version = PhaseLeaderBoard.objects.filter(pk=board.pk).values_list('version', flat=True)[0]
+        if version == board.version:
+            return
+        board.version = version
+        for snapshot in snapshots:
+            include = snapshot.include_scores_not_on_leaderboard
+            ranking = LeaderboardRanking.from_state(json.loads(snapshot.ranking))
+            submission_ids = set(phase.leaderboard_submission_ids(board, include))
+            removed_ids = ranking.submission_ids - submission_ids
+            added_ids = (submission_ids - ranking.submission_ids) | (submission_ids & set(rescored_ids))
+            if not removed_ids and not added_ids:
+                PhaseLeaderBoardSnapshot.objects.filter(pk=snapshot.pk).update(version=version)
+                continue
+            scores = dict((id, {}) for id in added_ids)
+            for result_id, scoredef_id, value in SubmissionScore.objects.filter(
+                result_id__in=added_ids,
+                scoredef_id__in=ranking.scoredefs.keys()
+            ).values_list('result_id', 'scoredef_id', 'value'):
+                scores[result_id][scoredef_id] = value
+            for id in removed_ids:
+                ranking.remove_submission(id)
+            for id, values in scores.iteritems():
+                ranking.add_submission(id, values)
+            results, ranking = phase._compute_scores(include, ranking=ranking)
+            PhaseLeaderBoardSnapshot.store(board, include, CompetitionPhase._dump_scores(results), ranking)
+
+
+def invalidate_leaderboards(**filters):
+    """
+    Marks the snapshots of the leaderboards matching the given filters as stale.
+
+    Code changing scores without sending model signals (queryset updates, bulk_create) must call this.
+    """
+    PhaseLeaderBoard.objects.filter(**filters).update(version=models.F('version') + 1)
+
+
+def invalidate_coopetition(**filters):
+    """
+    Marks the coopetition bundles of the competitions matching the given filters as stale.
+    """
+    Competition.objects.filter(**filters).update(coopetition_version=models.F('coopetition_version') + 1)
+
+
+def _submission_coopetition_changed(sender, instance, **kwargs):
+    # Only finished submissions are exported, and only some of their fields; running status moves,
+    # execution keys and output files leave the bundle alone
+    old = getattr(instance, '_coopetition_state', None)
+    new = _submission_coopetition_state(instance)
+    instance._coopetition_state = new
+    if kwargs.get('created'):
+        old = dict(new, status_id=None)
+    elif old is None:
+        invalidate_coopetition(phases=instance.phase_id)
+        return
+    if old == new:
+        return
+    finished = set(CompetitionSubmissionStatus.objects.filter(
+        pk__in=[old['status_id'], new['status_id']],
+        codename=CompetitionSubmissionStatus.FINISHED
+    ).values_list('pk', flat=True))
+    if old['status_id'] in finished or new['status_id'] in finished:
+        invalidate_coopetition(phases__in=set([old['phase_id'], new['phase_id']]) - set([None]))
+
+
+def _submission_coopetition_deleted(sender, instance, **kwargs):
+    if CompetitionSubmissionStatus.objects.filter(
+        pk=instance.status_id,
+        codename=CompetitionSubmissionStatus.FINISHED
+    ).exists():
+        invalidate_coopetition(phases=instance.phase_id)
+
+
+def _submission_feedback_changed(sender, instance, **kwargs):
+    invalidate_coopetition(phases__submissions=instance.submission_id)
+
+
+def _phase_changed(sender, instance, **kwargs):
+    # Only the competition already loaded by the phase can have a timeline to drop
+    competition = getattr(instance, CompetitionPhase._meta.get_field('competition').get_cache_name(), None)
+    if competition is not None:
+        competition.__dict__.pop('phase_timeline', None)
+
+
+def _submission_score_changed(sender, instance, **kwargs):
+    invalidate_leaderboards(phase__submissions=instance.result_id)
+
+
+def _leaderboard_entry_changed(sender, instance, **kwargs):
+    invalidate_leaderboards(pk=instance.board_id)
+
+
+def _submission_leaderboard_state(instance):
+    # Read from __dict__ so deferred fields are not loaded, they can't change on save either
+    state = dict((name, instance.__dict__.get(name)) for name in ('phase_id', 'participant_id', 'status_id'))
+    state['file'] = getattr(instance.__dict__.get('file'), 'name', instance.__dict__.get('file'))
+    return state
+
+
+# Fields of a submission driving what the coopetition bundle exports. The exported timestamps are left out:
+# save() sets them from naive datetimes which can't be compared with the loaded ones, and they only change
+# along with the status (started_at, completed_at) or is_public (when_made_public, when_unmade_public)
+COOPETITION_SUBMISSION_FIELDS = (
+    'phase_id',
+    'participant_id',
+    'status_id',
+    'is_public',
+    'download_count',
+    'submission_number',
+)
+
+
+def _submission_coopetition_state(instance):
+    return dict((name, instance.__dict__.get(name)) for name in COOPETITION_SUBMISSION_FIELDS)
+
+
+def _submission_loaded(sender, instance, **kwargs):
+    instance._leaderboard_state = _submission_leaderboard_state(instance)
+    instance._coopetition_state = _submission_coopetition_state(instance)
+
+
+def _submission_changed(sender, instance, **kwargs):
+    # Status moves, like counts and other bookkeeping saves leave the leaderboards alone, only
+    # the fields shown on a board or the finished status the boards filter on are checked
+    old = getattr(instance, '_leaderboard_state', None)
+    new = _submission_leaderboard_state(instance)
+    instance._leaderboard_state = new
+    if old is None:
+        invalidate_leaderboards(phase=instance.phase_id)
+        return
+    if kwargs.get('created'):
+        # A new submission only shows up once it is finished or added to a board
+        old = dict(new, status_id=None)
+    phases = set([old['phase_id'], new['phase_id']]) - set([None])
+    if any(old[name] != new[name] for name in ('phase_id', 'participant_id', 'file')):
+        invalidate_leaderboards(phase__in=phases)
+    elif old['status_id'] != new['status_id'] and CompetitionSubmissionStatus.objects.filter(
+        pk__in=[old['status_id'], new['status_id']],
+        codename=CompetitionSubmissionStatus.FINISHED
+    ).exists():
+        invalidate_leaderboards(phase__in=phases)
+
+
+def _submission_deleted(sender, instance, **kwargs):
+    invalidate_leaderboards(phase=instance.phase_id)
+
+
+def _result_group_phase_changed(sender, instance, **kwargs):
+    invalidate_leaderboards(phase=instance.phase_id)
+
+
+def _competition_scoring_changed(sender, instance, **kwargs):
+    invalidate_leaderboards(phase__competition=instance.competition_id)
+
+
+def _scoredef_group_changed(sender, instance, **kwargs):
+    invalidate_leaderboards(phase__competition__submissionresultgroup=instance.group_id)
+
+
+def _computed_score_changed(sender, instance, **kwargs):
+    invalidate_leaderboards(phase__competition__submissionscoredef=instance.scoredef_id)
+
+
+# Fields of a user shown on the leaderboards
+LEADERBOARD_USER_FIELDS = frozenset(['username', 'team_name'])
+
+
+def _user_changed(sender, instance, **kwargs):
+    # Partial saves like the last_login update on every login leave the leaderboards alone
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not LEADERBOARD_USER_FIELDS & set(update_fields):
+        return
+    invalidate_leaderboards(phase__competition__participants__user=instance.pk)
+
+
+post_save.connect(_phase_changed, sender=CompetitionPhase)
+post_delete.connect(_phase_changed, sender=CompetitionPhase)
+post_save.connect(_submission_score_changed, sender=SubmissionScore)
+post_delete.connect(_submission_score_changed, sender=SubmissionScore)
+post_save.connect(_leaderboard_entry_changed, sender=PhaseLeaderBoardEntry)
+post_delete.connect(_leaderboard_entry_changed, sender=PhaseLeaderBoardEntry)
+post_init.connect(_submission_loaded, sender=CompetitionSubmission)
+post_save.connect(_submission_changed, sender=CompetitionSubmission)
+post_delete.connect(_submission_deleted, sender=CompetitionSubmission)
+post_save.connect(_result_group_phase_changed, sender=SubmissionResultGroupPhase)
+post_delete.connect(_result_group_phase_changed, sender=SubmissionResultGroupPhase)
+post_save.connect(_competition_scoring_changed, sender=SubmissionResultGroup)
+post_delete.connect(_competition_scoring_changed, sender=SubmissionResultGroup)
+post_save.connect(_competition_scoring_changed, sender=SubmissionScoreDef)
+post_delete.connect(_competition_scoring_changed, sender=SubmissionScoreDef)
+post_save.connect(_competition_scoring_changed, sender=SubmissionScoreSet)
+post_delete.connect(_competition_scoring_changed, sender=SubmissionScoreSet)
+post_save.connect(_scoredef_group_changed, sender=SubmissionScoreDefGroup)
+post_delete.connect(_scoredef_group_changed, sender=SubmissionScoreDefGroup)
+post_save.connect(_computed_score_changed, sender=SubmissionComputedScore)
+post_delete.connect(_computed_score_changed, sender=SubmissionComputedScore)
+post_save.connect(_computed_score_changed, sender=SubmissionComputedScoreField)
+post_delete.connect(_computed_score_changed, sender=SubmissionComputedScoreField)
+post_save.connect(_user_changed, sender=ClUser)
+post_delete.connect(_user_changed, sender=ClUser)
+post_save.connect(_submission_coopetition_changed, sender=CompetitionSubmission)
+post_delete.connect(_submission_coopetition_deleted, sender=CompetitionSubmission)
+post_save.connect(_submission_feedback_changed, sender=Like)
+post_delete.connect(_submission_feedback_changed, sender=Like)
+post_save.connect(_submission_feedback_changed, sender=Dislike)
+post_delete.connect(_submission_feedback_changed, sender=Dislike)
+post_save.connect(_submission_feedback_changed, sender=DownloadRecord)
+post_delete.connect(_submission_feedback_changed, sender=DownloadRecord)
+
+
 def dataset_data_file(dataset, filename="data.zip"):
     return os.path.join("datasets", str(dataset.pk), str(uuid.uuid4()), filename)
 
@@ -1978,6 +2602,13 @@ class CompetitionSubmissionMetadata(models.Model):
     end_swap_memory_usage = models.TextField(blank=True, null=True)
     end_cpu_usage = models.TextField(blank=True, null=True)
 
+    # JSON-encoded download and extraction times of each bundle staged by the compute worker
+    bundle_timings = models.TextField(blank=True, null=True)
+    bundle_cache_hits = models.IntegerField(blank=True, null=True)
+    bundle_cache_misses = models.IntegerField(blank=True, null=True)
+    # Whether the scoring program ran in a container kept from a previous submission
+    warm_container_reused = models.NullBooleanField()
+
     def _get_json_property_percent(self, name):
         if hasattr(self, name):
             try:
@@ -2011,30 +2642,24 @@ def add_submission_to_leaderboard(submission):
     Adds the given submission to its leaderboard. It is the caller responsiblity to make
     sure the submission is ready to be added (e.g. it's in the finished state).
     """
-    lb, _ = PhaseLeaderBoard.objects.get_or_create(phase=submission.phase)
-
-    logger.info('Adding submission %s to leaderboard %s' % (submission, lb))
-
-    # Currently we only allow one submission into the leaderboard although the leaderboard
-    # is setup to accept multiple submissions from the same participant.
-    if submission.team is not None:
-        # Select all submissions from the team
-        entries = PhaseLeaderBoardEntry.objects.filter(board=lb, result__team=submission.team)
-    else:
-        # Select all submissions from the user
-        entries = PhaseLeaderBoardEntry.objects.filter(board=lb, result__participant=submission.participant)
-
-    for entry in entries:
-        entry.delete()
-    lbe, created = PhaseLeaderBoardEntry.objects.get_or_create(board=lb, result=submission)
+    with update_leaderboard(submission.phase):
+        lb = PhaseLeaderBoard.objects.get(phase=submission.phase)
+
+        logger.info('Adding submission %s to leaderboard %s' % (submission, lb))
+
+        # Currently we only allow one submission into the leaderboard although the leaderboard
+        # is setup to accept multiple submissions from the same participant.
+        if submission.team is not None:
+            # Select all submissions from the team
+            entries = PhaseLeaderBoardEntry.objects.filter(board=lb, result__team=submission.team)
+        else:
+            # Select all submissions from the user
+            entries = PhaseLeaderBoardEntry.objects.filter(board=lb, result__participant=submission.participant)
+
+        for entry in entries:
+            entry.delete()
+        lbe, created = PhaseLeaderBoardEntry.objects.get_or_create(board=lb, result=submission)
     return lbe, created
 
 def get_current_phase(competition):
-    all_phases = competition.phases.all()
-    phase_iterator = iter(all_phases)
-    active_phase = None
-    for phase in phase_iterator:
-        if phase.is_active:
-            active_phase = phase
-            break
-    return active_phase
+    return competition.phase_timeline.current_phase()
@@ -0,0 +1,544 @@
+"""
+Leaderboard ranking engines.
+
+The structures in this module produce the same dense ranks as `CompetitionPhase.rank_values`, including its
+eps tie handling, but can be updated one submission at a time instead of being recomputed from scratch.
+
+`MatrixRanking` ranks a whole leaderboard at once with numpy, when it is installed. Both engines export the
+`state` of an incremental `LeaderboardRanking`, which leaderboard snapshots keep to apply later changes.
+"""
+import bisect
+import math
+
+from decimal import Decimal
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Scores are stored with 10 decimal places, float64 keeps them more than eps apart up to this magnitude and
+# repr() gives back their exact decimal value
+MATRIX_EXACT_LIMIT = 1.0e5
+
+
+class DenseRanking(object):
+    """
+    Dense ranking of ids by value which supports inserting and removing single ids.
+
+    Values are kept in a sorted list of (key, id) pairs, where the key is the value (negated for descending
+    rankings). Like `rank_values`, a new rank starts at a value which differs by more than eps from the first
+    value of the current rank; the keys starting a rank are kept in a second sorted list so the rank of an id
+    is a single bisection.
+    """
+
+    def __init__(self, id_value_pairs=None, sort_ascending=True, eps=1.0e-12):
+        self.sort_ascending = sort_ascending
+        self.eps = eps
+        pairs = id_value_pairs or {}
+        self._load(sorted((self._key(value), id) for id, value in pairs.iteritems()))
+
+    @classmethod
+    def from_entries(cls, entries, sort_ascending=True, eps=1.0e-12):
+        """ Builds a ranking from (key, id) pairs sorted like `entries`, without sorting them again. """
+        ranking = cls(sort_ascending=sort_ascending, eps=eps)
+        ranking._load(entries)
+        return ranking
+
+    def _load(self, entries):
+        self._entries = entries
+        self._keys = dict((id, key) for key, id in entries)
+        self._starts = []
+        current = None
+        for key, _ in entries:
+            if current is None or abs(key - current) > self.eps:
+                self._starts.append(key)
+                current = key
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, id):
+        return id in self._keys
+
+    @property
+    def entries(self):
+        """ The sorted (key, id) pairs of the ranking. """
+        return self._entries
+
+    def _key(self, value):
+        return value if self.sort_ascending else -value
+
+    @property
+    def missing_rank(self):
+        """ The rank given to ids without a value. """
+        return len(self._starts) + 1
+
+    def value(self, id):
+        key = self._keys[id]
+        return key if self.sort_ascending else -key
+
+    def rank(self, id):
+        if id not in self._keys:
+            return self.missing_rank
+        return bisect.bisect_right(self._starts, self._keys[id])
+
+    def ranks(self, ids):
+        """ Returns the ranks of the given ids, like `rank_values(ids, ...)`. """
+        return {id: self.rank(id) for id in ids}
+
+    def add(self, id, value):
+        """
+        Inserts or updates the value of an id.
+
+        :return: List of ids whose rank may have changed, and whether the missing rank changed.
+        """
+        if id in self._keys:
+            affected, _ = self.remove(id)
+        else:
+            affected = []
+        key = self._key(value)
+        self._keys[id] = key
+        index = bisect.bisect_left(self._entries, (key, id))
+        self._entries.insert(index, (key, id))
+        regrouped, shifted = self._regroup(index, key, index + 1)
+        return affected + regrouped, shifted
+
+    def remove(self, id):
+        """
+        Removes an id from the ranking.
+
+        :return: List of ids whose rank may have changed, and whether the missing rank changed.
+        """
+        key = self._keys.pop(id)
+        index = bisect.bisect_left(self._entries, (key, id))
+        del self._entries[index]
+        return self._regroup(index, key, index)
+
+    def _regroup(self, index, changed_key, resume):
+        """
+        Recomputes the rank boundaries after the entry at `index` was inserted or removed.
+
+        Only the ranks starting at the group preceding the change are walked, until a boundary is found which
+        existed before the change; every later boundary is then unchanged.
+        """
+        entries, starts = self._entries, self._starts
+        if index > 0:
+            previous_key = entries[index - 1][0]
+            start_key = starts[bisect.bisect_right(starts, previous_key) - 1]
+            first = bisect.bisect_left(entries, (start_key,))
+        else:
+            first = 0
+        low_key = changed_key
+        if first < len(entries):
+            low_key = min(low_key, entries[first][0])
+
+        new_starts = []
+        current = None
+        position = first
+        resynced = False
+        while position < len(entries):
+            key = entries[position][0]
+            if current is None or abs(key - current) > self.eps:
+                if position > first and position >= resume and self._is_start(key):
+                    resynced = True
+                    break
+                new_starts.append(key)
+                current = key
+            position += 1
+
+        low = bisect.bisect_left(starts, low_key)
+        high = bisect.bisect_left(starts, entries[position][0]) if resynced else len(starts)
+        shifted = len(new_starts) != high - low
+        starts[low:high] = new_starts
+
+        end = len(entries) if shifted else position
+        return [id for _, id in entries[first:end]], shifted
+
+    def _is_start(self, key):
+        index = bisect.bisect_left(self._starts, key)
+        return index < len(self._starts) and self._starts[index] == key
+
+
+class LeaderboardRanking(object):
+    """
+    Ranks of all submissions of a leaderboard, per score definition.
+
+    Non computed score definitions are ranked by their values. Computed score definitions (the 'Avg'
+    operation) are ranked by the average rank of their dependencies and are kept up to date as
+    submissions are added or removed.
+
+    Values are ranked as floats, which is much faster than comparing decimals and gives the same ranks for
+    scores within `MATRIX_EXACT_LIMIT`; columns holding larger values are ranked with the values as given.
+    """
+
+    def __init__(self, submission_ids, scoredefs, computed_deps, values, eps=1.0e-12):
+        """
+        :param submission_ids: Ids of the submissions on the leaderboard.
+        :param scoredefs: Maps the id of each non computed score definition to True when sorted ascending.
+        :param computed_deps: Maps the id of each computed score definition to a (sort ascending, list of
+            dependency ids) tuple.
+        :param values: Maps the id of non computed score definitions to {submission id: value} dicts.
+        """
+        self.eps = eps
+        self.submission_ids = set(submission_ids)
+        self.scoredefs = scoredefs
+        self.computed_deps = computed_deps
+        self.exact = set()
+        self.rankings = {}
+        for sdef_id, sort_ascending in scoredefs.iteritems():
+            sdef_values = values.get(sdef_id, {})
+            pairs = {id: float(v) for id, v in sdef_values.iteritems() if id in self.submission_ids}
+            if any(abs(v) > MATRIX_EXACT_LIMIT for v in pairs.itervalues()):
+                self.exact.add(sdef_id)
+                pairs = {id: sdef_values[id] for id in pairs}
+            self.rankings[sdef_id] = DenseRanking(pairs, sort_ascending=sort_ascending, eps=eps)
+        self.averages = {}
+        for sdef_id in computed_deps:
+            self._rank_averages(sdef_id)
+
+    def state(self):
+        """
+        Returns the ranking as JSON serializable data, `from_state` builds the ranking back from it.
+        """
+        return {
+            'eps': self.eps,
+            'submission_ids': list(self.submission_ids),
+            'scoredefs': [
+                [sdef_id, sort_ascending, sdef_id in self.exact, _state_entries(self.rankings[sdef_id])]
+                for sdef_id, sort_ascending in self.scoredefs.iteritems()
+            ],
+            'computed': [
+                [sdef_id, sort_ascending, deps, _state_entries(self.rankings[sdef_id])]
+                for sdef_id, (sort_ascending, deps) in self.computed_deps.iteritems()
+            ],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """ Builds a ranking from the data returned by `state`. """
+        ranking = cls([], {}, {}, {}, eps=state['eps'])
+        ranking.submission_ids = set(state['submission_ids'])
+        for sdef_id, sort_ascending, exact, entries in state['scoredefs']:
+            ranking.scoredefs[sdef_id] = sort_ascending
+            if exact:
+                ranking.exact.add(sdef_id)
+                entries = [(Decimal(key), id) for key, id in entries]
+            else:
+                entries = [(key, id) for key, id in entries]
+            ranking.rankings[sdef_id] = DenseRanking.from_entries(entries, sort_ascending, ranking.eps)
+        for sdef_id, sort_ascending, deps, entries in state['computed']:
+            ranking.computed_deps[sdef_id] = (sort_ascending, deps)
+            computed = DenseRanking.from_entries([(key, id) for key, id in entries], sort_ascending, ranking.eps)
+            ranking.rankings[sdef_id] = computed
+            ranking.averages[sdef_id] = {id: computed.value(id) for id in ranking.submission_ids}
+        return ranking
+
+    def _average(self, deps, id):
+        return sum([self.rankings[d].rank(id) for d in deps]) / float(len(deps))
+
+    def _rank_averages(self, sdef_id):
+        sort_ascending, deps = self.computed_deps[sdef_id]
+        self.averages[sdef_id] = {id: self._average(deps, id) for id in self.submission_ids}
+        self.rankings[sdef_id] = DenseRanking(self.averages[sdef_id], sort_ascending=sort_ascending, eps=self.eps)
+
+    def has_values(self, sdef_id):
+        """ Indicates whether any submission has a value for the given score definition. """
+        return len(self.rankings[sdef_id]) > 0
+
+    def ranks(self, sdef_id):
+        """ Returns {submission id: rank} for every submission. """
+        return self.rankings[sdef_id].ranks(self.submission_ids)
+
+    def values(self, sdef_id):
+        """
+        Returns {submission id: value} for the submissions having a value, as floats for columns ranked by
+        their float values.
+        """
+        if sdef_id in self.averages:
+            return self.averages[sdef_id]
+        ranking = self.rankings[sdef_id]
+        return {id: ranking.value(id) for id in self.submission_ids if id in ranking}
+
+    def formatted_values(self, sdef_id, digits):
+        """
+        Returns {submission id: value with the given number of decimals} for the submissions having a value.
+
+        Scores ranked as floats are formatted from their float, except for the values halfway between two
+        roundings (see `MatrixRanking.formatted_values`), which are formatted from their exact decimal value.
+        """
+        format_value = ("{:.%df}" % digits).format
+        values = self.values(sdef_id)
+        if sdef_id in self.averages or sdef_id in self.exact or digits >= 10:
+            return {id: format_value(v) for id, v in values.iteritems()}
+        scale = 10 ** digits
+        tolerance = 0.5 * 10 ** (digits - 10)
+        formatted = {}
+        for id, v in values.iteritems():
+            scaled = v * scale
+            if abs(scaled - math.floor(scaled) - 0.5) <= tolerance:
+                formatted[id] = format_value(Decimal(repr(v)))
+            else:
+                formatted[id] = format_value(v)
+        return formatted
+
+    def add_submission(self, submission_id, values):
+        """
+        Adds (or replaces) a submission and its {scoredef id: value} scores.
+
+        :return: Set of submission ids whose ranks may have changed.
+        """
+        # Replaced values free their slots, which can change the ranks of other submissions
+        changed = self._drop_values(submission_id)
+        self.submission_ids.add(submission_id)
+        for sdef_id, value in values.iteritems():
+            if sdef_id in self.rankings and sdef_id not in self.computed_deps:
+                if sdef_id not in self.exact:
+                    if abs(value) > MATRIX_EXACT_LIMIT:
+                        self._make_exact(sdef_id)
+                    else:
+                        value = float(value)
+                ids, shifted = self.rankings[sdef_id].add(submission_id, value)
+                if sdef_id in changed:
+                    dropped_ids, dropped_shifted = changed[sdef_id]
+                    ids, shifted = dropped_ids + ids, dropped_shifted or shifted
+                changed[sdef_id] = ids, shifted
+        affected = self._update_computed(changed, extra_ids=[submission_id])
+        affected.add(submission_id)
+        return affected
+
+    def remove_submission(self, submission_id):
+        """
+        Removes a submission from the leaderboard.
+
+        :return: Set of submission ids whose ranks may have changed.
+        """
+        changed = self._drop_values(submission_id)
+        self.submission_ids.discard(submission_id)
+        for sdef_id in self.computed_deps:
+            self.averages[sdef_id].pop(submission_id, None)
+            if submission_id in self.rankings[sdef_id]:
+                changed[sdef_id] = self.rankings[sdef_id].remove(submission_id)
+        affected = self._update_computed(changed)
+        affected.discard(submission_id)
+        return affected
+
+    def _make_exact(self, sdef_id):
+        # Float keys within the limit convert back to their exact decimal value, in the same order
+        ranking = self.rankings[sdef_id]
+        entries = [(Decimal(repr(key)), id) for key, id in ranking.entries]
+        self.rankings[sdef_id] = DenseRanking.from_entries(entries, ranking.sort_ascending, self.eps)
+        self.exact.add(sdef_id)
+
+    def _drop_values(self, submission_id):
+        changed = {}
+        for sdef_id, ranking in self.rankings.iteritems():
+            if sdef_id not in self.computed_deps and submission_id in ranking:
+                changed[sdef_id] = ranking.remove(submission_id)
+        return changed
+
+    def _affected_ids(self, sdef_id, ids, shifted):
+        affected = set(ids)
+        if shifted:
+            # Submissions without a value take the rank after the last one
+            ranking = self.rankings[sdef_id]
+            affected.update(id for id in self.submission_ids if id not in ranking)
+        return affected
+
+    def _update_computed(self, changed, extra_ids=()):
+        affected = set()
+        dep_affected = {}
+        for sdef_id, (ids, shifted) in changed.iteritems():
+            dep_affected[sdef_id] = self._affected_ids(sdef_id, ids, shifted)
+            affected.update(dep_affected[sdef_id])
+        for sdef_id, (_, deps) in self.computed_deps.iteritems():
+            stale = set(extra_ids)
+            for d in deps:
+                stale.update(dep_affected.get(d, ()))
+            stale &= self.submission_ids
+            if len(stale) * 8 > len(self.submission_ids):
+                # A new rank in a dependency moves every rank after it, ranking the averages again is cheaper
+                # than moving most of them one at a time
+                self._rank_averages(sdef_id)
+                affected.update(self.submission_ids)
+                continue
+            ranking = self.rankings[sdef_id]
+            for id in stale:
+                average = self._average(deps, id)
+                self.averages[sdef_id][id] = average
+                ids, _ = ranking.add(id, average)
+                # Every submission has an average, no id takes the missing rank
+                affected.update(ids)
+        return affected
+
+
+def _state_entries(ranking):
+    # Decimal keys of exact columns are kept as strings
+    return [[key if isinstance(key, float) else str(key), id] for key, id in ranking.entries]
+
+
+def dense_rank(column, sort_ascending=True, eps=1.0e-12):
+    """
+    Vectorized `rank_values` over a numpy column, where NaN marks a missing value.
+
+    Consecutive sorted values more than eps apart start a new rank. This only differs from the chained
+    comparison of `rank_values` when a rank spans more than eps, in which case that column is ranked
+    with the sequential loop.
+    """
+    ranks = numpy.empty(len(column), dtype=numpy.int64)
+    missing = numpy.isnan(column)
+    present = numpy.flatnonzero(~missing)
+    if len(present) == 0:
+        ranks.fill(1)
+        return ranks
+    keys = column[present] if sort_ascending else -column[present]
+    order = numpy.argsort(keys, kind='mergesort')
+    sorted_keys = keys[order]
+    new_rank = numpy.empty(len(sorted_keys), dtype=bool)
+    new_rank[0] = True
+    new_rank[1:] = numpy.diff(sorted_keys) > eps
+    starts = numpy.flatnonzero(new_rank)
+    ends = numpy.append(starts[1:], len(sorted_keys)) - 1
+    if numpy.any(sorted_keys[ends] - sorted_keys[starts] > eps):
+        current = sorted_keys[0]
+        for i in xrange(1, len(sorted_keys)):
+            new_rank[i] = abs(sorted_keys[i] - current) > eps
+            if new_rank[i]:
+                current = sorted_keys[i]
+    sorted_ranks = numpy.cumsum(new_rank)
+    ranks[present[order]] = sorted_ranks
+    ranks[missing] = sorted_ranks[-1] + 1
+    return ranks
+
+
+class MatrixRanking(object):
+    """
+    Ranks of all submissions of a leaderboard computed with numpy.
+
+    Scores are loaded into a dense submissions x scoredefs array, each column is ranked in a vectorized
+    pass and computed 'Avg' columns are averaged over whole rank columns. Takes the same arguments and
+    gives the same `ranks`, `formatted_values` and `state` as `LeaderboardRanking`, but cannot be updated
+    incrementally.
+    """
+
+    def __init__(self, submission_ids, scoredefs, computed_deps, values, eps=1.0e-12):
+        self.eps = eps
+        self.submission_ids = list(submission_ids)
+        self.scoredefs = scoredefs
+        self.computed_deps = computed_deps
+        self._values = values
+        index = {id: i for i, id in enumerate(self.submission_ids)}
+        sdef_ids = list(scoredefs)
+        matrix = numpy.empty((len(self.submission_ids), len(sdef_ids)))
+        matrix.fill(numpy.nan)
+        for column, sdef_id in enumerate(sdef_ids):
+            for id, value in values.get(sdef_id, {}).iteritems():
+                if id in index:
+                    matrix[index[id], column] = value
+
+        self._matrix = matrix
+        self._columns = {sdef_id: column for column, sdef_id in enumerate(sdef_ids)}
+        self._exact_rankings = {}
+        self._ranks = {}
+        for column, sdef_id in enumerate(sdef_ids):
+            present = matrix[:, column][~numpy.isnan(matrix[:, column])]
+            if len(present) > 0 and numpy.abs(present).max() > MATRIX_EXACT_LIMIT:
+                ranking = DenseRanking(
+                    {id: v for id, v in values[sdef_id].iteritems() if id in index},
+                    sort_ascending=scoredefs[sdef_id],
+                    eps=eps
+                )
+                self._exact_rankings[sdef_id] = ranking
+                self._ranks[sdef_id] = numpy.array([ranking.rank(id) for id in self.submission_ids])
+            else:
+                self._ranks[sdef_id] = dense_rank(matrix[:, column], scoredefs[sdef_id], eps)
+
+        self._averages = {}
+        for sdef_id, (sort_ascending, deps) in computed_deps.iteritems():
+            self._averages[sdef_id] = sum([self._ranks[d] for d in deps]) / float(len(deps))
+            self._ranks[sdef_id] = dense_rank(self._averages[sdef_id], sort_ascending, eps)
+
+    def has_values(self, sdef_id):
+        """ Indicates whether any submission has a value for the given score definition. """
+        if sdef_id in self._averages:
+            return len(self.submission_ids) > 0
+        return not numpy.isnan(self._matrix[:, self._columns[sdef_id]]).all()
+
+    def ranks(self, sdef_id):
+        """ Returns {submission id: rank} for every submission. """
+        return dict(zip(self.submission_ids, self._ranks[sdef_id].tolist()))
+
+    def values(self, sdef_id):
+        """ Returns {submission id: value} for the submissions having a value. """
+        if sdef_id in self._averages:
+            return dict(zip(self.submission_ids, self._averages[sdef_id].tolist()))
+        return self._values.get(sdef_id, {})
+
+    def formatted_values(self, sdef_id, digits):
+        """
+        Returns {submission id: value with the given number of decimals} for the submissions having a value.
+
+        Decimal scores are formatted from their float64 copy in the matrix, which is much faster and rounds
+        the same way except for values exactly halfway between two roundings (float64 may fall on either
+        side of it). Those are found for the whole column at once and formatted from the original value.
+        """
+        format_value = ("{:.%df}" % digits).format
+        if sdef_id in self._averages:
+            return dict(zip(self.submission_ids, [format_value(v) for v in self._averages[sdef_id].tolist()]))
+        if sdef_id in self._exact_rankings or sdef_id not in self._columns:
+            return {id: format_value(v) for id, v in self._values.get(sdef_id, {}).iteritems()}
+
+        column = self._matrix[:, self._columns[sdef_id]]
+        present = numpy.flatnonzero(~numpy.isnan(column))
+        floats = column[present]
+        ids = [self.submission_ids[i] for i in present.tolist()]
+        formatted = [format_value(v) for v in floats.tolist()]
+        if digits < 10:
+            # Scores have 10 decimal places: the fraction of a halfway value is 0.5 within the float64 error,
+            # any other one is at least 10 ** (digits - 10) away from it
+            scaled = floats * 10 ** digits
+            halfway = numpy.abs(scaled - numpy.floor(scaled) - 0.5) <= 0.5 * 10 ** (digits - 10)
+            values = self._values[sdef_id]
+            for position in numpy.flatnonzero(halfway).tolist():
+                formatted[position] = format_value(values[ids[position]])
+        return dict(zip(ids, formatted))
+
+    def state(self):
+        """
+        Returns the state of a `LeaderboardRanking` of the same leaderboard, sorting the columns with numpy.
+        """
+        ids = numpy.array(self.submission_ids, dtype=numpy.int64)
+        scoredefs = []
+        for sdef_id, sort_ascending in self.scoredefs.iteritems():
+            if sdef_id in self._exact_rankings:
+                entries = _state_entries(self._exact_rankings[sdef_id])
+            else:
+                entries = self._sorted_entries(ids, self._matrix[:, self._columns[sdef_id]], sort_ascending)
+            scoredefs.append([sdef_id, sort_ascending, sdef_id in self._exact_rankings, entries])
+        computed = []
+        for sdef_id, (sort_ascending, deps) in self.computed_deps.iteritems():
+            entries = self._sorted_entries(ids, self._averages[sdef_id], sort_ascending)
+            computed.append([sdef_id, sort_ascending, deps, entries])
+        return {
+            'eps': self.eps,
+            'submission_ids': self.submission_ids,
+            'scoredefs': scoredefs,
+            'computed': computed,
+        }
+
+    @staticmethod
+    def _sorted_entries(ids, column, sort_ascending):
+        present = numpy.flatnonzero(~numpy.isnan(column))
+        keys = column[present] if sort_ascending else -column[present]
+        # Sorted by key then id, like the (key, id) pairs of a DenseRanking
+        order = numpy.lexsort((ids[present], keys))
+        return zip(keys[order].tolist(), ids[present][order].tolist())
+
+
+def leaderboard_ranking(submission_ids, scoredefs, computed_deps, values, eps=1.0e-12):
+    """
+    Ranks a leaderboard with numpy when it is installed, see `LeaderboardRanking` for the arguments.
+    """
+    if numpy is not None:
+        return MatrixRanking(submission_ids, scoredefs, computed_deps, values, eps=eps)
+    return LeaderboardRanking(submission_ids, scoredefs, computed_deps, values, eps=eps)
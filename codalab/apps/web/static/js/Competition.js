@@ -141,6 +141,10 @@ var Competition;
             cache: false,
             success: function(data) {
                 $('.competition_results').html('').append(data);
+                $('.leaderboard-results-download').click(function(e) {
+                    e.preventDefault();
+                    Competition.downloadLeaderboardResults($(this));
+                });
                 $('.column-selectable').click(function(e) {
                     var table = $(this).closest('table');
                     $(table).find('.column-selected').removeClass();
@@ -177,6 +181,40 @@ var Competition;
         });
     };
 
+    // The archive is built by a site worker, poll its status until it can be downloaded
+    Competition.downloadLeaderboardResults = function(btn) {
+        if (btn.hasClass('disabled')) {
+            return;
+        }
+        var label = btn.text();
+        btn.addClass('disabled').text('Preparing archive...');
+        var poll = function(url) {
+            $.ajax({
+                type: 'GET',
+                url: url,
+                cache: false,
+                dataType: 'json',
+                success: function(data) {
+                    if (data.status === 'finished') {
+                        btn.removeClass('disabled').text(label);
+                        window.location = data.url;
+                    } else if (data.status === 'failed') {
+                        btn.removeClass('disabled').text('Preparing the archive failed, try again');
+                    } else {
+                        if (data.total) {
+                            btn.text('Preparing archive... ' + Math.round(100 * data.progress / data.total) + '%');
+                        }
+                        setTimeout(function() { poll(data.status_url); }, 2000);
+                    }
+                },
+                error: function(xhr, status, err) {
+                    btn.removeClass('disabled').text('Preparing the archive failed, try again');
+                }
+            });
+        };
+        poll(btn.attr('href'));
+    };
+
     Competition.getPublicPhaseSubmisisons = function(competitionId, phaseId) {
         var public_result_phase = 'public_results_phase_' + phaseId;
         $('#results_phase_submissions .btn').removeClass('selected').removeClass('active');
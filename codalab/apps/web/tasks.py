@@ -2,10 +2,13 @@
 Defines background tasks needed by the web site.
 """
 import csv
-import io
+import datetime
+import hashlib
 import json
 import logging
 import StringIO
+import tempfile
+import urllib
 import zipfile
 
 from urllib import pathname2url
@@ -17,23 +20,33 @@ from celery.app import app_or_default
 from celery.exceptions import SoftTimeLimitExceeded
 from django.conf import settings
 from django.contrib.sites.models import get_current_site
+from django.core.cache import cache
+from django.core.files import File
 from django.core.files.base import ContentFile
 from django.core.mail import get_connection, EmailMultiAlternatives, send_mail
-from django.db import transaction
-from django.db.models import Count
+from django.db import IntegrityError, transaction
+from django.db.backends.util import format_number
+from django.db.models import Count, F, Max, Min
 from django.template import Context
 from django.template.loader import render_to_string
+from django.utils.timezone import now
 from django.contrib.sites.models import Site
 from apps.jobs.models import (Job,
                               run_job_task,
                               JobTaskResult,
                               getQueue, update_job_status_task)
 from apps.web.models import (add_submission_to_leaderboard,
+                             copy_submissions,
+                             CachedSubmissionResult,
+                             FileDigest,
+                             invalidate_leaderboards,
                              Competition,
                              CompetitionSubmission,
                              CompetitionDefBundle,
                              CompetitionSubmissionStatus,
                              CompetitionPhase,
+                             PhaseLeaderBoard,
+                             PhaseLeaderBoardEntry,
                              submission_prediction_output_filename,
                              submission_output_filename,
                              submission_detailed_results_filename,
@@ -47,12 +60,15 @@ from apps.web.models import (add_submission_to_leaderboard,
                              predict_submission_stderr_filename,
                              SubmissionScore,
                              SubmissionScoreDef,
+                             update_leaderboard,
                              CompetitionSubmissionMetadata, BundleStorage)
 from apps.coopetitions.models import DownloadRecord
+from apps.web.utils import HttpRangeFile, parse_scores
+from apps.web.zipstream import CHUNK_SIZE, FileSource, ZipStreamWriter, members_digest, prefetch
 
 import time
 # import cProfile
-from codalab.azure_storage import make_blob_sas_url
+from codalab.azure_storage import get_blob_sas_signer
 from codalabtools.compute.worker import get_run_func
 
 logger = logging.getLogger(__name__)
@@ -127,7 +143,7 @@ def _set_submission_status(submission_id, status_codename):
     status_codename: New status codename.
     """
     status = CompetitionSubmissionStatus.objects.get(codename=status_codename)
-    with transaction.commit_on_success():
+    with transaction.atomic():
         submission = CompetitionSubmission.objects.select_for_update().get(pk=submission_id)
         old_status_codename = submission.status.codename
         if old_status_codename not in _FINAL_STATES:
@@ -175,9 +191,11 @@ def predict(submission, job_id):
     logger.info("Running prediction")
 
     if len(input_value) > 0:
-        lines.append("input: %s" % _make_url_sassy(input_value))
-    lines.append("stdout: %s" % _make_url_sassy(submission.prediction_stdout_file.name, permission='w'))
-    lines.append("stderr: %s" % _make_url_sassy(submission.prediction_stderr_file.name, permission='w'))
+        lines.append("input: %s" % _make_url_sassy(input_value, immutable=True))
+    stdout_url, stderr_url = _make_urls_sassy([submission.prediction_stdout_file.name,
+                                               submission.prediction_stderr_file.name], permission='w')
+    lines.append("stdout: %s" % stdout_url)
+    lines.append("stderr: %s" % stderr_url)
     submission.prediction_runfile.save('run.txt', ContentFile('\n'.join(lines)))
 
     # Store workflow state
@@ -191,6 +209,32 @@ def predict(submission, job_id):
     _set_submission_status(submission.id, CompetitionSubmissionStatus.SUBMITTED)
 
 
+def _queued_docker_images(queue, limit=settings.DOCKER_PREFETCH_IMAGES):
+    """
+    Returns the docker images that the submissions waiting on the given compute queue will run, the ones
+    submitted first coming first, so the compute workers can pull them ahead of time.
+    """
+    images = []
+    waiting = CompetitionSubmission.objects.filter(
+        status__codename=CompetitionSubmissionStatus.SUBMITTED,
+        phase__competition__queue=queue,
+    ).order_by('submitted_at').values_list(
+        'docker_image',
+        'phase__default_docker_image',
+        'phase__scoring_program_docker_image',
+        'phase__is_scoring_only',
+    )[:limit * 10]
+    for docker_image, default_docker_image, scoring_program_docker_image, is_scoring_only in waiting:
+        if not is_scoring_only:
+            images.append(docker_image or default_docker_image or settings.DOCKER_DEFAULT_WORKER_IMAGE)
+        images.append(scoring_program_docker_image or settings.DOCKER_DEFAULT_WORKER_IMAGE)
+    unique_images = []
+    for image in images:
+        if image not in unique_images:
+            unique_images.append(image)
+    return unique_images[:limit]
+
+
 def _prepare_compute_worker_run(job_id, submission, is_prediction):
     """Kicks off the compute_worker_run task passing job id, submission container details, and "is prediction
     or scoring" flag to compute worker"""
@@ -200,15 +244,19 @@ def _prepare_compute_worker_run(job_id, submission, is_prediction):
         stderr = submission.prediction_stderr_file.name
         output = submission.prediction_output_file.name
         docker_image = submission.docker_image or submission.phase.default_docker_image or \
-                       settings.DEFAULT_WORKER_DOCKER_IMAGE
+                       settings.DOCKER_DEFAULT_WORKER_IMAGE
     else:
         # Scoring, if we're not predicting
         bundle_url = submission.runfile.name
         stdout = submission.stdout_file.name
         stderr = submission.stderr_file.name
         output = submission.output_file.name
-        docker_image = submission.phase.scoring_program_docker_image or settings.DEFAULT_WORKER_DOCKER_IMAGE
+        docker_image = submission.phase.scoring_program_docker_image or settings.DOCKER_DEFAULT_WORKER_IMAGE
 
+    stdout_url, stderr_url, output_url, detailed_results_url, private_output_url = _make_urls_sassy(
+        [stdout, stderr, output, submission.detailed_results_file.name, submission.private_output_file.name],
+        permission='w'
+    )
     data = {
         "id": job_id,
         "task_type": "run",
@@ -216,14 +264,18 @@ def _prepare_compute_worker_run(job_id, submission, is_prediction):
             "submission_id": submission.pk,
             "docker_image": docker_image,
             "bundle_url": _make_url_sassy(bundle_url),
-            "stdout_url": _make_url_sassy(stdout, permission='w'),
-            "stderr_url": _make_url_sassy(stderr, permission='w'),
-            "output_url": _make_url_sassy(output, permission='w'),
-            "detailed_results_url": _make_url_sassy(submission.detailed_results_file.name, permission='w'),
-            "private_output_url": _make_url_sassy(submission.private_output_file.name, permission='w'),
+            "stdout_url": stdout_url,
+            "stderr_url": stderr_url,
+            "output_url": output_url,
+            "detailed_results_url": detailed_results_url,
+            "private_output_url": private_output_url,
             "secret": submission.secret,
             "execution_time_limit": submission.phase.execution_time_limit,
             "predict": is_prediction,
+            "prefetch_docker_images": _queued_docker_images(submission.phase.competition.queue),
+            # Scoring programs of scoring only phases may run in a container kept from the previous submissions
+            "warm_container": (not is_prediction and submission.phase.is_scoring_only and
+                               submission.phase.warm_scoring_container),
         }
     }
 
@@ -256,7 +308,13 @@ def compute_worker_run(data):
         update_submission.apply_async((data["id"], {'status': 'failed'}, data['task_args']['secret']))
 
 
-def _make_url_sassy(path, permission='r', duration=60 * 60 * 24):
+def _signed_url_lifetime(duration):
+    """ Returns the number of seconds URLs signed for the given duration are valid. """
+    # Presigned S3 URLs take the duration in seconds, Azure SAS URLs in minutes
+    return duration if settings.USE_AWS else duration * 60
+
+
+def _sign_urls(paths, permission, duration):
     if settings.USE_AWS:
         if permission == 'r':
             # GET instead of r (read) for AWS
@@ -268,86 +326,91 @@ def _make_url_sassy(path, permission='r', duration=60 * 60 * 24):
             # Default to get if we don't know
             method = 'GET'
 
-        # Remove the beginning of the URL (before bucket name) so we just have the path to the file
-        path = path.split(settings.AWS_STORAGE_PRIVATE_BUCKET_NAME)[-1]
-
-        # Spaces replaced with +'s, so we have to replace those...
-        path = path.replace('+', ' ')
-
-        return BundleStorage.connection.generate_url(
-            expires_in=duration,
-            method=method,
-            bucket=settings.AWS_STORAGE_PRIVATE_BUCKET_NAME,
-            key=path,
-            query_auth=True,
-        )
+        urls = []
+        for path in paths:
+            # Remove the beginning of the URL (before bucket name) so we just have the path to the file
+            path = path.split(settings.AWS_STORAGE_PRIVATE_BUCKET_NAME)[-1]
+
+            # Spaces replaced with +'s, so we have to replace those...
+            path = path.replace('+', ' ')
+
+            urls.append(BundleStorage.connection.generate_url(
+                expires_in=duration,
+                method=method,
+                bucket=settings.AWS_STORAGE_PRIVATE_BUCKET_NAME,
+                key=path,
+                query_auth=True,
+            ))
+        return urls
     else:
-        sassy_url = make_blob_sas_url(
-            settings.BUNDLE_AZURE_ACCOUNT_NAME,
-            settings.BUNDLE_AZURE_ACCOUNT_KEY,
-            settings.BUNDLE_AZURE_CONTAINER,
-            path,
-            permission=permission,
-            duration=duration
-        )
+        signer = get_blob_sas_signer(settings.BUNDLE_AZURE_ACCOUNT_NAME, settings.BUNDLE_AZURE_ACCOUNT_KEY)
+        sassy_urls = signer.sign(settings.BUNDLE_AZURE_CONTAINER, paths, permission=permission, duration=duration)
 
         # Ugly way to check if we didn't get the path, should work...
-        if '<Code>InvalidUri</Code>' not in sassy_url:
-            return sassy_url
-        else:
-            return ''
+        return [sassy_url if '<Code>InvalidUri</Code>' not in sassy_url else '' for sassy_url in sassy_urls]
 
 
-def score(submission, job_id):
+def _make_urls_sassy(paths, permission='r', duration=60 * 60 * 24, immutable=False):
     """
-    Dispatches the scoring task for the given submission to an appropriate compute worker.
+    Signs URLs for the given bundle storage paths, all at once.
 
-    submission: The CompetitionSubmission object.
-    job_id: The job ID used to track the progress of the evaluation.
+    paths: Paths of the blobs.
+    permission: 'r' or 'w'.
+    duration: Validity of the URLs, in seconds on S3 and in minutes on Azure.
+    immutable: Whether the blobs never change, like the uploads named with a uuid. Their read-only URLs
+        are cached until settings.SIGNED_URL_CACHE_MARGIN seconds before they expire.
+
+    Returns: The signed URLs, in the order of paths.
     """
-    # profile = cProfile.Profile()
-    start = time.time()
-    # profile.enable()
-    # Loads the computation state.
-    state = {}
-    if len(submission.execution_key) > 0:
-        state = json.loads(submission.execution_key)
-    has_generated_predictions = 'predict' in state
+    cache_timeout = _signed_url_lifetime(duration) - settings.SIGNED_URL_CACHE_MARGIN
+    if not immutable or permission != 'r' or cache_timeout <= 0:
+        return _sign_urls(paths, permission, duration)
 
-    #generate metadata-only bundle describing the history of submissions and phases
-    last_submissions = CompetitionSubmission.objects.filter(
-        participant=submission.participant,
-        status__codename=CompetitionSubmissionStatus.FINISHED
-    ).order_by('-submitted_at')
+    cache_keys = ['signed_url:%s' % hashlib.sha1('%s:%s' % (duration, path)).hexdigest() for path in paths]
+    cached = cache.get_many(cache_keys)
+    missing = [(cache_key, path) for cache_key, path in zip(cache_keys, paths) if cache_key not in cached]
+    if missing:
+        urls = _sign_urls([path for _, path in missing], permission, duration)
+        signed = dict((cache_key, url) for (cache_key, _), url in zip(missing, urls) if url)
+        cache.set_many(signed, cache_timeout)
+        cached.update(signed)
+    return [cached.get(cache_key, '') for cache_key in cache_keys]
 
 
-    lines = []
-    # lines.append("description: history of all previous successful runs output files")
-    #
-    # if last_submissions:
-    #     for past_submission in last_submissions:
-    #         if past_submission.pk != submission.pk:
-    #             #pad folder numbers for sorting os side, 001, 002, 003,... 010, etc...
-    #             past_submission_phasenumber = '%03d' % past_submission.phase.phasenumber
-    #             past_submission_number = '%03d' % past_submission.submission_number
-    #             lines.append('%s/%s/output/: %s' % (
-    #                     past_submission_phasenumber,
-    #                     past_submission_number,
-    #                     submission_private_output_filename(past_submission),
-    #                 )
-    #             )
-
-
-    submission.history_file.save('history.txt', ContentFile('\n'.join(lines)))
-
-    score_csv = submission.phase.competition.get_results_csv(submission.phase.pk)
-    submission.scores_file.save('scores.txt', ContentFile(score_csv))
-
-    # Extra submission info
+def _make_url_sassy(path, permission='r', duration=60 * 60 * 24, immutable=False):
+    return _make_urls_sassy([path], permission=permission, duration=duration, immutable=immutable)[0]
+
+
+def _coopetition_key(competition_pk):
+    """
+    Returns the key identifying the current state of the coopetition data of a competition: the version bumped
+    by submissions, likes and downloads, and the versions of the leaderboards, bumped by score changes.
+    """
+    version = Competition.objects.filter(pk=competition_pk).values_list('coopetition_version', flat=True)[0]
+    # Leaderboards created by reading the scores start at version 0 and don't change the key
+    board_versions = PhaseLeaderBoard.objects.filter(phase__competition=competition_pk, version__gt=0).order_by(
+        'phase'
+    ).values_list('phase', 'version')
+    return hashlib.sha1('%s:%s' % (version, list(board_versions))).hexdigest()
+
+
+def build_coopetition_file(competition_pk):
+    """
+    Builds the coopetition bundle of a competition: the finished submissions, the scores and the downloads
+    of every phase. current_user.txt is added by the compute worker, as it differs between submissions.
+
+    competition_pk: The ID of the Competition.
+
+    Returns: The name of the saved bundle.
+    """
+    # Taken first so changes made while building mark the bundle as stale
+    key = _coopetition_key(competition_pk)
+    competition = Competition.objects.get(pk=competition_pk)
+
     coopetition_zip_buffer = StringIO.StringIO()
     coopetition_zip_file = zipfile.ZipFile(coopetition_zip_buffer, "w")
 
-    phases_list = submission.phase.competition.phases.all()
+    phases_list = competition.phases.all()
 
     for phase in phases_list:
         coopetition_field_names = (
@@ -379,7 +442,7 @@ def score(submission, job_id):
     for phase in phases_list:
         coopetition_zip_file.writestr(
             'coopetition_scores_phase_%s.txt' % phase.phasenumber,
-            phase.competition.get_results_csv(phase.pk, include_scores_not_on_leaderboard=True).encode('utf-8')
+            competition.get_results_csv(phase.pk, include_scores_not_on_leaderboard=True).encode('utf-8')
         )
 
     # Download metadata
@@ -391,22 +454,187 @@ def score(submission, job_id):
         "downloaded_by",
         "time_of_download",
     ))
-    for download in DownloadRecord.objects.filter(submission__phase__competition=submission.phase.competition):
-        writer.writerow((
-            download.submission.pk,
-            download.submission.participant.user.username,
-            download.user.username,
-            str(download.timestamp),
-        ))
+    downloads = DownloadRecord.objects.filter(submission__phase__competition=competition).values_list(
+        'submission', 'submission__participant__user__username', 'user__username', 'timestamp'
+    )
+    for submission_pk, owner, downloaded_by, timestamp in downloads:
+        writer.writerow((submission_pk, owner, downloaded_by, str(timestamp)))
 
     coopetition_zip_file.writestr('coopetition_downloads.txt', coopetition_downloads_csv.getvalue().encode('utf-8'))
-
-    # Current user
-    coopetition_zip_file.writestr('current_user.txt', submission.participant.user.username.encode('utf-8'))
     coopetition_zip_file.close()
 
-    # Save them all
-    submission.coopetition_file.save('coopetition.zip', ContentFile(coopetition_zip_buffer.getvalue()))
+    # Only the bundle fields are updated, the competition may have been edited meanwhile
+    competition.coopetition_file.save('coopetition.zip', ContentFile(coopetition_zip_buffer.getvalue()), save=False)
+    Competition.objects.filter(pk=competition_pk).update(
+        coopetition_file=competition.coopetition_file.name,
+        coopetition_built_key=key
+    )
+    return competition.coopetition_file.name
+
+
+@task(queue='site-worker')
+def update_coopetition_file(competition_pk):
+    """
+    Rebuilds the coopetition bundle of a competition when it is stale.
+    """
+    if Competition.objects.filter(pk=competition_pk, coopetition_built_key=_coopetition_key(competition_pk)).exists():
+        return
+    build_coopetition_file(competition_pk)
+
+
+def get_coopetition_file_name(competition):
+    """
+    Returns the name of the coopetition bundle of a competition. The bundle is built on the first call, later
+    ones get the latest bundle and schedule a rebuild when it is stale, at most once per
+    settings.COOPETITION_REBUILD_INTERVAL, so scoring submissions never waits for it.
+
+    competition: The Competition object.
+    """
+    name, built_key = Competition.objects.filter(pk=competition.pk).values_list(
+        'coopetition_file', 'coopetition_built_key'
+    )[0]
+    if not name:
+        return build_coopetition_file(competition.pk)
+    if built_key != _coopetition_key(competition.pk):
+        if cache.add('coopetition_build:%s' % competition.pk, True, settings.COOPETITION_REBUILD_INTERVAL):
+            update_coopetition_file.apply_async((competition.pk,))
+    return name
+
+
+def file_digest(source):
+    """
+    Returns the sha1 of the content of a stored file, recorded by name since bundles are written once under
+    names unique to them.
+
+    source: The `FileSource` of the file.
+    """
+    digest = FileDigest.objects.filter(name=source.name).values_list('digest', flat=True).first()
+    if digest is None:
+        sha1 = hashlib.sha1()
+        stored_file = source()
+        try:
+            for chunk in iter(lambda: stored_file.read(CHUNK_SIZE), ''):
+                sha1.update(chunk)
+        finally:
+            stored_file.close()
+        digest = sha1.hexdigest()
+        try:
+            with transaction.atomic():
+                FileDigest.objects.create(name=source.name, digest=digest)
+        except IntegrityError:
+            # Recorded meanwhile by another worker
+            pass
+    return digest
+
+
+def _result_cache_key(submission, has_generated_predictions):
+    """
+    Returns the fields of the `CachedSubmissionResult` the scoring of a submission would make, or None when its
+    phase doesn't memoize results or its scoring program reads inputs which change between submissions.
+    """
+    phase = submission.phase
+    if not phase.memoizes_results:
+        return None
+    if has_generated_predictions:
+        results = _storage_source(submission.prediction_output_file)
+    elif settings.USE_AWS:
+        results = FileSource(submission.s3_file, lambda: urllib.urlopen(_make_url_sassy(submission.s3_file)))
+    else:
+        results = _storage_source(submission.file)
+    if not results.name or not phase.scoring_program.name:
+        return None
+    return {
+        'competition_id': phase.competition_id,
+        'results_digest': file_digest(results),
+        'scoring_program_digest': file_digest(_storage_source(phase.scoring_program)),
+        'reference_data_digest': file_digest(_storage_source(phase.reference_data)) if phase.reference_data.name else '',
+        'docker_image': phase.scoring_program_docker_image or settings.DOCKER_DEFAULT_WORKER_IMAGE,
+    }
+
+
+# Outputs of the scoring run shared by the submissions reusing its result
+CACHED_RESULT_FILES = ('output_file', 'private_output_file', 'detailed_results_file', 'stdout_file', 'stderr_file')
+
+
+def _reuse_cached_result(submission, cached_submission, job_id, state):
+    """
+    Finishes the scoring of a submission with the outputs and scores of a submission of identical results.
+    """
+    for field_name in CACHED_RESULT_FILES:
+        getattr(submission, field_name).name = getattr(cached_submission, field_name).name
+    state['score'] = job_id
+    submission.execution_key = json.dumps(state)
+    submission.save()
+    scores = SubmissionScore.objects.filter(
+        result=cached_submission,
+        scoredef__computed=False
+    ).values_list('scoredef__key', 'value')
+    _finish_scoring(submission, list(scores), state)
+
+
+def score(submission, job_id):
+    """
+    Dispatches the scoring task for the given submission to an appropriate compute worker.
+
+    submission: The CompetitionSubmission object.
+    job_id: The job ID used to track the progress of the evaluation.
+
+    Returns True when the submission was finished with the cached result of identical results.
+    """
+    # profile = cProfile.Profile()
+    start = time.time()
+    # profile.enable()
+    # Loads the computation state.
+    state = {}
+    if len(submission.execution_key) > 0:
+        state = json.loads(submission.execution_key)
+    has_generated_predictions = 'predict' in state
+
+    phase = submission.phase
+    result_cache_key = _result_cache_key(submission, has_generated_predictions)
+    if result_cache_key is not None:
+        cached_result = CachedSubmissionResult.objects.filter(**result_cache_key).select_related('submission').first()
+        if cached_result is not None:
+            logger.info("Reusing the result of submission %s (submission_id=%s)",
+                        cached_result.submission_id, submission.id)
+            _reuse_cached_result(submission, cached_result.submission, job_id, state)
+            return True
+        state['result_cache'] = result_cache_key
+
+    # Auxiliary inputs are only generated for the scoring programs which read them
+    if phase.scoring_program_uses_history:
+        #generate metadata-only bundle describing the history of submissions and phases
+        last_submissions = CompetitionSubmission.objects.filter(
+            participant=submission.participant,
+            status__codename=CompetitionSubmissionStatus.FINISHED
+        ).order_by('-submitted_at')
+
+
+        lines = []
+        # lines.append("description: history of all previous successful runs output files")
+        #
+        # if last_submissions:
+        #     for past_submission in last_submissions:
+        #         if past_submission.pk != submission.pk:
+        #             #pad folder numbers for sorting os side, 001, 002, 003,... 010, etc...
+        #             past_submission_phasenumber = '%03d' % past_submission.phase.phasenumber
+        #             past_submission_number = '%03d' % past_submission.submission_number
+        #             lines.append('%s/%s/output/: %s' % (
+        #                     past_submission_phasenumber,
+        #                     past_submission_number,
+        #                     submission_private_output_filename(past_submission),
+        #                 )
+        #             )
+
+        submission.history_file.save('history.txt', ContentFile('\n'.join(lines)))
+
+    if phase.scoring_program_uses_scores:
+        score_csv = phase.competition.get_results_csv(phase.pk)
+        submission.scores_file.save('scores.txt', ContentFile(score_csv))
+
+    if phase.scoring_program_uses_coopetition:
+        # Extra submission info, shared by the submissions of the competition
+        submission.coopetition_file.name = get_coopetition_file_name(phase.competition)
 
     # Generate metadata-only bundle describing the inputs. Reference data is an optional
     # dataset provided by the competition organizer. Results are provided by the participant
@@ -415,7 +643,7 @@ def score(submission, job_id):
     lines = []
     ref_value = submission.phase.reference_data.name
     if len(ref_value) > 0:
-        lines.append("ref: %s" % _make_url_sassy(ref_value))
+        lines.append("ref: %s" % _make_url_sassy(ref_value, immutable=True))
     if settings.USE_AWS:
         res_value = submission.prediction_output_file.name if has_generated_predictions else submission.s3_file
     else:
@@ -425,9 +653,12 @@ def score(submission, job_id):
     else:
         raise ValueError("Results are missing.")
 
-    lines.append("history: %s" % _make_url_sassy(submission.history_file.name))
-    lines.append("scores: %s" % _make_url_sassy(submission.scores_file.name))
-    lines.append("coopetition: %s" % _make_url_sassy(submission.coopetition_file.name))
+    if phase.scoring_program_uses_history:
+        lines.append("history: %s" % _make_url_sassy(submission.history_file.name))
+    if phase.scoring_program_uses_scores:
+        lines.append("scores: %s" % _make_url_sassy(submission.scores_file.name))
+    if phase.scoring_program_uses_coopetition:
+        lines.append("coopetition: %s" % _make_url_sassy(submission.coopetition_file.name, immutable=True))
     lines.append("submitted-by: %s" % submission.participant.user.username)
     lines.append("submitted-at: %s" % submission.submitted_at.replace(microsecond=0).isoformat())
     lines.append("competition-submission: %s" % submission.submission_number)
@@ -449,14 +680,19 @@ def score(submission, job_id):
     lines = []
     program_value = submission.phase.scoring_program.name
     if len(program_value) > 0:
-        lines.append("program: %s" % _make_url_sassy(program_value))
+        lines.append("program: %s" % _make_url_sassy(program_value, immutable=True))
     else:
         raise ValueError("Program is missing.")
     lines.append("input: %s" % _make_url_sassy(submission.inputfile.name))
-    lines.append("stdout: %s" % _make_url_sassy(submission.stdout_file.name, permission='w'))
-    lines.append("stderr: %s" % _make_url_sassy(submission.stderr_file.name, permission='w'))
-    lines.append("private_output: %s" % _make_url_sassy(submission.private_output_file.name, permission='w'))
-    lines.append("output: %s" % _make_url_sassy(submission.output_file.name, permission='w'))
+    stdout_url, stderr_url, private_output_url, output_url = _make_urls_sassy(
+        [submission.stdout_file.name, submission.stderr_file.name, submission.private_output_file.name,
+         submission.output_file.name],
+        permission='w'
+    )
+    lines.append("stdout: %s" % stdout_url)
+    lines.append("stderr: %s" % stderr_url)
+    lines.append("private_output: %s" % private_output_url)
+    lines.append("output: %s" % output_url)
     submission.runfile.save('run.txt', ContentFile('\n'.join(lines)))
 
     # Create stdout.txt & stderr.txt
@@ -493,6 +729,126 @@ class SubmissionUpdateException(Exception):
         self.inner_exception = inner_exception
 
 
+def _save_scores(submission, scores):
+    """
+    Saves the scores of a submission with one query loading the score definitions of the competition and
+    one insert, replacing the scores the submission already had for the same definitions.
+
+    submission: The CompetitionSubmission object.
+    scores: The (key, value) pairs read from scores.txt, keys without a score definition are skipped.
+
+    Returns: List of (SubmissionScoreDef, Decimal value as stored) of the saved scores.
+    """
+    scoredefs = dict((scoredef.key, scoredef) for scoredef in
+                     SubmissionScoreDef.objects.filter(competition=submission.phase.competition_id))
+    value_field = SubmissionScore._meta.get_field('value')
+    values = {}
+    for label, value in scores:
+        logger.debug("Attempting to submit score %s:%s" % (label, value))
+        scoredef = scoredefs.get(label.strip())
+        if scoredef is None:
+            logger.warning("Score %s does not exist (submission_id=%s)", label, submission.id)
+            continue
+        value = float(value)
+        if scoredef.computed is True and value:
+            raise IntegrityError("Score is computed. Cannot assign a value")
+        # Rounded like the database does, so the value compares with the stored ones
+        values[scoredef] = value_field.to_python(
+            format_number(value_field.to_python(value), value_field.max_digits, value_field.decimal_places)
+        )
+
+    saved_scores = sorted(values.items(), key=lambda score: score[0].pk)
+    SubmissionScore.objects.filter(result=submission, scoredef__in=[score_def for score_def, _ in saved_scores]).delete()
+    SubmissionScore.objects.bulk_create([
+        SubmissionScore(result=submission, scoredef=score_def, value=score_value)
+        for score_def, score_value in saved_scores
+    ])
+    # bulk_create sends no signals
+    invalidate_leaderboards(phase__submissions=submission.pk)
+    return saved_scores
+
+
+def _add_to_leaderboard_as_required(submission, saved_scores):
+    """
+    Puts a finished submission on the leaderboard when its phase requires it.
+
+    submission: The CompetitionSubmission object.
+    saved_scores: The (SubmissionScoreDef, value) pairs returned by _save_scores.
+    """
+    # Automatically submit to the leaderboard?
+    if submission.phase.is_blind and not submission.phase.force_best_submission_to_leaderboard:
+        logger.debug("Adding to leaderboard... (submission_id=%s)", submission.id)
+        add_submission_to_leaderboard(submission)
+        logger.debug("Leaderboard updated with latest submission (submission_id=%s)", submission.id)
+
+    if submission.phase.competition.force_submission_to_leaderboard and not submission.phase.force_best_submission_to_leaderboard:
+        add_submission_to_leaderboard(submission)
+        logger.debug("Force submission added submission to leaderboard (submission_id=%s)", submission.id)
+
+    if submission.phase.force_best_submission_to_leaderboard:
+        # In this phase get the submission score from the column with the lowest ordering
+        score_def, score_value = min(saved_scores, key=lambda score: score[0].ordering)
+        other_scores = SubmissionScore.objects.filter(
+            result__phase=submission.phase,
+            scoredef=score_def
+        ).exclude(result=submission)
+        if score_def.sorting == 'asc':
+            # The first value in ascending is the top score, 1 beats 3
+            top_score = other_scores.aggregate(top=Min('value'))['top']
+            if top_score is None or score_value < top_score:
+                top_score = score_value
+            if score_value >= top_score:
+                add_submission_to_leaderboard(submission)
+                logger.debug("Force best submission added submission to leaderboard in ascending order "
+                             "(submission_id=%s, top_score=%s, score=%s)", submission.id, top_score, score_value)
+        elif score_def.sorting == 'desc':
+            # The last value in descending is the top score, 3 beats 1
+            top_score = other_scores.aggregate(top=Max('value'))['top']
+            if top_score is None or score_value > top_score:
+                top_score = score_value
+            if score_value <= top_score:
+                add_submission_to_leaderboard(submission)
+                logger.debug("Force best submission added submission to leaderboard in descending order "
+                             "(submission_id=%s, top_score=%s, score=%s)", submission.id, top_score, score_value)
+
+
+def _finish_scoring(submission, scores, state):
+    """
+    Saves the scores of a submission, marks it finished and puts it on the leaderboard as its phase requires.
+
+    submission: The CompetitionSubmission object.
+    scores: The (key, value) pairs of its scores.
+    state: The evaluation state of the submission, read from its execution_key.
+    """
+    logger.debug("Processing scores... (submission_id=%s)", submission.id)
+    # Valid leaderboard snapshots are updated with the new scores instead of ranking the phase again on read
+    with update_leaderboard(submission.phase, rescored_ids=[submission.id]):
+        saved_scores = _save_scores(submission, scores)
+        _set_submission_status(submission.id, CompetitionSubmissionStatus.FINISHED)
+        logger.debug("Done processing scores... (submission_id=%s)", submission.id)
+        _add_to_leaderboard_as_required(submission, saved_scores)
+
+    if 'result_cache' in state:
+        # Later submissions of the same results reuse these scores and outputs
+        try:
+            with transaction.atomic():
+                CachedSubmissionResult.objects.create(submission=submission, **state['result_cache'])
+        except IntegrityError:
+            pass
+
+    if submission.participant.user.email_on_submission_finished_successfully:
+        email = submission.participant.user.email
+        site_url = "https://%s%s" % (Site.objects.get_current().domain, submission.phase.competition.get_absolute_url())
+        send_mail(
+            'Submission has finished successfully!',
+            'Your submission to the competition "%s" has finished successfully! View it here: %s' %
+            (submission.phase.competition.title, site_url),
+            settings.DEFAULT_FROM_EMAIL,
+            [email],
+            fail_silently=False
+        )
+
+
 @task(queue='submission-updates')
 def update_submission(job_id, args, secret):
     """
@@ -503,13 +859,15 @@ def update_submission(job_id, args, secret):
         args['status']: The evaluation status, which is one of 'running', 'finished' or 'failed'.
     """
 
-    def _update_submission(submission, status, job_id, traceback=None, metadata=None):
+    def _update_submission(submission, status, job_id, traceback=None, metadata=None, scores=None):
         """
         Updates the status of a submission.
 
         submission: The CompetitionSubmission object to update.
         status: The new status string: 'running', 'finished' or 'failed'.
         job_id: The job ID used to track the progress of the evaluation.
+        scores: The (key, value) pairs of scores.txt parsed by the compute worker, read from output.zip
+            when missing.
         """
 
         state = {}
@@ -537,74 +895,17 @@ def update_submission(job_id, args, secret):
             result = Job.FAILED
             if 'score' in state:
                 logger.debug("update_submission_task loading final scores (pk=%s)", submission.pk)
-                logger.debug("Retrieving output.zip and 'scores.txt' file (submission_id=%s)", submission.id)
-                logger.debug("Output.zip location=%s" % submission.output_file.file.name)
-                ozip = ZipFile(io.BytesIO(submission.output_file.read()))
-                scores = None
-                try:
-                    scores = open(ozip.extract('scores.txt'), 'r').read()
-                except Exception:
-                    logger.error("Scores.txt not found, unable to process submission: %s (submission_id=%s)", status, submission.id)
-                    _set_submission_status(submission.id, CompetitionSubmissionStatus.FAILED)
-                    return Job.FAILED
-
-                logger.debug("Processing scores... (submission_id=%s)", submission.id)
-                for line in scores.split("\n"):
-                    if len(line) > 0:
-                        label, value = line.split(":")
-                        logger.debug("Attempting to submit score %s:%s" % (label, value))
-                        try:
-                            scoredef = SubmissionScoreDef.objects.get(competition=submission.phase.competition,
-                                                                      key=label.strip())
-                            SubmissionScore.objects.create(result=submission, scoredef=scoredef, value=float(value))
-                        except SubmissionScoreDef.DoesNotExist:
-                            logger.warning("Score %s does not exist (submission_id=%s)", label, submission.id)
-                logger.debug("Done processing scores... (submission_id=%s)", submission.id)
-                _set_submission_status(submission.id, CompetitionSubmissionStatus.FINISHED)
-
-                # Automatically submit to the leaderboard?
-                if submission.phase.is_blind and not submission.phase.force_best_submission_to_leaderboard:
-                    logger.debug("Adding to leaderboard... (submission_id=%s)", submission.id)
-                    add_submission_to_leaderboard(submission)
-                    logger.debug("Leaderboard updated with latest submission (submission_id=%s)", submission.id)
-
-                if submission.phase.competition.force_submission_to_leaderboard and not submission.phase.force_best_submission_to_leaderboard:
-                    add_submission_to_leaderboard(submission)
-                    logger.debug("Force submission added submission to leaderboard (submission_id=%s)", submission.id)
-
-                if submission.phase.force_best_submission_to_leaderboard:
-                    # In this phase get the submission score from the column with the lowest ordering
-                    score_def = submission.get_default_score_def()
-                    top_score = SubmissionScore.objects.filter(result__phase=submission.phase, scoredef=score_def)
-                    score_value = submission.get_default_score()
-                    if score_def.sorting == 'asc':
-                        # The first value in ascending is the top score, 1 beats 3
-                        top_score = top_score.order_by('value').first()
-                        if score_value >= top_score.value:
-                            add_submission_to_leaderboard(submission)
-                            logger.debug("Force best submission added submission to leaderboard in ascending order "
-                                         "(submission_id=%s, top_score=%s, score=%s)", submission.id, top_score, score_value)
-                    elif score_def.sorting == 'desc':
-                        # The last value in descending is the top score, 3 beats 1
-                        top_score = top_score.order_by('value').last()
-                        if score_value <= top_score.value:
-                            add_submission_to_leaderboard(submission)
-                            logger.debug("Force best submission added submission to leaderboard in descending order "
-                                         "(submission_id=%s, top_score=%s, score=%s)", submission.id, top_score, score_value)
-
+                if scores is None:
+                    logger.debug("Retrieving 'scores.txt' from output.zip (submission_id=%s)", submission.id)
+                    try:
+                        scores = parse_scores(read_output_member(submission.output_file, 'scores.txt'))
+                    except KeyError:
+                        logger.error("Scores.txt not found, unable to process submission: %s (submission_id=%s)", status, submission.id)
+                        _set_submission_status(submission.id, CompetitionSubmissionStatus.FAILED)
+                        return Job.FAILED
+
+                _finish_scoring(submission, scores, state)
                 result = Job.FINISHED
-
-                if submission.participant.user.email_on_submission_finished_successfully:
-                    email = submission.participant.user.email
-                    site_url = "https://%s%s" % (Site.objects.get_current().domain, submission.phase.competition.get_absolute_url())
-                    send_mail(
-                        'Submission has finished successfully!',
-                        'Your submission to the competition "%s" has finished successfully! View it here: %s' %
-                        (submission.phase.competition.title, site_url),
-                        settings.DEFAULT_FROM_EMAIL,
-                        [email],
-                        fail_silently=False
-                    )
             else:
                 logger.debug("update_submission_task entering scoring phase (pk=%s)", submission.pk)
                 # url_name = pathname2url(submission_prediction_output_filename(submission))
@@ -613,9 +914,12 @@ def update_submission(job_id, args, secret):
                 # submission.prediction_stdout_file.name = pathname2url(predict_submission_stderr_filename(submission))
                 # submission.save()
                 try:
-                    score(submission, job_id)
-                    result = Job.RUNNING
-                    logger.debug("update_submission_task scoring phase entered (pk=%s)", submission.pk)
+                    if score(submission, job_id):
+                        result = Job.FINISHED
+                        logger.debug("update_submission_task reused cached scores (pk=%s)", submission.pk)
+                    else:
+                        result = Job.RUNNING
+                        logger.debug("update_submission_task scoring phase entered (pk=%s)", submission.pk)
                 except Exception:
                     logger.exception("update_submission_task failed to enter scoring phase (pk=%s)", submission.pk)
             return result
@@ -664,6 +968,7 @@ def update_submission(job_id, args, secret):
         try:
             traceback = None
             metadata = None
+            scores = None
             if 'extra' in args:
                 if 'traceback' in args['extra']:
                     traceback = args['extra']['traceback']
@@ -671,47 +976,227 @@ def update_submission(job_id, args, secret):
                 if 'metadata' in args['extra']:
                     metadata = args['extra']['metadata']
 
-            result = _update_submission(submission, status, job.id, traceback, metadata)
+                if 'scores' in args['extra']:
+                    scores = args['extra']['scores']
+
+            result = _update_submission(submission, status, job.id, traceback, metadata, scores)
         except Exception as e:
             logger.exception("Failed to update submission (job_id=%s, submission_id=%s, status=%s)",
                              job.id, submission_id, status)
             raise SubmissionUpdateException(submission, e)
+        if status != 'running':
+            _resume_delayed_phase_migration(submission.phase_id)
         return JobTaskResult(status=result)
 
     run_job_task(job_id, update_it, handle_update_exception)
 
 
-@task(queue='site-worker')
-def re_run_all_submissions_in_phase(phase_pk):
-    phase = CompetitionPhase.objects.get(id=phase_pk)
-
-    # Remove duplicate submissions this ugly way because MySQL distinct doesn't work...
-    submissions_with_duplicates = CompetitionSubmission.objects.filter(phase=phase)
-    submissions_without_duplicates = []
-    file_names_seen = []
-
-    for submission in submissions_with_duplicates:
-        if submission.file.name not in file_names_seen:
-            if settings.USE_AWS:
-                file_names_seen.append(submission.s3_file)
-            else:
-                file_names_seen.append(submission.file.name)
-            submissions_without_duplicates.append(submission)
+def read_output_member(field_file, member):
+    """
+    Reads a member of a stored zip archive, downloading only the parts of the archive needed to find it.
+
+    :raises KeyError: If the archive has no such member.
+    """
+    try:
+        archive_file = open(field_file.storage.path(field_file.name), 'rb')
+    except NotImplementedError:
+        # Remote storage, read by ranges through a signed url
+        archive_file = HttpRangeFile(_make_url_sassy(field_file.name))
+    try:
+        return ZipFile(archive_file).read(member)
+    finally:
+        archive_file.close()
+
+
+def _storage_source(field_file):
+    """
+    Returns a zip member source reading a stored file in chunks.
+    """
+    return FileSource(field_file.name,
+                      lambda: field_file.storage.open(field_file.name),
+                      exists=lambda: field_file.storage.exists(field_file.name))
+
+
+def leaderboard_results_members(phase):
+    """
+    Lists the members of the archive of the submissions on the leaderboard of a phase.
+
+    :return: List of (name, source) for `apps.web.zipstream.zip_stream`.
+    """
+    competition = phase.competition
+    archive_members = []
+
+    # Add teach team name in an easy to read way
+    team_name_cache = {}
+    team_name_string = ""
+    for result in PhaseLeaderBoardEntry.objects.filter(result__participant__user__team_name__isnull=False,
+                                                       result__participant__competition=competition).select_related('result__participant__user'):
+        user_on_team = result.result.participant.user
+        team_name_cache[user_on_team.team_name] = user_on_team.team_members
+    for name, team_members in team_name_cache.items():
+        team_name_string += "Team: %s; members: %s\n" % (name, team_members)
+
+    if team_name_string:
+        archive_members.append(("team_names_and_members.txt", team_name_string.encode('utf8')))
+
+    # Add each submission
+    leaderboard_entries = PhaseLeaderBoardEntry.objects.filter(board__phase=phase).select_related('result__participant__user').order_by('pk')
+    for entry in leaderboard_entries:
+        # Maps back to submission
+        submission = entry.result
+        username_or_team_name = submission.participant.user.username if not submission.participant.user.team_name else "Team %s " % submission.participant.user.team_name
+        file_name = "%s - %s submission.zip" % (username_or_team_name, submission.submission_number)
 
-    for submission in submissions_without_duplicates:
         if settings.USE_AWS:
-            file_kwarg = {'s3_file': submission.s3_file}
+            archive_members.append((file_name, FileSource(submission.s3_file,
+                                                          lambda s3_file=submission.s3_file: urllib.urlopen(_make_url_sassy(s3_file)))))
         else:
-            file_kwarg = {'file': submission.file}
+            archive_members.append((file_name, _storage_source(submission.file)))
+
+        output_file_name = "%s - %s output.zip" % (username_or_team_name, submission.submission_number)
+        archive_members.append((output_file_name, _storage_source(submission.output_file)))
+
+        profile_data_file_name = "%s - %s profile.txt" % (username_or_team_name, submission.submission_number)
+        user_profile_data = {
+            'Organization': submission.participant.user.organization_or_affiliation,
+            'Team Name': submission.participant.user.team_name,
+            'Team Members': submission.participant.user.team_members,
+            'Method Name': submission.participant.user.method_name,
+            'Method Description': submission.participant.user.method_description,
+            'Contact Email': submission.participant.user.contact_email,
+            'Project URL': submission.participant.user.project_url,
+            'Publication URL': submission.participant.user.publication_url,
+            'Bibtex': submission.participant.user.bibtex,
+        }
+        user_profile_data_string = '\n'.join(['%s: %s' % (k, v) for k, v in sorted(user_profile_data.items())])
+        archive_members.append((profile_data_file_name, user_profile_data_string.encode('utf-8')))
 
-        new_submission = CompetitionSubmission(
-            participant=submission.participant,
-            phase=submission.phase,
-            **file_kwarg
+        metadata_fields = ['method_name', 'method_description', 'project_url', 'publication_url', 'bibtex', 'team_name', 'organization_or_affiliation']
+        submission_metadata_file_name = "%s - %s method.txt" % (username_or_team_name, submission.submission_number)
+        submission_metadata_file_string = "\n".join(["%s: %s" % (field, getattr(submission, field)) for field in metadata_fields])
+        archive_members.append((submission_metadata_file_name, submission_metadata_file_string.encode('utf-8')))
+    return archive_members
+
+
+def leaderboard_results_archive_name(phase, archive_members):
+    """
+    Returns the name in BundleStorage of the archive of the given members, which changes with the leaderboard.
+    """
+    return "leaderboard_results/%s/%s/%s.zip" % (phase.competition_id, phase.pk, members_digest(archive_members))
+
+
+@task(queue='site-worker')
+def build_leaderboard_results_archive(job_id, phase_pk):
+    """
+    Builds the archive of the submissions on the leaderboard of a phase in BundleStorage, unless an
+    archive of the same leaderboard already exists.
+
+    job_id: The ID of the job, its info holds the progress of the build, then the name of the archive
+        and its signed URL.
+    phase_pk: The primary key of the phase.
+    """
+    def build_it(job):
+        update_job_status_task(job.pk, {'status': 'running'})
+        phase = CompetitionPhase.objects.select_related('competition').get(pk=phase_pk)
+        archive_members = leaderboard_results_members(phase)
+        archive_name = leaderboard_results_archive_name(phase, archive_members)
+
+        if not BundleStorage.exists(archive_name):
+            logger.info("Building leaderboard results archive %s (job_id=%s)", archive_name, job.pk)
+            with tempfile.TemporaryFile() as archive:
+                writer = ZipStreamWriter()
+                for index, (name, chunks) in enumerate(prefetch(archive_members)):
+                    for data in writer.write_member(name, chunks):
+                        archive.write(data)
+                    Job.objects.filter(pk=job.pk).update(task_info_json=json.dumps({
+                        'progress': index + 1,
+                        'total': len(archive_members)
+                    }))
+                for data in writer.close():
+                    archive.write(data)
+                archive.seek(0)
+                archive_name = BundleStorage.save(archive_name, File(archive))
+
+        return JobTaskResult(status=Job.FINISHED, info={
+            'archive': archive_name,
+            'url': _make_url_sassy(archive_name)
+        })
+
+    run_job_task(job_id, build_it)
+
+
+def start_evaluations(submission_pks, is_scoring_only, job_id=None, **task_args):
+    """
+    Starts the evaluation of many submissions in chunks, see `dispatch_evaluations`. The first chunk is
+    dispatched right away.
+
+    submission_pks: Primary keys of the submissions to evaluate.
+    is_scoring_only: True to skip the prediction step.
+    job_id: The ID of the job reporting the progress, a new one is created from task_args if not given.
+
+    Returns the ID of the job.
+    """
+    if job_id is None:
+        job_id = Job.objects.create_job('dispatch_evaluations', task_args).pk
+    dispatch_evaluations(job_id, list(submission_pks), is_scoring_only)
+    return job_id
+
+
+@task(queue='site-worker')
+def dispatch_evaluations(job_id, submission_pks, is_scoring_only, dispatched=0):
+    """
+    Starts the evaluation of settings.EVALUATION_DISPATCH_CHUNK_SIZE submissions, then schedules the
+    next chunk settings.EVALUATION_DISPATCH_INTERVAL seconds later, so re-running or migrating a whole
+    phase doesn't flood the site worker queue.
+
+    job_id: The ID of the job, its info holds the number of evaluations started so far.
+    submission_pks: Primary keys of all the submissions to evaluate.
+    is_scoring_only: True to skip the prediction step.
+    dispatched: Number of evaluations started by the previous chunks.
+    """
+    def dispatch_it(job):
+        if job.status == Job.PENDING:
+            update_job_status_task(job.pk, {'status': 'running'})
+        chunk = submission_pks[dispatched:dispatched + settings.EVALUATION_DISPATCH_CHUNK_SIZE]
+        for submission_pk in chunk:
+            evaluate_submission.apply_async((submission_pk, is_scoring_only))
+        progress = {'progress': dispatched + len(chunk), 'total': len(submission_pks)}
+        logger.info("Dispatched %(progress)s of %(total)s evaluations (job_id=%(job_id)s)",
+                    dict(progress, job_id=job.pk))
+
+        if progress['progress'] >= progress['total']:
+            return JobTaskResult(status=Job.FINISHED, info=progress)
+        Job.objects.filter(pk=job.pk).update(task_info_json=json.dumps(progress))
+        dispatch_evaluations.apply_async(
+            (job.pk, submission_pks, is_scoring_only, progress['progress']),
+            countdown=settings.EVALUATION_DISPATCH_INTERVAL
         )
-        new_submission.save(ignore_submission_limits=True)
+        return JobTaskResult()
 
-        evaluate_submission.apply_async((new_submission.pk, submission.phase.is_scoring_only))
+    run_job_task(job_id, dispatch_it)
+
+
+@task(queue='site-worker')
+def re_run_all_submissions_in_phase(phase_pk, job_id=None):
+    """
+    Re-runs the submissions of a phase, once per submitted file.
+
+    phase_pk: The primary key of the phase.
+    job_id: The ID of the job reporting the progress of the dispatch, see `start_evaluations`.
+    """
+    phase = CompetitionPhase.objects.select_related('competition').get(id=phase_pk)
+
+    # Remove duplicate submissions here because MySQL distinct doesn't work...
+    submissions = []
+    file_names_seen = set()
+    for submission in CompetitionSubmission.objects.filter(phase=phase).select_related('participant').order_by('pk'):
+        file_name = submission.s3_file if settings.USE_AWS else submission.file.name
+        if file_name not in file_names_seen:
+            file_names_seen.add(file_name)
+            submissions.append(submission)
+
+    new_submission_pks = copy_submissions(submissions, phase)
+    start_evaluations(new_submission_pks, phase.is_scoring_only, job_id=job_id, phase_pk=phase.pk)
 
 
 @task(queue='site-worker')
@@ -739,9 +1224,13 @@ def evaluate_submission(submission_id, is_scoring_only):
     try:
         logger.debug("evaluate_submission dispatching %s task (submission_id=%s, job_id=%s)",
                     task_name, submission_id, job_id)
-        task_func(submission, job_id)
-        logger.debug("evaluate_submission dispatched %s task (submission_id=%s, job_id=%s)",
-                    task_name, submission_id, job_id)
+        if task_func(submission, job_id):
+            logger.debug("evaluate_submission reused cached scores (submission_id=%s, job_id=%s)",
+                         submission_id, job_id)
+            update_job_status_task(job_id, {'status': 'finished'})
+        else:
+            logger.debug("evaluate_submission dispatched %s task (submission_id=%s, job_id=%s)",
+                         task_name, submission_id, job_id)
     except Exception:
         logger.exception("evaluate_submission dispatch failed (job_id=%s, submission_id=%s)",
                          job_id, submission_id)
@@ -777,9 +1266,71 @@ def send_mass_email(competition_pk, body=None, subject=None, from_email=None, to
 
 
 @task(queue='site-worker')
-def do_phase_migrations():
+def do_phase_migrations(competition_pks=None):
+    """
+    Migrates the submissions of the competitions entering a phase with auto_migration.
+
+    competition_pks: IDs of the competitions to check, all of them by default.
+    """
     competitions = Competition.objects.filter(is_migrating=False)
+    if competition_pks is not None:
+        competitions = competitions.filter(pk__in=competition_pks)
     for c in competitions:
         c.check_future_phase_sumbmissions()
     logger.info("Checking {} competitions for phase migrations.".format(len(competitions)))
 
+
+@task(queue='site-worker')
+def schedule_phase_migrations():
+    """
+    Checks the competitions which still have to migrate into an upcoming auto_migration phase, or whose
+    migration was delayed by running submissions, and schedules a check at each start of a phase of theirs
+    within the next settings.PHASE_MIGRATION_SCHEDULE_INTERVAL seconds.
+    """
+    start = now()
+    end = start + datetime.timedelta(seconds=settings.PHASE_MIGRATION_SCHEDULE_INTERVAL)
+    upcoming = CompetitionPhase.objects.filter(
+        auto_migration=True,
+        phasenumber__gt=F('competition__last_phase_migration'),
+        start_date__gt=start,
+    ).values_list('competition', flat=True)
+    competition_pks = set(upcoming) | set(
+        Competition.objects.filter(is_migrating_delayed=True).values_list('pk', flat=True)
+    )
+    if not competition_pks:
+        return
+    do_phase_migrations(sorted(competition_pks))
+
+    transitions = {}
+    phase_starts = CompetitionPhase.objects.filter(
+        competition__in=competition_pks,
+        start_date__gt=start,
+        start_date__lte=end,
+    ).values_list('competition', 'start_date')
+    for competition_pk, start_date in phase_starts:
+        # Each transition is scheduled once, whichever beat sees it first
+        cache_key = 'phase_migration:%s:%s' % (competition_pk, start_date.isoformat())
+        if cache.add(cache_key, True, 2 * settings.PHASE_MIGRATION_SCHEDULE_INTERVAL):
+            transitions.setdefault(start_date, []).append(competition_pk)
+    for start_date, pks in sorted(transitions.items()):
+        # Just after the start, so the new phase is active when checked
+        do_phase_migrations.apply_async((sorted(pks),), eta=start_date + datetime.timedelta(seconds=1))
+    logger.info("Checked %s competitions for phase migrations, scheduled %s transitions.",
+                len(competition_pks), len(transitions))
+
+
+def _resume_delayed_phase_migration(phase_id):
+    """
+    Checks again a competition whose phase migration was delayed, once the submissions of the phase stopped
+    running.
+    """
+    delayed = Competition.objects.filter(phases=phase_id, is_migrating_delayed=True).values_list('pk', flat=True)
+    if not delayed:
+        return
+    running = CompetitionSubmission.objects.filter(
+        phase=phase_id,
+        status__codename=CompetitionSubmissionStatus.RUNNING,
+    )
+    if not running.exists():
+        do_phase_migrations.apply_async(([delayed[0]],))
+
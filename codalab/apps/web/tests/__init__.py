@@ -0,0 +1,13 @@
+from django.core import cache as django_cache
+from django.dispatch import receiver
+from django.test.signals import setting_changed
+
+
+@receiver(setting_changed)
+def _reset_default_cache(sender, setting, **kwargs):
+    # Django 1.6 builds the default cache once and modules keep the instance they imported, so it is
+    # rebuilt in place for override_settings(CACHES=...) to reach the code under test
+    if setting == 'CACHES':
+        backend = django_cache.get_cache(django_cache.DEFAULT_CACHE_ALIAS)
+        django_cache.cache.__class__ = backend.__class__
+        django_cache.cache.__dict__ = backend.__dict__
@@ -0,0 +1,144 @@
+import datetime
+import json
+
+import mock
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from apps.jobs.models import Job
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             ParticipantStatus,
+                             copy_submissions)
+from apps.web.tasks import dispatch_evaluations, re_run_all_submissions_in_phase
+
+User = get_user_model()
+
+
+class BulkSubmissionCopyTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.competition = Competition.objects.create(creator=self.organizer, modified_by=self.organizer)
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+            max_submissions=100,
+        )
+        self.next_phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=2,
+            start_date=datetime.datetime.now() + datetime.timedelta(days=30),
+            max_submissions=100,
+        )
+        approved = ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        self.participants = [
+            CompetitionParticipant.objects.create(
+                user=User.objects.create_user(username="participant%d" % number, password="pass"),
+                competition=self.competition,
+                status=approved
+            )
+            for number in range(2)
+        ]
+        self.finished = CompetitionSubmissionStatus.objects.get_or_create(
+            name="finished",
+            codename=CompetitionSubmissionStatus.FINISHED
+        )[0]
+
+    def _submission(self, participant, file_name, phase=None):
+        submission = CompetitionSubmission.objects.create(participant=participant, phase=phase or self.phase,
+                                                          file=file_name, readable_filename=file_name)
+        CompetitionSubmission.objects.filter(pk=submission.pk).update(status=self.finished)
+        return CompetitionSubmission.objects.select_related('participant').get(pk=submission.pk)
+
+    def test_copies_get_the_lowest_free_numbers(self):
+        first, second = self.participants
+        taken = [self._submission(first, 'taken%d.zip' % number, phase=self.next_phase) for number in range(2)]
+        CompetitionSubmission.objects.filter(pk=taken[0].pk).update(submission_number=1)
+        CompetitionSubmission.objects.filter(pk=taken[1].pk).update(submission_number=3)
+        submissions = [self._submission(first, 'a.zip'), self._submission(second, 'b.zip'),
+                       self._submission(first, 'c.zip')]
+
+        pks = copy_submissions(submissions, self.next_phase)
+
+        copies = [CompetitionSubmission.objects.get(pk=pk) for pk in pks]
+        self.assertEqual([(copy.participant, copy.submission_number, copy.file.name) for copy in copies],
+                         [(first, 0, 'a.zip'), (second, 0, 'b.zip'), (first, 2, 'c.zip')])
+        for copy in copies:
+            self.assertEqual(copy.phase, self.next_phase)
+            self.assertEqual(copy.status.codename, CompetitionSubmissionStatus.SUBMITTING)
+            self.assertEqual(copy.readable_filename, copy.file.name)
+            self.assertTrue(copy.secret)
+
+    def test_queries_do_not_grow_with_the_number_of_submissions(self):
+        def count_queries(submissions):
+            with CaptureQueriesContext(connection) as context:
+                copy_submissions(submissions, self.next_phase)
+            return len(context.captured_queries)
+
+        few = count_queries([self._submission(participant, '%d.zip' % number)
+                             for number in range(2) for participant in self.participants])
+        many = count_queries([self._submission(participant, '%d.zip' % number)
+                              for number in range(10) for participant in self.participants])
+        self.assertEqual(few, many)
+
+    @override_settings(EVALUATION_DISPATCH_CHUNK_SIZE=2, EVALUATION_DISPATCH_INTERVAL=10)
+    def test_re_runs_are_deduplicated_and_dispatched_in_chunks(self):
+        for number in range(5):
+            self._submission(self.participants[number % 2], '%d.zip' % number)
+        self._submission(self.participants[0], '0.zip')
+        job = Job.objects.create_job('dispatch_evaluations', {'phase_pk': self.phase.pk})
+
+        with mock.patch('apps.web.tasks.evaluate_submission.apply_async') as evaluate_mock, \
+                mock.patch('apps.web.tasks.dispatch_evaluations.apply_async') as dispatch_mock:
+            re_run_all_submissions_in_phase(self.phase.pk, job.pk)
+
+            new_submissions = CompetitionSubmission.objects.filter(
+                phase=self.phase,
+                status__codename=CompetitionSubmissionStatus.SUBMITTING
+            ).order_by('pk')
+            self.assertEqual(sorted(submission.file.name for submission in new_submissions),
+                             ['%d.zip' % number for number in range(5)])
+            self.assertEqual(evaluate_mock.call_count, 2)
+            job = Job.objects.get(pk=job.pk)
+            self.assertEqual(job.status, Job.RUNNING)
+            self.assertEqual(job.get_task_info(), {'progress': 2, 'total': 5})
+
+            args, kwargs = dispatch_mock.call_args
+            self.assertEqual(kwargs['countdown'], 10)
+            self.assertEqual(args[0][1], [submission.pk for submission in new_submissions])
+            while dispatch_mock.called:
+                dispatch_mock.reset_mock()
+                dispatch_evaluations(*args[0])
+                args, kwargs = dispatch_mock.call_args or (None, None)
+
+        self.assertEqual([call_args[0][0] for call_args, _ in evaluate_mock.call_args_list],
+                         [submission.pk for submission in new_submissions])
+        job = Job.objects.get(pk=job.pk)
+        self.assertEqual(job.status, Job.FINISHED)
+        self.assertEqual(job.get_task_info(), {'progress': 5, 'total': 5})
+
+    def test_re_run_all_reports_its_progress(self):
+        self.client.login(username="organizer", password="pass")
+        with mock.patch('apps.web.tasks.re_run_all_submissions_in_phase.apply_async') as re_run_mock:
+            resp = self.client.post(reverse("competitions:submission_re_run_all",
+                                            kwargs={"phase_pk": self.phase.pk}))
+        self.assertEqual(resp.status_code, 200)
+        data = json.loads(resp.content)
+        self.assertEqual(data['status'], 'pending')
+        job = Job.objects.get(task_type='dispatch_evaluations')
+        re_run_mock.assert_called_once_with((self.phase.pk, job.pk))
+
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING,
+                                             task_info_json=json.dumps({'progress': 50, 'total': 200}))
+        resp = self.client.get(data['status_url'])
+        self.assertEqual(json.loads(resp.content), dict(data, status='running', progress=50, total=200))
+
+        self.client.login(username="participant0", password="pass")
+        self.assertEqual(self.client.get(data['status_url']).status_code, 404)
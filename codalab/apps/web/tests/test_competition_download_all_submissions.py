@@ -1,14 +1,30 @@
 import datetime
+import json
+import mock
+import zipfile
 
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.contrib.auth import get_user_model
 
-from apps.web.models import Competition, CompetitionPhase
+from apps.jobs.models import Job
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             ParticipantStatus,
+                             PhaseLeaderBoard,
+                             PhaseLeaderBoardEntry)
+from apps.web.tasks import build_leaderboard_results_archive
+from apps.web.utils import BundleStorage
 
 User = get_user_model()
 
 
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
 class CompetitionDownloadAllSubmissions(TestCase):
 
     def setUp(self):
@@ -23,6 +39,34 @@ class CompetitionDownloadAllSubmissions(TestCase):
         )
         self.competition.admins.add(self.admin_user)
         self.phase = CompetitionPhase.objects.create(competition=self.competition, phasenumber=1, start_date=datetime.datetime.now())
+        self.url = reverse("competitions:download_leaderboard_results", kwargs={"competition_pk": self.competition.pk, "phase_pk": self.phase.pk})
+
+        patcher = mock.patch('apps.web.tasks.build_leaderboard_results_archive.apply_async')
+        self.build_mock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+    def _add_leaderboard_submission(self):
+        participant = CompetitionParticipant.objects.create(
+            user=self.non_admin_user,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        )
+        submission = CompetitionSubmission.objects.create(
+            participant=participant,
+            phase=self.phase,
+            file=SimpleUploadedFile(name="submission.zip", content="submission content"),
+            output_file=SimpleUploadedFile(name="output.zip", content="output content"),
+        )
+        board, _ = PhaseLeaderBoard.objects.get_or_create(phase=self.phase)
+        PhaseLeaderBoardEntry.objects.create(board=board, result=submission)
+        return submission
+
+    def _build_archive(self):
+        job = Job.objects.get(pk=self.build_mock.call_args[0][0][0])
+        with mock.patch('apps.web.tasks._make_url_sassy', return_value='https://signed/archive.zip'):
+            build_leaderboard_results_archive(job.pk, self.phase.pk)
+        return Job.objects.get(pk=job.pk)
 
     def test_competition_download_all_submissions_returns_404_for_non_existant_competition(self):
         self.client.login(username="organizer", password="pass")
@@ -42,3 +86,54 @@ class CompetitionDownloadAllSubmissions(TestCase):
         self.client.login(username="organizer", password="pass")
         resp = self.client.get(reverse("competitions:download_leaderboard_results", kwargs={"competition_pk": self.competition.pk, "phase_pk": self.phase.pk}))
         self.assertEquals(resp.status_code, 200)
+
+    def test_competition_download_all_submissions_starts_a_single_build_per_leaderboard(self):
+        self._add_leaderboard_submission()
+        self.client.login(username="organizer", password="pass")
+        resp = self.client.get(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        data = json.loads(resp.content)
+        self.assertEquals(data['status'], 'pending')
+        job_pk = self.build_mock.call_args[0][0][0]
+        self.assertEquals(data['status_url'], reverse("competitions:download_leaderboard_results_status", kwargs={
+            "competition_pk": self.competition.pk, "phase_pk": self.phase.pk, "job_pk": job_pk}))
+
+        resp = self.client.get(self.url, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEquals(json.loads(resp.content)['status_url'], data['status_url'])
+        self.assertEquals(self.build_mock.call_count, 1)
+
+    def test_competition_download_all_submissions_builds_archive_in_bundle_storage(self):
+        submission = self._add_leaderboard_submission()
+        self.client.login(username="organizer", password="pass")
+        self.client.get(self.url)
+        job = self._build_archive()
+        self.assertEquals(job.status, Job.FINISHED)
+        info = job.get_task_info()
+        self.assertEquals(info['url'], 'https://signed/archive.zip')
+        self.addCleanup(BundleStorage.delete, info['archive'])
+
+        archive = zipfile.ZipFile(BundleStorage.open(info['archive']))
+        self.assertIsNone(archive.testzip())
+        self.assertEquals(archive.read("non_admin - %s submission.zip" % submission.submission_number), "submission content")
+        self.assertEquals(archive.read("non_admin - %s output.zip" % submission.submission_number), "output content")
+
+        status_url = reverse("competitions:download_leaderboard_results_status", kwargs={
+            "competition_pk": self.competition.pk, "phase_pk": self.phase.pk, "job_pk": job.pk})
+        data = json.loads(self.client.get(status_url).content)
+        self.assertEquals(data['status'], 'finished')
+        self.assertEquals(data['url'], 'https://signed/archive.zip')
+
+        # The archive of an unchanged leaderboard is served right away
+        with mock.patch('apps.web.views._make_url_sassy', return_value='https://signed/again.zip'):
+            resp = self.client.get(self.url)
+        self.assertEquals(resp.status_code, 302)
+        self.assertEquals(resp['Location'], 'https://signed/again.zip')
+        self.assertEquals(self.build_mock.call_count, 1)
+
+    def test_competition_download_all_submissions_status_returns_404_for_non_admin(self):
+        self.client.login(username="organizer", password="pass")
+        self.client.get(self.url)
+        status_url = reverse("competitions:download_leaderboard_results_status", kwargs={
+            "competition_pk": self.competition.pk, "phase_pk": self.phase.pk, "job_pk": self.build_mock.call_args[0][0][0]})
+        self.client.login(username="non_admin", password="pass")
+        resp = self.client.get(status_url)
+        self.assertEquals(resp.status_code, 404)
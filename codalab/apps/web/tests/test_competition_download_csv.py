@@ -94,3 +94,31 @@ class CompetitionDownloadCSVTests(TestCase):
         '''Unicode set in setUp method'''
         resp = self.client.get(self.url)
         self.assertEquals(resp.status_code, 200)
+
+    def test_download_competition_csv_streams_submission_details(self):
+        self.submission_1.readable_filename = 'my_submission.zip'
+        self.submission_1.status = CompetitionSubmissionStatus.objects.get(codename="finished")
+        self.submission_1.save()
+        resp = self.client.get(self.url)
+        self.assertTrue(resp.streaming)
+        content = ''.join(resp.streaming_content).decode('utf-8')
+        self.assertIn(u"Some description with unicode \u2020", content)
+        self.assertIn(u"my_submission.zip", content)
+        self.assertIn(u"True", content)
+
+    def test_results_download_streams_the_results_csv(self):
+        self.user.username = 'testuser'
+        self.user.save()
+        self.submission_1.status = CompetitionSubmissionStatus.objects.get(codename="finished")
+        self.submission_1.save()
+        SubmissionResultGroup.objects.filter(competition=self.competition).update(label="Results")
+        SubmissionScoreDef.objects.filter(competition=self.competition).update(label="Score")
+        SubmissionScoreSet.objects.filter(competition=self.competition).update(label="Score")
+        url = reverse("competitions:competition_results_download", kwargs={"id": self.competition.pk,
+                                                                           "phase": self.phase_1.pk})
+        resp = self.client.get(url)
+        self.assertEquals(resp.status_code, 200)
+        self.assertTrue(resp.streaming)
+        content = ''.join(resp.streaming_content)
+        self.assertEquals(content, self.competition.get_results_csv(self.phase_1.pk))
+        self.assertIn("%s,testuser" % self.submission_1.pk, content)
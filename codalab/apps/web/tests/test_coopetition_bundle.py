@@ -0,0 +1,126 @@
+import datetime
+import os
+import shutil
+import tempfile
+import zipfile
+
+import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from apps.coopetitions.models import DownloadRecord, Like
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             ParticipantStatus)
+from apps.web.tasks import get_coopetition_file_name, update_coopetition_file
+from codalabtools.compute.worker import write_current_user
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CoopetitionBundleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="participant", password="pass")
+        self.other_user = User.objects.create_user(username="other", password="pass")
+        self.competition = Competition.objects.create(creator=self.user, modified_by=self.user)
+        participant = CompetitionParticipant.objects.create(
+            user=self.user,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        )
+        phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+            max_submissions=10,
+        )
+        self.submission = CompetitionSubmission.objects.create(participant=participant, phase=phase)
+        finished = CompetitionSubmissionStatus.objects.get_or_create(
+            name="finished",
+            codename=CompetitionSubmissionStatus.FINISHED
+        )[0]
+        CompetitionSubmission.objects.filter(pk=self.submission.pk).update(status=finished)
+        self.submission = CompetitionSubmission.objects.get(pk=self.submission.pk)
+
+    def _read(self, name):
+        competition = Competition.objects.get(pk=self.competition.pk)
+        self.assertEqual(competition.coopetition_file.name, name)
+        return zipfile.ZipFile(competition.coopetition_file)
+
+    @mock.patch('apps.web.tasks.update_coopetition_file.apply_async')
+    def test_bundle_is_built_once_and_shared(self, apply_async):
+        name = get_coopetition_file_name(self.competition)
+        bundle = self._read(name)
+        self.assertEqual(sorted(bundle.namelist()), ['coopetition_downloads.txt', 'coopetition_phase_1.txt',
+                                                     'coopetition_scores_phase_1.txt'])
+        self.assertIn('participant,%s' % self.submission.pk, bundle.read('coopetition_phase_1.txt'))
+
+        with mock.patch('apps.web.tasks.build_coopetition_file') as build_coopetition_file:
+            self.assertEqual(get_coopetition_file_name(self.competition), name)
+        self.assertFalse(build_coopetition_file.called)
+        self.assertFalse(apply_async.called)
+
+    @mock.patch('apps.web.tasks.update_coopetition_file.apply_async')
+    def test_stale_bundle_is_rebuilt_in_the_background(self, apply_async):
+        name = get_coopetition_file_name(self.competition)
+        Like.objects.create(submission=self.submission, user=self.other_user)
+        DownloadRecord.objects.create(submission=self.submission, user=self.other_user)
+
+        self.assertEqual(get_coopetition_file_name(self.competition), name)
+        self.assertEqual(get_coopetition_file_name(self.competition), name)
+        apply_async.assert_called_once_with((self.competition.pk,))
+
+        update_coopetition_file(self.competition.pk)
+        new_name = Competition.objects.get(pk=self.competition.pk).coopetition_file.name
+        self.assertNotEqual(new_name, name)
+        bundle = self._read(new_name)
+        self.assertIn(',1,1,0', bundle.read('coopetition_phase_1.txt'))
+        self.assertIn('%s,participant,other,' % self.submission.pk, bundle.read('coopetition_downloads.txt'))
+
+        # Fresh bundles are left alone
+        update_coopetition_file(self.competition.pk)
+        self.assertEqual(Competition.objects.get(pk=self.competition.pk).coopetition_file.name, new_name)
+
+    def _coopetition_version(self):
+        return Competition.objects.get(pk=self.competition.pk).coopetition_version
+
+    def test_only_exported_changes_of_finished_submissions_mark_the_bundle_stale(self):
+        running = CompetitionSubmissionStatus.objects.get_or_create(
+            name="running",
+            codename=CompetitionSubmissionStatus.RUNNING
+        )[0]
+        submission = CompetitionSubmission.objects.create(participant=self.submission.participant,
+                                                          phase=self.submission.phase)
+        version = self._coopetition_version()
+        submission.status = running
+        submission.execution_key = '{"score": true}'
+        submission.save()
+        self.assertEqual(self._coopetition_version(), version)
+
+        # Loaded timestamps are timezone aware while save() sets naive ones
+        submission = CompetitionSubmission.objects.get(pk=submission.pk)
+        submission.description = "Running"
+        submission.save()
+        self.assertEqual(self._coopetition_version(), version)
+
+        self.submission.is_public = True
+        self.submission.save()
+        self.assertEqual(self._coopetition_version(), version + 1)
+
+    def test_worker_adds_the_submitter(self):
+        input_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, input_dir, True)
+        write_current_user(input_dir, {'submitted-by': 'participant'})
+        self.assertEqual(os.listdir(input_dir), [])
+
+        os.mkdir(os.path.join(input_dir, 'coopetition'))
+        write_current_user(input_dir, {'submitted-by': u'particip\xe4nt'})
+        with open(os.path.join(input_dir, 'coopetition', 'current_user.txt')) as f:
+            self.assertEqual(f.read(), u'particip\xe4nt'.encode('utf-8'))
@@ -0,0 +1,112 @@
+import datetime
+import shutil
+import tempfile
+
+import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             ParticipantStatus)
+from apps.web.tasks import _queued_docker_images
+from codalabtools.compute import worker
+from codalabtools.compute.worker import DockerImagePool, docker_get_size
+
+User = get_user_model()
+
+
+class DockerImagePoolTests(TestCase):
+    def setUp(self):
+        self.pool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pool_dir, True)
+        self.pool = DockerImagePool(self.pool_dir)
+        worker.docker_invalidate_size()
+        self.addCleanup(worker.docker_invalidate_size)
+
+    def test_disk_usage_is_measured_once_per_max_age(self):
+        with mock.patch('codalabtools.compute.worker.os.popen') as popen:
+            popen.return_value.read.return_value = '2.5GB\n'
+            self.assertEqual(docker_get_size(), '2.5GB')
+            self.assertEqual(docker_get_size(), '2.5GB')
+            self.assertEqual(popen.call_count, 1)
+            docker_get_size(max_age=-1)
+            self.assertEqual(popen.call_count, 2)
+
+    @mock.patch('codalabtools.compute.worker.call', return_value=0)
+    def test_least_recently_used_images_are_evicted_first(self, call):
+        for image in ('old', 'kept', 'recent'):
+            self.pool.touch(image)
+        sizes = iter(['20GB', '12GB', '8GB'])
+        with mock.patch('codalabtools.compute.worker.docker_get_size', side_effect=lambda: next(sizes)):
+            self.pool.evict(10, keep=['kept'])
+
+        removed = [args[0][2] for args, _ in call.call_args_list if args[0][:2] == ['docker', 'rmi']]
+        self.assertEqual(removed, ['old', 'recent'])
+        with self.pool._usage() as usage:
+            self.assertEqual(usage.keys(), ['kept'])
+
+    @mock.patch('codalabtools.compute.worker.call')
+    def test_pull_skips_present_images_and_records_pulled_ones(self, call):
+        call.side_effect = lambda args, **kwargs: 0 if args[1] == 'pull' else int(args[-1] == 'missing')
+        self.pool.pull_async(['present', 'missing']).join()
+
+        pulled = [args[0][2] for args, _ in call.call_args_list if args[0][1] == 'pull']
+        self.assertEqual(pulled, ['missing'])
+        with self.pool._usage() as usage:
+            self.assertEqual(usage.keys(), ['missing'])
+
+
+class QueuedDockerImagesTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.competition = Competition.objects.create(creator=self.organizer, modified_by=self.organizer)
+        self.participant = CompetitionParticipant.objects.create(
+            user=self.organizer,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        )
+        self.submitted = CompetitionSubmissionStatus.objects.get_or_create(
+            name="submitted",
+            codename=CompetitionSubmissionStatus.SUBMITTED
+        )[0]
+        self.finished = CompetitionSubmissionStatus.objects.get_or_create(
+            name="finished",
+            codename=CompetitionSubmissionStatus.FINISHED
+        )[0]
+
+    def _submit(self, phase, status, docker_image='', days_ago=1):
+        submission = CompetitionSubmission.objects.create(participant=self.participant, phase=phase,
+                                                          docker_image=docker_image)
+        CompetitionSubmission.objects.filter(pk=submission.pk).update(
+            status=status,
+            submitted_at=datetime.datetime.now() - datetime.timedelta(days=days_ago)
+        )
+
+    def test_images_of_waiting_submissions_in_submission_order(self):
+        scoring_phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+            scoring_program_docker_image='scoring',
+            max_submissions=10,
+        )
+        code_phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=2,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=20),
+            is_scoring_only=False,
+            default_docker_image='default',
+            max_submissions=10,
+        )
+        self._submit(code_phase, self.submitted, docker_image='custom', days_ago=3)
+        self._submit(scoring_phase, self.submitted, days_ago=2)
+        self._submit(code_phase, self.submitted, days_ago=1)
+        self._submit(scoring_phase, self.finished, docker_image='finished', days_ago=4)
+
+        with self.settings(DOCKER_DEFAULT_WORKER_IMAGE='legacy'):
+            self.assertEqual(_queued_docker_images(None), ['custom', 'legacy', 'scoring', 'default'])
+            self.assertEqual(_queued_docker_images(None, limit=2), ['custom', 'legacy'])
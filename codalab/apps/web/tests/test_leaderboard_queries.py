@@ -0,0 +1,117 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+
+from apps.teams.models import Team, TeamMembership, TeamMembershipStatus, TeamStatus, get_user_team, get_user_teams
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             ParticipantStatus,
+                             PhaseLeaderBoard,
+                             PhaseLeaderBoardEntry,
+                             SubmissionResultGroup,
+                             SubmissionResultGroupPhase,
+                             SubmissionScore,
+                             SubmissionScoreDef,
+                             SubmissionScoreDefGroup,
+                             SubmissionScoreSet,)
+
+
+User = get_user_model()
+
+
+class LeaderboardQueryCountTests(TestCase):
+    def setUp(self):
+        super(LeaderboardQueryCountTests, self).setUp()
+
+        self.creator = User.objects.create(email='creator@user.com', username='creator')
+        self.competition = Competition.objects.create(creator=self.creator, modified_by=self.creator, enable_teams=True)
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+        )
+        self.leader_board = PhaseLeaderBoard.objects.create(phase=self.phase)
+        result_group = SubmissionResultGroup.objects.create(
+            competition=self.competition,
+            key="Key",
+            label="Results",
+            ordering=1
+        )
+        SubmissionResultGroupPhase.objects.create(phase=self.phase, group=result_group)
+        self.score_def = SubmissionScoreDef.objects.create(competition=self.competition, key="Key", label="Score")
+        SubmissionScoreDefGroup.objects.create(scoredef=self.score_def, group=result_group)
+        SubmissionScoreSet.objects.create(
+            competition=self.competition,
+            key="Key",
+            label="Score",
+            scoredef=self.score_def,
+        )
+        self.approved = ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        self.team_approved = TeamStatus.objects.get(codename=TeamStatus.APPROVED)
+        self.membership_approved = TeamMembershipStatus.objects.get(codename=TeamMembershipStatus.APPROVED)
+        self.finished = CompetitionSubmissionStatus.objects.get_or_create(name="finished", codename="finished")[0]
+        self.participants = []
+
+    def _add_participants(self, count):
+        for _ in range(count):
+            number = len(self.participants)
+            user = User.objects.create(email='user%d@user.com' % number, username='user%d' % number)
+            participant = CompetitionParticipant.objects.create(
+                user=user,
+                competition=self.competition,
+                status=self.approved
+            )
+            self.participants.append(participant)
+            # Every other participant creates a team, the others join the team of the previous participant
+            if number % 2 == 0:
+                team = Team.objects.create(
+                    name='team%d' % number,
+                    competition=self.competition,
+                    creator=user,
+                    status=self.team_approved
+                )
+            else:
+                team = Team.objects.get(creator=self.participants[number - 1].user)
+                TeamMembership.objects.create(user=user, team=team, status=self.membership_approved)
+            submission = CompetitionSubmission.objects.create(
+                participant=participant,
+                phase=self.phase,
+                status=self.finished,
+            )
+            PhaseLeaderBoardEntry.objects.create(board=self.leader_board, result=submission)
+            SubmissionScore.objects.create(result=submission, scoredef=self.score_def, value=number)
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            groups = self.phase.compute_scores()
+        return len(context.captured_queries), groups
+
+    def test_query_count_does_not_grow_with_leaderboard_size(self):
+        self._add_participants(2)
+        small_count, _ = self._count_queries()
+        self._add_participants(10)
+        large_count, groups = self._count_queries()
+        self.assertEqual(len(groups[0]['scores']), 12)
+        self.assertEqual(small_count, large_count)
+
+    def test_bulk_teams_match_get_user_team(self):
+        self._add_participants(4)
+        participants = [submission.participant for submission in CompetitionSubmission.objects.filter(phase=self.phase)]
+        teams = get_user_teams(participants, self.competition)
+        for participant in participants:
+            self.assertEqual(teams[participant.pk], get_user_team(participant, self.competition))
+
+    def test_team_names_are_the_user_team_names(self):
+        self._add_participants(2)
+        User.objects.filter(pk=self.participants[0].user_id).update(team_name='Own team name')
+        _, groups = self._count_queries()
+        team_names = {scores['id']: scores['team_name'] for _, scores in groups[0]['scores']}
+        for submission in CompetitionSubmission.objects.filter(phase=self.phase):
+            self.assertEqual(team_names[submission.pk], submission.participant.user.team_name)
+        self.assertIn('Own team name', team_names.values())
@@ -0,0 +1,194 @@
+import datetime
+import json
+
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             ParticipantStatus,
+                             PhaseLeaderBoard,
+                             PhaseLeaderBoardEntry,
+                             PhaseLeaderBoardSnapshot,
+                             SubmissionResultGroup,
+                             SubmissionResultGroupPhase,
+                             SubmissionScore,
+                             SubmissionScoreDef,
+                             SubmissionScoreDefGroup,
+                             SubmissionScoreSet,
+                             update_leaderboard,)
+
+
+User = get_user_model()
+
+
+class LeaderboardSnapshotTests(TestCase):
+    def setUp(self):
+        super(LeaderboardSnapshotTests, self).setUp()
+
+        self.user = User.objects.create(email='test@user.com', username='testuser')
+        self.other_user = User.objects.create(email='other@user.com', username='other')
+        self.competition = Competition.objects.create(creator=self.user, modified_by=self.user)
+        approved = ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        self.participant_1 = CompetitionParticipant.objects.create(
+            user=self.user,
+            competition=self.competition,
+            status=approved
+        )
+        self.participant_2 = CompetitionParticipant.objects.create(
+            user=self.other_user,
+            competition=self.competition,
+            status=approved
+        )
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+        )
+        submission_finished = CompetitionSubmissionStatus.objects.create(name="finished", codename="finished")
+        self.submission_1 = CompetitionSubmission.objects.create(
+            participant=self.participant_1,
+            phase=self.phase,
+            status=submission_finished,
+        )
+        self.submission_2 = CompetitionSubmission.objects.create(
+            participant=self.participant_2,
+            phase=self.phase,
+            status=submission_finished,
+        )
+        self.leader_board = PhaseLeaderBoard.objects.create(phase=self.phase)
+        PhaseLeaderBoardEntry.objects.create(board=self.leader_board, result=self.submission_1)
+        self.entry_2 = PhaseLeaderBoardEntry.objects.create(board=self.leader_board, result=self.submission_2)
+
+        result_group = SubmissionResultGroup.objects.create(
+            competition=self.competition,
+            key="Key",
+            label="Results",
+            ordering=1
+        )
+        SubmissionResultGroupPhase.objects.create(phase=self.phase, group=result_group)
+        self.score_def = SubmissionScoreDef.objects.create(
+            competition=self.competition,
+            key="Key",
+            label="Score",
+        )
+        SubmissionScoreDefGroup.objects.create(scoredef=self.score_def, group=result_group)
+        SubmissionScoreSet.objects.create(
+            competition=self.competition,
+            key="Key",
+            label="Score",
+            scoredef=self.score_def,
+        )
+        self.score_1 = SubmissionScore.objects.create(result=self.submission_1, scoredef=self.score_def, value=1)
+        SubmissionScore.objects.create(result=self.submission_2, scoredef=self.score_def, value=2)
+
+    def _ranked_ids(self):
+        return [scores['id'] for _, scores in self.phase.scores()[0]['scores']]
+
+    def test_snapshot_matches_computed_scores(self):
+        computed = self.phase.compute_scores()
+        self.assertEqual(self.phase.scores(), json.loads(json.dumps(computed)))
+        self.assertEqual(PhaseLeaderBoardSnapshot.objects.filter(board=self.leader_board).count(), 1)
+
+    def test_fresh_snapshot_is_read_with_a_single_query(self):
+        self.phase.scores()
+        with self.assertNumQueries(1):
+            self.phase.scores()
+
+    def test_score_change_invalidates_snapshot(self):
+        self.assertEqual(self._ranked_ids(), [self.submission_1.pk, self.submission_2.pk])
+        self.score_1.value = 3
+        self.score_1.save()
+        self.assertEqual(self._ranked_ids(), [self.submission_2.pk, self.submission_1.pk])
+
+    def test_leaderboard_entry_removal_invalidates_snapshot(self):
+        self.assertEqual(len(self._ranked_ids()), 2)
+        self.entry_2.delete()
+        self.assertEqual(self._ranked_ids(), [self.submission_1.pk])
+
+    def test_scoredef_change_invalidates_snapshot(self):
+        self.assertEqual(self._ranked_ids(), [self.submission_1.pk, self.submission_2.pk])
+        self.score_def.sorting = 'desc'
+        self.score_def.save()
+        self.assertEqual(self._ranked_ids(), [self.submission_2.pk, self.submission_1.pk])
+
+    def test_only_user_changes_shown_on_the_leaderboard_invalidate_snapshot(self):
+        self.phase.scores()
+        version = PhaseLeaderBoard.objects.get(pk=self.leader_board.pk).version
+        update_last_login(None, self.user)
+        self.assertEqual(PhaseLeaderBoard.objects.get(pk=self.leader_board.pk).version, version)
+
+        self.user.team_name = 'The team'
+        self.user.save(update_fields=['team_name'])
+        self.assertEqual(self.phase.scores()[0]['scores'][0][1]['team_name'], 'The team')
+
+    def test_snapshots_are_kept_per_leaderboard_variant(self):
+        # New submissions are saved as submitting, mark them as finished
+        for submission in (self.submission_1, self.submission_2):
+            submission.status = CompetitionSubmissionStatus.objects.get(codename="finished")
+            submission.save()
+        self.entry_2.delete()
+        self.assertEqual(len(self.phase.scores()[0]['scores']), 1)
+        self.assertEqual(len(self.phase.scores(include_scores_not_on_leaderboard=True)[0]['scores']), 2)
+
+    def test_only_submission_changes_shown_on_the_leaderboard_invalidate_snapshot(self):
+        running = CompetitionSubmissionStatus.objects.create(name="Running", codename="running")
+        finished = CompetitionSubmissionStatus.objects.get(codename="finished")
+        self.submission_1.status = running
+        self.submission_1.save()
+        self.phase.scores()
+        version = PhaseLeaderBoard.objects.get(pk=self.leader_board.pk).version
+
+        submission = CompetitionSubmission.objects.get(pk=self.submission_1.pk)
+        submission.like_count = 3
+        submission.save()
+        submission.status = CompetitionSubmissionStatus.objects.create(name="Scoring", codename="scoring")
+        submission.save()
+        self.assertEqual(PhaseLeaderBoard.objects.get(pk=self.leader_board.pk).version, version)
+
+        submission.status = finished
+        submission.save()
+        self.assertEqual(PhaseLeaderBoard.objects.get(pk=self.leader_board.pk).version, version + 1)
+
+    def _assertSnapshotsAreFresh(self):
+        board = PhaseLeaderBoard.objects.get(pk=self.leader_board.pk)
+        for snapshot in PhaseLeaderBoardSnapshot.objects.filter(board=board):
+            self.assertEqual(snapshot.version, board.version)
+            computed = self.phase.compute_scores(snapshot.include_scores_not_on_leaderboard)
+            self.assertEqual(json.loads(snapshot.data), json.loads(json.dumps(computed)))
+
+    def test_update_leaderboard_applies_new_submissions_to_snapshots(self):
+        self.phase.scores()
+        self.phase.scores(include_scores_not_on_leaderboard=True)
+        participant = CompetitionParticipant.objects.create(
+            user=User.objects.create(email='third@user.com', username='third'),
+            competition=self.competition,
+            status=self.participant_1.status
+        )
+        submission = CompetitionSubmission.objects.create(participant=participant, phase=self.phase,
+                                                          status=self.submission_1.status)
+        with update_leaderboard(self.phase, rescored_ids=[submission.pk]):
+            SubmissionScore.objects.create(result=submission, scoredef=self.score_def, value='1.5')
+            submission.status = CompetitionSubmissionStatus.objects.get(codename="finished")
+            submission.save()
+            PhaseLeaderBoardEntry.objects.create(board=self.leader_board, result=submission)
+        self._assertSnapshotsAreFresh()
+        with self.assertNumQueries(1):
+            self.assertEqual(self._ranked_ids(), [self.submission_1.pk, submission.pk, self.submission_2.pk])
+
+    def test_update_leaderboard_applies_rescored_and_removed_submissions(self):
+        self.phase.scores()
+        with update_leaderboard(self.phase, rescored_ids=[self.submission_1.pk]):
+            self.score_1.value = 3
+            self.score_1.save()
+        self._assertSnapshotsAreFresh()
+        self.assertEqual(self._ranked_ids(), [self.submission_2.pk, self.submission_1.pk])
+
+        with update_leaderboard(self.phase):
+            self.entry_2.delete()
+        self._assertSnapshotsAreFresh()
+        self.assertEqual(self._ranked_ids(), [self.submission_1.pk])
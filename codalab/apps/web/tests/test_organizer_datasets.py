@@ -1,4 +1,5 @@
 import mock
+import os
 import datetime
 
 from django.conf import settings
@@ -139,3 +140,15 @@ class OrganizerDataSetMultiDelete(OrganizerDataSetCreateTestsCase):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(models.OrganizerDataSet.objects.filter(pk=self.dataset.pk).count(), 1)
         self.assertEqual(models.OrganizerDataSet.objects.filter(pk=second_dataset.pk).count(), 1)
+
+
+class OrganizerDataSetDownloadTestsCase(OrganizerDataSetTestCase):
+
+    def test_bundle_with_a_missing_file_is_refused_before_streaming(self):
+        bundle = models.OrganizerDataSet.objects.create(name="Bundle", type="None", uploaded_by=self.user)
+        bundle.sub_data_files.add(self.dataset)
+        with mock.patch.object(self.dataset.data_file.storage, 'exists', return_value=False):
+            resp = self.client.get(reverse("datasets_download", kwargs={"dataset_key": bundle.key}))
+        self.assertEquals(resp.status_code, 404)
+        self.assertFalse(resp.streaming)
+        self.assertIn(os.path.basename(self.dataset.data_file.name), resp.content)
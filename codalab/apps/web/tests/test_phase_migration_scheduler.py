@@ -0,0 +1,87 @@
+import datetime
+
+import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils.timezone import now
+
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             ParticipantStatus)
+from apps.web.tasks import _resume_delayed_phase_migration, schedule_phase_migrations
+
+User = get_user_model()
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class PhaseMigrationSchedulerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="organizer", password="pass")
+        self.checked = []
+        check = mock.patch.object(Competition, 'check_future_phase_sumbmissions', autospec=True,
+                                  side_effect=lambda competition: self.checked.append(competition.pk))
+        check.start()
+        self.apply_async = mock.patch('apps.web.tasks.do_phase_migrations.apply_async').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _competition(self, *phases, **kwargs):
+        competition = Competition.objects.create(creator=self.user, modified_by=self.user, **kwargs)
+        for number, (start, auto_migration) in enumerate(phases, 1):
+            CompetitionPhase.objects.create(
+                competition=competition,
+                phasenumber=number,
+                start_date=now() + start,
+                auto_migration=auto_migration,
+                max_submissions=10,
+            )
+        return competition
+
+    def test_only_competitions_with_pending_migrations_are_checked(self):
+        soon = self._competition((datetime.timedelta(days=-10), False), (datetime.timedelta(seconds=60), True))
+        later = self._competition((datetime.timedelta(days=-10), False), (datetime.timedelta(days=10), True))
+        self._competition((datetime.timedelta(days=-10), False), (datetime.timedelta(seconds=60), False))
+        self._competition((datetime.timedelta(days=-10), False), (datetime.timedelta(days=-1), True))
+        delayed = self._competition((datetime.timedelta(days=-10), False), is_migrating_delayed=True)
+
+        schedule_phase_migrations()
+
+        self.assertEqual(sorted(self.checked), sorted([soon.pk, later.pk, delayed.pk]))
+        self.assertEqual(self.apply_async.call_count, 1)
+        args, kwargs = self.apply_async.call_args
+        self.assertEqual(args, (([soon.pk],),))
+        start = CompetitionPhase.objects.get(competition=soon, phasenumber=2).start_date
+        self.assertEqual(kwargs['eta'], start + datetime.timedelta(seconds=1))
+
+    def test_transitions_are_scheduled_once(self):
+        self._competition((datetime.timedelta(days=-10), False), (datetime.timedelta(seconds=60), True))
+        schedule_phase_migrations()
+        schedule_phase_migrations()
+        self.assertEqual(self.apply_async.call_count, 1)
+
+    def test_delayed_migrations_resume_when_submissions_stop_running(self):
+        competition = self._competition((datetime.timedelta(days=-10), False), is_migrating_delayed=True)
+        phase = competition.phases.get()
+        participant = CompetitionParticipant.objects.create(
+            user=self.user,
+            competition=competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        )
+        running = CompetitionSubmissionStatus.objects.get_or_create(
+            name="running",
+            codename=CompetitionSubmissionStatus.RUNNING
+        )[0]
+        submission = CompetitionSubmission.objects.create(participant=participant, phase=phase)
+        CompetitionSubmission.objects.filter(pk=submission.pk).update(status=running)
+
+        _resume_delayed_phase_migration(phase.pk)
+        self.assertFalse(self.apply_async.called)
+
+        CompetitionSubmission.objects.filter(pk=submission.pk).delete()
+        _resume_delayed_phase_migration(phase.pk)
+        self.apply_async.assert_called_once_with(([competition.pk],))
@@ -0,0 +1,77 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from apps.web.models import Competition, CompetitionPhase, get_current_phase
+
+User = get_user_model()
+
+
+class PhaseTimelineTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="organizer", password="pass")
+        self.competition = Competition.objects.create(creator=self.user, modified_by=self.user)
+        self.phases = [self._phase(1, days=-30), self._phase(2, days=-10), self._phase(3, days=10)]
+
+    def _phase(self, number, days, **kwargs):
+        return CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=number,
+            start_date=now() + datetime.timedelta(days=days),
+            **kwargs
+        )
+
+    def _states(self, competition):
+        return [(phase.is_past, phase.is_active, phase.is_future) for phase in competition.phases.all()]
+
+    def test_phases_are_active_until_the_next_one_starts(self):
+        self.assertEqual(self._states(self.competition), [(True, False, False),
+                                                          (False, True, False),
+                                                          (False, False, True)])
+        timeline = self.competition.phase_timeline
+        self.assertEqual(timeline.current_phase(), self.phases[1])
+        self.assertEqual(timeline.next_phase(self.phases[1]), self.phases[2])
+        self.assertIsNone(timeline.next_phase(self.phases[2]))
+        self.assertEqual(timeline.current_phase(when=now() + datetime.timedelta(days=20)), self.phases[2])
+        self.assertEqual(get_current_phase(self.competition), self.phases[1])
+
+    def test_last_phase_ends_with_the_competition(self):
+        self.competition.end_date = now() + datetime.timedelta(days=5)
+        self.competition.save()
+        timeline = self.competition.phase_timeline
+        self.assertFalse(timeline.is_active(self.phases[2], when=now() + datetime.timedelta(days=11)))
+        self.competition.end_date = None
+        self.competition.save()
+        self.assertTrue(self.competition.phase_timeline.is_active(self.phases[2],
+                                                                  when=now() + datetime.timedelta(days=11)))
+
+    def test_phases_never_ending_are_always_active(self):
+        phase = self.phases[0]
+        phase.phase_never_ends = True
+        phase.save()
+        self.assertEqual(self._states(self.competition)[0], (False, True, False))
+
+    def test_queries_do_not_grow_with_the_number_of_phases(self):
+        def count_queries():
+            competition = Competition.objects.get(pk=self.competition.pk)
+            with CaptureQueriesContext(connection) as context:
+                self._states(competition)
+                get_current_phase(competition)
+            return len(context.captured_queries)
+
+        few = count_queries()
+        for number in range(4, 20):
+            self._phase(number, days=number)
+        self.assertEqual(count_queries(), few)
+        self.assertLessEqual(few, 2)
+
+    def test_saving_a_phase_updates_the_timeline(self):
+        self.assertEqual(self.competition.phase_timeline.current_phase(), self.phases[1])
+        self.phases[2].start_date = now() - datetime.timedelta(days=1)
+        self.phases[2].save()
+        self.assertEqual(self.competition.phase_timeline.current_phase(), self.phases[2])
+        self.assertTrue(self.phases[1].is_past)
@@ -0,0 +1,231 @@
+import json
+import random
+import unittest
+
+from decimal import Decimal
+
+from django.test import TestCase
+
+from apps.web.models import CompetitionPhase
+from apps.web.ranking import DenseRanking, LeaderboardRanking, MatrixRanking, numpy
+
+
+class DenseRankingTests(TestCase):
+    def setUp(self):
+        self.random = random.Random(42)
+
+    def _random_value(self):
+        # Few distinct values with near ties to exercise the eps handling
+        return self.random.choice([0, 1, 2, 3, 5]) + self.random.choice([0, 0, 1e-13, 5e-13, 1e-11])
+
+    def assertRanksMatch(self, ranking, ids, values, sort_ascending):
+        expected = CompetitionPhase.rank_values(ids, values, sort_ascending=sort_ascending)
+        self.assertEqual(ranking.ranks(ids), expected)
+
+    def test_bulk_ranking_matches_rank_values(self):
+        ids = range(50)
+        for sort_ascending in (True, False):
+            values = {id: self._random_value() for id in ids if id % 7 != 0}
+            ranking = DenseRanking(values, sort_ascending=sort_ascending)
+            self.assertRanksMatch(ranking, ids, values, sort_ascending)
+
+    def test_empty_ranking_matches_rank_values(self):
+        self.assertRanksMatch(DenseRanking({}), [1, 2], {}, True)
+
+    def test_chained_ties_match_rank_values(self):
+        ids = [1, 2, 3, 4]
+        values = {1: 0.0, 2: 0.6e-12, 3: 1.2e-12, 4: 1.8e-12}
+        ranking = DenseRanking(values)
+        self.assertRanksMatch(ranking, ids, values, True)
+        ranking.remove(2)
+        del values[2]
+        self.assertRanksMatch(ranking, ids, values, True)
+
+    def test_incremental_updates_match_rank_values(self):
+        ids = range(40)
+        for sort_ascending in (True, False):
+            values = {}
+            ranking = DenseRanking(sort_ascending=sort_ascending)
+            for _ in range(300):
+                id = self.random.choice(ids)
+                before = ranking.ranks(ids)
+                if id in values and self.random.random() < 0.4:
+                    del values[id]
+                    affected, _ = ranking.remove(id)
+                else:
+                    values[id] = self._random_value()
+                    affected, _ = ranking.add(id, values[id])
+                    affected.append(id)
+                self.assertRanksMatch(ranking, ids, values, sort_ascending)
+                after = ranking.ranks(ids)
+                changed = set(i for i in values if before[i] != after[i])
+                self.assertTrue(changed <= set(affected))
+
+    def test_decimal_values(self):
+        ids = [1, 2, 3]
+        values = {1: Decimal('0.5'), 2: Decimal('0.25'), 3: Decimal('0.5')}
+        self.assertRanksMatch(DenseRanking(values, sort_ascending=False), ids, values, False)
+
+
+class LeaderboardRankingTests(TestCase):
+    def setUp(self):
+        self.random = random.Random(7)
+        self.scoredefs = {1: True, 2: False}
+        self.computed_deps = {3: (True, [1, 2])}
+
+    def _expected(self, ids, values):
+        ranks = {}
+        for sdef_id, sort_ascending in self.scoredefs.iteritems():
+            ranks[sdef_id] = CompetitionPhase.rank_values(ids, values[sdef_id], sort_ascending=sort_ascending)
+        averages = {id: (ranks[1][id] + ranks[2][id]) / 2.0 for id in ids}
+        ranks[3] = CompetitionPhase.rank_values(ids, averages, sort_ascending=True)
+        return ranks, averages
+
+    def assertRankingMatches(self, ranking, ids, values):
+        ranks, averages = self._expected(ids, values)
+        for sdef_id in (1, 2, 3):
+            self.assertEqual(ranking.ranks(sdef_id), ranks[sdef_id])
+        self.assertEqual(ranking.values(3), averages)
+
+    def test_incremental_submissions_match_full_recompute(self):
+        values = {1: {}, 2: {}}
+        ids = []
+        ranking = LeaderboardRanking([], self.scoredefs, self.computed_deps, values)
+        for id in range(60):
+            if ids and self.random.random() < 0.3:
+                removed = self.random.choice(ids)
+                ids.remove(removed)
+                for sdef_values in values.itervalues():
+                    sdef_values.pop(removed, None)
+                ranking.remove_submission(removed)
+            else:
+                ids.append(id)
+                scores = {1: self.random.randint(0, 5), 2: self.random.randint(0, 3)}
+                if self.random.random() < 0.2:
+                    del scores[2]
+                for sdef_id, value in scores.iteritems():
+                    values[sdef_id][id] = value
+                ranking.add_submission(id, scores)
+            self.assertRankingMatches(ranking, ids, values)
+
+    def test_replaced_submissions_match_full_recompute(self):
+        ids = [1, 2, 3]
+        values = {1: {1: 1, 2: 2, 3: 3}, 2: {}}
+        ranking = LeaderboardRanking(ids, self.scoredefs, self.computed_deps, values)
+        ranking.add_submission(1, {})
+        del values[1][1]
+        self.assertRankingMatches(ranking, ids, values)
+
+        for id in ids * 10:
+            scores = {1: self.random.randint(0, 3), 2: self.random.randint(0, 3)}
+            if self.random.random() < 0.3:
+                del scores[self.random.choice([1, 2])]
+            for sdef_id, sdef_values in values.iteritems():
+                sdef_values.pop(id, None)
+                if sdef_id in scores:
+                    sdef_values[id] = scores[sdef_id]
+            ranking.add_submission(id, scores)
+            self.assertRankingMatches(ranking, ids, values)
+
+    def test_bulk_load_matches_full_recompute(self):
+        ids = range(30)
+        values = {
+            1: {id: self.random.randint(0, 5) for id in ids},
+            2: {id: self.random.randint(0, 5) for id in ids if id % 3},
+        }
+        ranking = LeaderboardRanking(ids, self.scoredefs, self.computed_deps, values)
+        self.assertRankingMatches(ranking, ids, values)
+
+    def test_state_round_trip_keeps_updating(self):
+        ids = range(40)
+        values = {
+            1: {id: Decimal(self.random.randint(0, 400)) / 8 for id in ids},
+            2: {id: Decimal(self.random.randint(0, 5)) for id in ids if id % 4},
+        }
+        state = LeaderboardRanking(ids, self.scoredefs, self.computed_deps, values).state()
+        ranking = LeaderboardRanking.from_state(json.loads(json.dumps(state)))
+        self.assertRankingMatches(ranking, ids, values)
+        for digits in (1, 2, 4):
+            self.assertEqual(ranking.formatted_values(1, digits),
+                             {id: CompetitionPhase.format_value(v, str(digits)) for id, v in values[1].iteritems()})
+
+        ranking.add_submission(40, {1: Decimal('12.5'), 2: Decimal('3')})
+        ranking.remove_submission(3)
+        ids = [id for id in ids if id != 3] + [40]
+        values[1][40], values[2][40] = Decimal('12.5'), Decimal('3')
+        for sdef_values in values.itervalues():
+            sdef_values.pop(3, None)
+        self.assertRankingMatches(ranking, ids, values)
+
+    def test_large_values_are_ranked_exactly(self):
+        ids = [1, 2]
+        values = {1: {1: Decimal('1'), 2: Decimal('2')}, 2: {}}
+        ranking = LeaderboardRanking(ids, self.scoredefs, self.computed_deps, values)
+        ranking.add_submission(3, {1: Decimal('1234567890.0000000001')})
+        ranking.add_submission(4, {1: Decimal('1234567890.0000000002')})
+        ranking = LeaderboardRanking.from_state(json.loads(json.dumps(ranking.state())))
+        self.assertEqual(ranking.ranks(1), {1: 1, 2: 2, 3: 3, 4: 4})
+        self.assertEqual(ranking.values(1)[4], Decimal('1234567890.0000000002'))
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class MatrixRankingTests(TestCase):
+    def setUp(self):
+        self.random = random.Random(3)
+        self.scoredefs = {1: True, 2: False, 3: True}
+        self.computed_deps = {4: (True, [1, 2]), 5: (False, [1, 2, 3])}
+
+    def assertMatchesLeaderboardRanking(self, ids, values):
+        expected = LeaderboardRanking(ids, self.scoredefs, self.computed_deps, values)
+        ranking = MatrixRanking(ids, self.scoredefs, self.computed_deps, values)
+        for sdef_id in (1, 2, 3, 4, 5):
+            self.assertEqual(ranking.ranks(sdef_id), expected.ranks(sdef_id))
+        for sdef_id in (4, 5):
+            self.assertEqual(ranking.values(sdef_id), expected.values(sdef_id))
+
+    def test_matches_leaderboard_ranking(self):
+        ids = range(200)
+        values = {
+            1: {id: Decimal(self.random.randint(0, 20)) / 4 for id in ids},
+            2: {id: self.random.random() for id in ids if id % 5},
+            3: {},
+        }
+        self.assertMatchesLeaderboardRanking(ids, values)
+
+    def test_chained_ties(self):
+        ids = range(4)
+        values = {1: {0: 0.0, 1: 0.6e-12, 2: 1.2e-12, 3: 1.8e-12}, 2: {}, 3: {0: 1.0}}
+        self.assertMatchesLeaderboardRanking(ids, values)
+
+    def test_formatted_values_match_leaderboard_ranking(self):
+        ids = range(300)
+        # Scores have 10 decimal places, with plenty of values halfway between two roundings
+        values = {
+            1: {id: Decimal(self.random.randint(-10 ** 6, 10 ** 6)) / 8 for id in ids},
+            2: {id: Decimal(self.random.randint(-10 ** 15, 10 ** 15)).scaleb(-10) for id in ids if id % 4},
+            3: {id: Decimal(self.random.randint(0, 10 ** 6)) * 5 / 10 ** (id % 10 + 1) for id in ids},
+        }
+        expected = LeaderboardRanking(ids, self.scoredefs, self.computed_deps, values)
+        ranking = MatrixRanking(ids, self.scoredefs, self.computed_deps, values)
+        for digits in range(1, 11):
+            for sdef_id in (1, 2, 3, 4, 5):
+                self.assertEqual(ranking.formatted_values(sdef_id, digits), expected.formatted_values(sdef_id, digits))
+
+    def test_large_decimal_values_are_ranked_exactly(self):
+        ids = [1, 2]
+        values = {1: {1: Decimal('1234567890.0000000001'), 2: Decimal('1234567890.0000000002')}, 2: {}, 3: {}}
+        self.assertEqual(MatrixRanking(ids, self.scoredefs, {}, values).ranks(1), {1: 1, 2: 2})
+
+    def test_state_matches_leaderboard_ranking(self):
+        ids = range(100)
+        values = {
+            1: {id: Decimal(self.random.randint(0, 40)) / 8 for id in ids},
+            2: {id: Decimal(self.random.randint(-10 ** 6, 10 ** 6)).scaleb(-3) for id in ids if id % 3},
+            3: {id: Decimal(self.random.randint(0, 10 ** 12)) for id in ids if id % 2},
+        }
+        expected = LeaderboardRanking(ids, self.scoredefs, self.computed_deps, values)
+        state = json.loads(json.dumps(MatrixRanking(ids, self.scoredefs, self.computed_deps, values).state()))
+        ranking = LeaderboardRanking.from_state(state)
+        for sdef_id in (1, 2, 3, 4, 5):
+            self.assertEqual(ranking.rankings[sdef_id].entries, expected.rankings[sdef_id].entries)
+        self.assertEqual(ranking.exact, set([3]))
@@ -0,0 +1,122 @@
+import datetime
+import hashlib
+import io
+
+import mock
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from apps.jobs.models import Job
+from apps.web.forms import CompetitionPhaseForm
+from apps.web.models import (CachedSubmissionResult,
+                             Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             FileDigest,
+                             ParticipantStatus,
+                             SubmissionScore,
+                             SubmissionScoreDef)
+from apps.web.tasks import _result_cache_key, evaluate_submission, file_digest, update_submission
+from apps.web.zipstream import FileSource
+
+User = get_user_model()
+
+
+class ResultMemoizationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="participant", password="pass")
+        self.competition = Competition.objects.create(creator=self.user, modified_by=self.user)
+        self.participant = CompetitionParticipant.objects.create(
+            user=self.user,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        )
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+            max_submissions=10,
+            memoize_results=True,
+            scoring_program_uses_scores=False,
+            scoring_program_uses_history=False,
+            scoring_program_uses_coopetition=False,
+        )
+        self.phase.scoring_program.save('program.zip', ContentFile('scoring program'))
+        self.phase.reference_data.save('reference.zip', ContentFile('reference data'))
+        SubmissionScoreDef.objects.create(competition=self.competition, key='accuracy', label='accuracy', ordering=1)
+        for codename in (CompetitionSubmissionStatus.SUBMITTED, CompetitionSubmissionStatus.FINISHED):
+            CompetitionSubmissionStatus.objects.get_or_create(name=codename, codename=codename)
+        self.addCleanup(mock.patch.stopall)
+        mock.patch('apps.web.tasks._sign_urls', side_effect=lambda paths, permission, duration: paths).start()
+        self.compute_worker_run = mock.patch('apps.web.tasks._prepare_compute_worker_run').start()
+
+    def _submit(self, content):
+        submission = CompetitionSubmission.objects.create(participant=self.participant, phase=self.phase)
+        submission.file.save('predictions.zip', ContentFile(content))
+        return submission
+
+    def _evaluate(self, submission):
+        evaluate_submission(submission.pk, True)
+        return CompetitionSubmission.objects.get(pk=submission.pk), Job.objects.latest('pk')
+
+    def _scores(self, submission):
+        return dict(SubmissionScore.objects.filter(result=submission).values_list('scoredef__key', 'value'))
+
+    def test_identical_results_are_scored_once(self):
+        first, job = self._evaluate(self._submit('predictions'))
+        self.assertEqual(self.compute_worker_run.call_count, 1)
+        update_submission(job.pk, {'status': 'finished', 'extra': {'scores': [['accuracy', '0.75']]}}, first.secret)
+        self.assertEqual(CachedSubmissionResult.objects.get().submission, first)
+
+        second, job = self._evaluate(self._submit('predictions'))
+        self.assertEqual(self.compute_worker_run.call_count, 1)
+        self.assertEqual(second.status.codename, CompetitionSubmissionStatus.FINISHED)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.FINISHED)
+        self.assertEqual(self._scores(second), {'accuracy': 0.75})
+        self.assertEqual(second.output_file.name, first.output_file.name)
+        self.assertEqual(second.stdout_file.name, first.stdout_file.name)
+
+        third, _ = self._evaluate(self._submit('other predictions'))
+        self.assertEqual(self.compute_worker_run.call_count, 2)
+        self.assertEqual(third.status.codename, CompetitionSubmissionStatus.SUBMITTED)
+
+    def test_only_opted_in_phases_with_deterministic_inputs_are_memoized(self):
+        submission = self._submit('predictions')
+        self.assertEqual(_result_cache_key(submission, False)['results_digest'], hashlib.sha1('predictions').hexdigest())
+
+        self.phase.scoring_program_uses_scores = True
+        self.assertIsNone(_result_cache_key(submission, False))
+        self.phase.scoring_program_uses_scores = False
+        self.phase.memoize_results = False
+        self.assertIsNone(_result_cache_key(submission, False))
+
+    def test_digests_are_recorded_by_name(self):
+        open_file = mock.Mock(side_effect=lambda: io.BytesIO('content'))
+        digests = [file_digest(FileSource('bundle.zip', open_file)) for _ in range(2)]
+        self.assertEqual(open_file.call_count, 1)
+        self.assertEqual(digests[0], digests[1])
+        self.assertEqual(FileDigest.objects.get(name='bundle.zip').digest, digests[0])
+
+    def test_phases_reading_auxiliary_inputs_are_not_memoized(self):
+        phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=2,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=10),
+            memoize_results=True,
+        )
+        self.assertFalse(phase.memoizes_results)
+        submission = CompetitionSubmission.objects.create(participant=self.participant, phase=phase)
+        submission.file.save('predictions.zip', ContentFile('predictions'))
+        self.assertIsNone(_result_cache_key(submission, False))
+
+        form = CompetitionPhaseForm(instance=phase)
+        form.cleaned_data = {'memoize_results': True, 'scoring_program_uses_scores': False,
+                             'scoring_program_uses_history': True, 'scoring_program_uses_coopetition': False}
+        with self.assertRaisesRegexp(ValidationError, "can only be reused"):
+            form.clean_memoize_results()
+        form.cleaned_data['scoring_program_uses_history'] = False
+        self.assertTrue(form.clean_memoize_results())
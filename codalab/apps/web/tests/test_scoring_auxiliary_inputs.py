@@ -0,0 +1,94 @@
+import datetime
+import io
+import json
+import zipfile
+
+import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             ParticipantStatus,
+                             scoring_program_auxiliary_inputs)
+from apps.web.tasks import score
+
+User = get_user_model()
+
+
+def _program(members):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w') as archive:
+        for name, content in members:
+            archive.writestr(name, content)
+    data.seek(0)
+    return data
+
+
+class ScoringProgramAuxiliaryInputsTests(TestCase):
+    def test_inputs_referred_to_by_the_program(self):
+        program = _program([
+            ('metadata', 'command: python $program/score.py $input $output'),
+            ('score.py', "history_dir = os.path.join(input_dir, 'history')\n"
+                         "open(os.path.join(output_dir, 'scores.txt'), 'w')\n"),
+            ('lib/coop.py', 'path = "%s/coopetition/coopetition_phase_1.txt" % input_dir'),
+        ])
+        self.assertEqual(scoring_program_auxiliary_inputs(program), set(['history', 'coopetition']))
+
+    def test_plain_programs_use_none(self):
+        program = _program([('score.py', "scores = read(join(input_dir, 'ref'))\nhistory_length = 0\n")])
+        self.assertEqual(scoring_program_auxiliary_inputs(program), set())
+
+    def test_unreadable_programs_use_all(self):
+        self.assertEqual(scoring_program_auxiliary_inputs(io.BytesIO('not a zip')),
+                         set(['scores', 'history', 'coopetition']))
+
+
+class ScoreAuxiliaryInputsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="participant", password="pass")
+        self.competition = Competition.objects.create(creator=self.user, modified_by=self.user)
+        participant = CompetitionParticipant.objects.create(
+            user=self.user,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        )
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+            scoring_program='program.zip',
+            reference_data='reference.zip',
+        )
+        self.submission = CompetitionSubmission.objects.create(participant=participant, phase=self.phase,
+                                                               file='submission.zip')
+        self.submission.execution_key = json.dumps({})
+
+    def _score(self):
+        with mock.patch('apps.web.tasks._prepare_compute_worker_run'), \
+                mock.patch('apps.web.tasks._set_submission_status'), \
+                mock.patch('apps.web.tasks._sign_urls', side_effect=lambda paths, permission, duration: paths), \
+                mock.patch('apps.web.tasks.get_coopetition_file_name', return_value='coopetition.zip') as coopetition, \
+                mock.patch.object(Competition, 'get_results_csv', return_value='') as get_results_csv:
+            score(self.submission, 1)
+        inputs = [line.split(':')[0] for line in self.submission.inputfile.read().splitlines()]
+        return inputs, coopetition.called, get_results_csv.called
+
+    def test_all_inputs_are_generated_by_default(self):
+        inputs, coopetition_built, scores_built = self._score()
+        self.assertTrue(set(['history', 'scores', 'coopetition']) < set(inputs))
+        self.assertTrue(coopetition_built)
+        self.assertTrue(scores_built)
+
+    def test_inputs_not_used_by_the_phase_are_skipped(self):
+        self.phase.scoring_program_uses_scores = False
+        self.phase.scoring_program_uses_history = False
+        self.phase.scoring_program_uses_coopetition = False
+        self.phase.save()
+        inputs, coopetition_built, scores_built = self._score()
+        self.assertFalse(set(['history', 'scores', 'coopetition']) & set(inputs))
+        self.assertFalse(coopetition_built)
+        self.assertFalse(scores_built)
+        self.assertFalse(self.submission.history_file)
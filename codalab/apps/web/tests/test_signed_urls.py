@@ -0,0 +1,64 @@
+import urlparse
+
+import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from apps.web import tasks
+from apps.web.tasks import _make_url_sassy, _make_urls_sassy
+from codalab.azure_storage import get_blob_sas_signer, make_blob_sas_url
+
+
+ACCOUNT_KEY = 'c2VjcmV0LWtleQ=='
+
+
+class BlobSasSignerTests(TestCase):
+    def test_urls_signed_together_share_the_policy(self):
+        signer = get_blob_sas_signer('account', ACCOUNT_KEY)
+        self.assertIs(get_blob_sas_signer('account', ACCOUNT_KEY), signer)
+
+        urls = signer.sign('bundles', ['a/program.zip', 'b/reference.zip'], permission='r', duration=60)
+        parsed = [urlparse.urlparse(url) for url in urls]
+        self.assertEqual([url.path for url in parsed], ['/bundles/a/program.zip', '/bundles/b/reference.zip'])
+        queries = [urlparse.parse_qs(url.query) for url in parsed]
+        self.assertEqual(queries[0]['se'], queries[1]['se'])
+        self.assertEqual(queries[0]['sp'], ['r'])
+        self.assertNotEqual(queries[0]['sig'], queries[1]['sig'])
+
+    def test_single_urls_match_batches(self):
+        url = make_blob_sas_url('account', ACCOUNT_KEY, 'bundles', 'output.zip', permission='w', duration=60)
+        self.assertEqual(urlparse.parse_qs(urlparse.urlparse(url).query)['sp'], ['w'])
+
+
+@override_settings(USE_AWS=False,
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   BUNDLE_AZURE_ACCOUNT_NAME='account',
+                   BUNDLE_AZURE_ACCOUNT_KEY=ACCOUNT_KEY,
+                   BUNDLE_AZURE_CONTAINER='bundles',
+                   SIGNED_URL_CACHE_MARGIN=60 * 60)
+class MakeUrlsSassyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.sign_urls = mock.patch('apps.web.tasks._sign_urls', side_effect=tasks._sign_urls).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_read_urls_of_immutable_blobs_are_cached(self):
+        first = _make_urls_sassy(['program.zip', 'reference.zip'], immutable=True)
+        self.assertEqual(_make_urls_sassy(['reference.zip', 'program.zip'], immutable=True), first[::-1])
+        self.assertEqual(_make_url_sassy('input.zip', immutable=True).split('?')[0],
+                         'https://account.blob.core.windows.net/bundles/input.zip')
+        self.assertEqual([args[0] for args, _ in self.sign_urls.call_args_list],
+                         [['program.zip', 'reference.zip'], ['input.zip']])
+
+    def test_other_urls_are_signed_every_time(self):
+        _make_urls_sassy(['output.zip', 'stdout.txt'], permission='w', immutable=True)
+        _make_urls_sassy(['output.zip', 'stdout.txt'], permission='w', immutable=True)
+        _make_url_sassy('input.txt')
+        _make_url_sassy('input.txt')
+        self.assertEqual(self.sign_urls.call_count, 4)
+
+    def test_urls_expiring_within_the_margin_are_not_cached(self):
+        _make_url_sassy('program.zip', duration=30, immutable=True)
+        _make_url_sassy('program.zip', duration=30, immutable=True)
+        self.assertEqual(self.sign_urls.call_count, 2)
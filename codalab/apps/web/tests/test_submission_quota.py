@@ -0,0 +1,93 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
+from django.test import TestCase
+
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             ParticipantStatus,
+                             SubmissionQuota,
+                             copy_submissions)
+
+User = get_user_model()
+
+
+class SubmissionQuotaTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="participant", password="pass")
+        self.competition = Competition.objects.create(creator=self.user, modified_by=self.user)
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+            max_submissions=3,
+            max_submissions_per_day=2,
+        )
+        self.participant = CompetitionParticipant.objects.create(
+            user=self.user,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        )
+        self.failed = CompetitionSubmissionStatus.objects.get_or_create(
+            name="failed",
+            codename=CompetitionSubmissionStatus.FAILED
+        )[0]
+
+    def _submit(self, **kwargs):
+        return CompetitionSubmission.objects.create(participant=self.participant, phase=self.phase, **kwargs)
+
+    def _quota(self):
+        return SubmissionQuota.objects.get(phase=self.phase, participant=self.participant)
+
+    def test_submissions_are_numbered_and_counted(self):
+        self.assertEqual([self._submit().submission_number for _ in range(2)], [1, 2])
+        quota = self._quota()
+        self.assertEqual((quota.submission_count, quota.day_submission_count, quota.day),
+                         (2, 2, datetime.date.today()))
+
+        with self.assertRaisesRegexp(PermissionDenied, "this day"):
+            self._submit()
+        SubmissionQuota.objects.filter(pk=quota.pk).update(day=datetime.date.today() - datetime.timedelta(days=1))
+        self.assertEqual(self._submit().submission_number, 3)
+        with self.assertRaisesRegexp(PermissionDenied, "has been reached"):
+            self._submit()
+        self.assertEqual(self._quota().submission_count, 3)
+        self.assertEqual(CompetitionSubmission.objects.filter(phase=self.phase).count(), 3)
+
+    def test_failed_submissions_are_given_back_once(self):
+        submissions = [self._submit(), self._submit()]
+        for _ in range(2):
+            submissions[0].status = self.failed
+            submissions[0].save()
+        self.assertEqual(self._quota().failed_count, 1)
+        self.assertEqual(self._submit().submission_number, 3)
+
+    def test_ledger_starts_from_existing_submissions(self):
+        submission = self._submit()
+        SubmissionQuota.objects.all().delete()
+        CompetitionSubmission.objects.filter(pk=submission.pk).update(status=self.failed, submission_number=2)
+
+        self.assertEqual(self._submit().submission_number, 3)
+        quota = self._quota()
+        self.assertEqual((quota.submission_count, quota.failed_count, quota.day_submission_count), (3, 1, 2))
+
+    def test_forced_submissions_are_numbered_before_the_next_ones(self):
+        submission = self._submit()
+        copy_submissions([submission, submission], self.phase)
+        self.assertEqual(self._quota().submission_count, 2)
+        forced = CompetitionSubmission(participant=self.participant, phase=self.phase)
+        forced.save(ignore_submission_limits=True)
+        self.assertEqual(forced.submission_number, 3)
+        self.assertEqual(self._quota().submission_count, 3)
+        with self.assertRaisesRegexp(PermissionDenied, "has been reached"):
+            self._submit()
+
+    def test_days_without_submissions_are_denied(self):
+        self.phase.max_submissions_per_day = 0
+        self.phase.save()
+        with self.assertRaisesRegexp(PermissionDenied, "this day"):
+            self._submit()
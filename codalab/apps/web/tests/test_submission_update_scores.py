@@ -0,0 +1,198 @@
+import datetime
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+
+from decimal import Decimal
+
+import mock
+from celery import current_app
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.jobs.models import Job
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionPhase,
+                             CompetitionSubmission,
+                             CompetitionSubmissionStatus,
+                             ParticipantStatus,
+                             PhaseLeaderBoard,
+                             PhaseLeaderBoardEntry,
+                             SubmissionScore,
+                             SubmissionScoreDef)
+from apps.web.tasks import _save_scores, update_submission
+from apps.web.utils import HttpRangeFile
+from codalabtools.compute.worker import read_scores
+
+User = get_user_model()
+
+
+def _zip(members):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members:
+            archive.writestr(name, content)
+    return data.getvalue()
+
+
+class SubmissionScoresUpdateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="participant", password="pass")
+        self.competition = Competition.objects.create(creator=self.user, modified_by=self.user)
+        participant = CompetitionParticipant.objects.create(
+            user=self.user,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        )
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+            max_submissions=10,
+        )
+        self.participant = participant
+        for ordering, key in enumerate(('accuracy', 'error')):
+            SubmissionScoreDef.objects.create(competition=self.competition, key=key, label=key, ordering=ordering + 1,
+                                              sorting='asc')
+        for codename in (CompetitionSubmissionStatus.FINISHED, CompetitionSubmissionStatus.FAILED):
+            CompetitionSubmissionStatus.objects.get_or_create(name=codename, codename=codename)
+        self.submission, self.job = self._submit()
+
+    def _submit(self):
+        submission = CompetitionSubmission.objects.create(participant=self.participant, phase=self.phase)
+        job = Job.objects.create_job('evaluate_submission', {'submission_id': submission.pk})
+        submission.execution_key = json.dumps({'score': job.pk})
+        submission.save()
+        return submission, job
+
+    def _finish(self, extra, submission=None, job=None):
+        submission = submission or self.submission
+        job = job or self.job
+        secret = CompetitionSubmission.objects.get(pk=submission.pk).secret
+        update_submission(job.pk, {'status': 'finished', 'extra': extra}, secret)
+        submission = CompetitionSubmission.objects.get(pk=submission.pk)
+        scores = dict(SubmissionScore.objects.filter(result=submission).values_list('scoredef__key', 'value'))
+        return submission.status.codename, scores
+
+    def test_scores_parsed_by_the_worker_are_saved_without_reading_the_output(self):
+        with mock.patch('apps.web.tasks.read_output_member') as read_output_member:
+            status, scores = self._finish({'scores': [['accuracy', '0.75'], ['error', '0.25'], ['unknown', '1']]})
+        self.assertFalse(read_output_member.called)
+        self.assertEqual(status, CompetitionSubmissionStatus.FINISHED)
+        self.assertEqual(scores, {'accuracy': 0.75, 'error': 0.25})
+
+    def test_scores_are_read_from_output_zip_without_them(self):
+        self.submission.output_file.save('output.zip', ContentFile(_zip([
+            ('scores.txt', 'accuracy: 0.5\nerror:0.5\n'),
+            ('predictions.txt', 'x' * 10000),
+        ])))
+        status, scores = self._finish({})
+        self.assertEqual(status, CompetitionSubmissionStatus.FINISHED)
+        self.assertEqual(scores, {'accuracy': 0.5, 'error': 0.5})
+
+    def test_missing_scores_fail_the_submission(self):
+        self.submission.output_file.save('output.zip', ContentFile(_zip([('predictions.txt', 'x')])))
+        status, scores = self._finish({})
+        self.assertEqual(status, CompetitionSubmissionStatus.FAILED)
+        self.assertEqual(scores, {})
+
+    def test_query_count_does_not_grow_with_the_number_of_scores(self):
+        def count_queries(submission, job, scores):
+            with CaptureQueriesContext(connection) as context:
+                self._finish({'scores': scores}, submission, job)
+            return len(context.captured_queries)
+
+        # The first finish of a phase creates its leaderboard
+        count_queries(self.submission, self.job, [['accuracy', '0.5']])
+        submission, job = self._submit()
+        few = count_queries(submission, job, [['accuracy', '0.5']])
+        for number in range(50):
+            SubmissionScoreDef.objects.create(competition=self.competition, key='metric%d' % number,
+                                              label='metric%d' % number, ordering=number + 3)
+        submission, job = self._submit()
+        many = count_queries(submission, job, [['accuracy', '0.5']] + [['metric%d' % number, number]
+                                                                        for number in range(50)])
+        self.assertEqual(SubmissionScore.objects.filter(result=submission).count(), 51)
+        self.assertEqual(few, many)
+
+    def test_scores_are_replaced_and_leaderboards_invalidated(self):
+        board = PhaseLeaderBoard.objects.create(phase=self.phase)
+        SubmissionScore.objects.create(result=self.submission, scoredef=SubmissionScoreDef.objects.get(key='error'),
+                                       value=1)
+        version = PhaseLeaderBoard.objects.get(pk=board.pk).version
+        status, scores = self._finish({'scores': [['accuracy', '0.1'], ['error', '0.2'], ['error', '0.3']]})
+        self.assertEqual(scores, {'accuracy': Decimal('0.1'), 'error': Decimal('0.3')})
+        self.assertGreater(PhaseLeaderBoard.objects.get(pk=board.pk).version, version)
+
+    def test_failed_ingestion_does_not_finish_the_submission(self):
+        SubmissionScoreDef.objects.filter(key='error').update(computed=True)
+        status, scores = self._finish({'scores': [['accuracy', '0.1'], ['error', '0.2']]})
+        self.assertEqual(status, CompetitionSubmissionStatus.FAILED)
+        self.assertEqual(scores, {})
+
+    def test_force_best_submission_replaces_the_leaderboard_entry(self):
+        self.phase.force_best_submission_to_leaderboard = True
+        self.phase.save()
+        self._finish({'scores': [['accuracy', '0.3'], ['error', '0.5']]})
+        self.assertTrue(PhaseLeaderBoardEntry.objects.filter(result=self.submission).exists())
+
+        submission, job = self._submit()
+        self._finish({'scores': [['accuracy', '0.1'], ['error', '0.5']]}, submission, job)
+        entries = PhaseLeaderBoardEntry.objects.filter(board__phase=self.phase)
+        self.assertEqual([entry.result_id for entry in entries], [submission.pk])
+
+    def test_updates_are_sent_to_the_submission_updates_queue(self):
+        self.assertIn(update_submission.name, current_app.tasks)
+        self.assertEqual(update_submission.queue, 'submission-updates')
+        self.assertFalse(hasattr(_save_scores, 'apply_async'))
+
+
+class HttpRangeFileTests(TestCase):
+    def test_reads_a_zip_member_without_downloading_the_other_ones(self):
+        predictions = os.urandom(1024 * 1024)
+        archive = _zip([('predictions.bin', predictions), ('scores.txt', 'accuracy: 1')])
+        downloaded = []
+
+        def get(url, headers=None):
+            start, end = [int(bound) for bound in headers['Range'][len('bytes='):].split('-')]
+            content = archive[start:end + 1]
+            downloaded.append(len(content))
+            return mock.Mock(status_code=206, content=content,
+                             headers={'Content-Range': 'bytes %d-%d/%d' % (start, end, len(archive))})
+
+        with mock.patch('apps.web.utils.requests.get', side_effect=get):
+            self.assertEqual(zipfile.ZipFile(HttpRangeFile('https://blob/output.zip?sig=x')).read('scores.txt'),
+                             'accuracy: 1')
+        self.assertLess(sum(downloaded), len(predictions) / 4)
+
+    def test_servers_ignoring_ranges_send_the_whole_file(self):
+        archive = _zip([('scores.txt', 'accuracy: 1')])
+        with mock.patch('apps.web.utils.requests.get', return_value=mock.Mock(status_code=200, content=archive)):
+            self.assertEqual(zipfile.ZipFile(HttpRangeFile('https://blob/output.zip')).read('scores.txt'),
+                             'accuracy: 1')
+
+
+class WorkerReadScoresTests(TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir, True)
+
+    def _write_scores(self, content):
+        with open(os.path.join(self.output_dir, 'scores.txt'), 'w') as f:
+            f.write(content)
+
+    def test_reads_scores(self):
+        self._write_scores('accuracy: 0.5\r\nerror : 1e-3\n')
+        self.assertEqual(read_scores(self.output_dir), [('accuracy', '0.5'), ('error', '1e-3')])
+
+    def test_missing_or_malformed_scores_are_left_to_the_site(self):
+        self.assertIsNone(read_scores(self.output_dir))
+        self._write_scores('time: 12:30\n')
+        self.assertIsNone(read_scores(self.output_dir))
@@ -0,0 +1,39 @@
+from django.test import TestCase
+
+from apps.web.management.commands.benchmark_views import hot_view_urls, measure_view
+from apps.web.management.commands.random_competitions import create_random_competition, get_or_create_user
+from apps.web.models import ParticipantStatus
+
+
+class HotViewQueryCountTests(TestCase):
+    """
+    Guards the views requested the most against queries issued per participant or per submission.
+    """
+
+    def setUp(self):
+        super(HotViewQueryCountTests, self).setUp()
+        self.organizer = get_or_create_user('organizer', 'organizer@test.com')
+        self.client.login(username='organizer', password='testing')
+
+    def _measure(self, participant_count, submission_count):
+        competition = create_random_competition(self.organizer,
+                                                'Competition %d' % participant_count,
+                                                'participant_%d_' % participant_count,
+                                                participant_count,
+                                                participant_status=ParticipantStatus.APPROVED,
+                                                submission_count=submission_count)
+        counts = {}
+        for name, url in hot_view_urls(competition):
+            queries, _, status_code = measure_view(self.client, url)
+            self.assertEqual(status_code, 200, "%s returned %d" % (name, status_code))
+            counts[name] = queries
+        return counts
+
+    def test_query_counts_do_not_grow_with_competition_size(self):
+        # Warms up the site wide configuration which is created and cached on the first request
+        self._measure(1, 1)
+        small = self._measure(2, 1)
+        large = self._measure(6, 3)
+        for name, queries in small.iteritems():
+            self.assertEqual(queries, large[name], "%s issued %d queries for the small competition and %d for the "
+                                                   "large one" % (name, queries, large[name]))
@@ -0,0 +1,60 @@
+import os
+import shutil
+import tempfile
+
+import mock
+from django.test import TestCase
+
+from codalabtools.compute.worker import ExecutionSlot, acquire_slot
+
+
+class ExecutionSlotTests(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def _acquire(self, slots):
+        slot = acquire_slot(self.temp_dir, slots=slots)
+        self.addCleanup(slot.release)
+        return slot
+
+    def test_concurrent_runs_get_distinct_slots(self):
+        first = self._acquire(2)
+        second = self._acquire(2)
+        self.assertEqual((first.index, second.index), (0, 1))
+        self.assertNotEqual(first.temp_root, second.temp_root)
+        self.assertFalse(ExecutionSlot(0, self.temp_dir).try_acquire())
+
+        first.release()
+        self.assertEqual(self._acquire(2).index, 0)
+
+    def test_resources_are_shared_between_slots(self):
+        with mock.patch('codalabtools.compute.worker.psutil') as psutil:
+            psutil.cpu_count.return_value = 32
+            psutil.virtual_memory.return_value.total = 64 * 1024
+            args = self._acquire(4).docker_args()
+        self.assertEqual(args[args.index('--cpus') + 1], '8.00')
+        self.assertEqual(args[args.index('--memory') + 1], '16384b')
+        self.assertIn('--label', args)
+
+    def test_single_slot_has_no_resource_limits(self):
+        args = self._acquire(1).docker_args()
+        self.assertNotIn('--cpus', args)
+        self.assertNotIn('--memory', args)
+
+    @mock.patch('codalabtools.compute.worker.call')
+    @mock.patch('codalabtools.compute.worker.check_output', return_value='abc\ndef\n')
+    def test_cleanup_only_touches_its_slot(self, check_output, call):
+        first = self._acquire(2)
+        second = self._acquire(2)
+        for slot in (first, second):
+            slot.cleanup()
+            os.mkdir(os.path.join(slot.temp_root, 'run'))
+            open(os.path.join(slot.temp_root, 'leftover.txt'), 'w').close()
+
+        first.cleanup()
+        self.assertEqual(os.listdir(first.temp_root), [])
+        self.assertEqual(sorted(os.listdir(second.temp_root)), ['leftover.txt', 'run'])
+        check_output.assert_called_with(['docker', 'ps', '--all', '--quiet', '--filter', 'label=%s' % first.label])
+        call.assert_any_call(['docker', 'rm', '--force', 'abc', 'def'])
+        call.assert_any_call(['fuser', '-k', first.temp_root])
@@ -0,0 +1,180 @@
+import os
+import shutil
+import tempfile
+import urllib
+import zipfile
+
+import mock
+import yaml
+
+from django.test import TestCase
+
+from codalabtools.compute.worker import BundleCache, get_bundle
+
+
+class GetBundleTests(TestCase):
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_dir, True)
+        self.addCleanup(shutil.rmtree, self.root_dir, True)
+
+    def _url(self, name):
+        return 'file:' + urllib.pathname2url(os.path.join(self.source_dir, name))
+
+    def _zip(self, name, files):
+        with zipfile.ZipFile(os.path.join(self.source_dir, name), 'w') as z:
+            for file_name, content in files.items():
+                z.writestr(file_name, content)
+        return self._url(name)
+
+    def _metadata(self, name, metadata):
+        with open(os.path.join(self.source_dir, name), 'w') as f:
+            f.write(yaml.dump(metadata))
+        return self._url(name)
+
+    def test_fetches_referenced_bundles_recursively(self):
+        ref_url = self._zip('ref.zip', {'truth.txt': 'truth'})
+        res_url = self._zip('res.zip', {'answer.txt': 'answer'})
+        input_url = self._metadata('input.txt', {'ref': ref_url, 'res': res_url})
+        program_url = self._zip('program.zip', {'metadata': 'command: python $program/score.py', 'score.py': ''})
+        run_url = self._metadata('run.txt', {
+            'program': program_url,
+            'input': input_url,
+            'description': 'not a bundle',
+            'submitted-by': 'someone',
+        })
+
+        timings = {}
+        bundles = get_bundle(self.root_dir, 'run', run_url, timings=timings, threads=2)
+
+        self.assertEqual(bundles['description'], 'not a bundle')
+        self.assertEqual(bundles['program'], {'command': 'python $program/score.py'})
+        self.assertEqual(bundles['input'], {'ref': None, 'res': None})
+        run_dir = os.path.join(self.root_dir, 'run')
+        with open(os.path.join(run_dir, 'input', 'ref', 'truth.txt')) as f:
+            self.assertEqual(f.read(), 'truth')
+        with open(os.path.join(run_dir, 'input', 'res', 'answer.txt')) as f:
+            self.assertEqual(f.read(), 'answer')
+        self.assertTrue(os.path.exists(os.path.join(run_dir, 'program', 'score.py')))
+        self.assertEqual(sorted(timings.keys()), ['run', 'run/input', 'run/input/ref', 'run/input/res', 'run/program'])
+        self.assertEqual(sorted(timings['run/program'].keys()), ['download', 'extract'])
+
+    def test_raises_when_a_referenced_bundle_is_missing(self):
+        run_url = self._metadata('run.txt', {
+            'program': self._zip('program.zip', {'metadata': 'command: ls'}),
+            'input': self._url('missing.zip'),
+        })
+        with self.assertRaises(Exception):
+            get_bundle(self.root_dir, 'run', run_url)
+
+
+class BundleCacheTests(TestCase):
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source_dir, True)
+        self.addCleanup(shutil.rmtree, self.cache_dir, True)
+        self.cache = BundleCache(self.cache_dir, 1024 * 1024)
+
+    def _zip(self, name, files):
+        with zipfile.ZipFile(os.path.join(self.source_dir, name), 'w') as z:
+            for file_name, content in files.items():
+                z.writestr(file_name, content)
+        return 'file:' + urllib.pathname2url(os.path.join(self.source_dir, name))
+
+    def _run(self, run_url):
+        root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root_dir, True)
+        timings = {}
+        get_bundle(root_dir, 'run', run_url, timings=timings, cache=self.cache,
+                   cached_bundles=('run/program', 'run/input/ref'))
+        return os.path.join(root_dir, 'run'), timings
+
+    def _run_url(self, program_url, ref_url, res_url):
+        input_path = os.path.join(self.source_dir, 'input.txt')
+        with open(input_path, 'w') as f:
+            f.write(yaml.dump({'ref': ref_url, 'res': res_url}))
+        run_path = os.path.join(self.source_dir, 'run.txt')
+        with open(run_path, 'w') as f:
+            f.write(yaml.dump({'program': program_url, 'input': 'file:' + urllib.pathname2url(input_path)}))
+        return 'file:' + urllib.pathname2url(run_path)
+
+    def test_scoring_program_and_reference_data_are_linked_from_the_cache(self):
+        run_url = self._run_url(self._zip('program.zip', {'metadata': 'command: ls', 'score.py': 'score'}),
+                                self._zip('ref.zip', {'truth.txt': 'truth'}),
+                                self._zip('res.zip', {'answer.txt': 'answer'}))
+
+        _, timings = self._run(run_url)
+        self.assertEqual(timings['run/program']['cache'], 'miss')
+        self.assertEqual(timings['run/input/ref']['cache'], 'miss')
+        self.assertNotIn('cache', timings['run/input/res'])
+
+        run_dir, timings = self._run(run_url)
+        self.assertEqual(timings['run/program']['cache'], 'hit')
+        self.assertEqual(timings['run/input/ref']['cache'], 'hit')
+        self.assertNotIn('cache', timings['run/input/res'])
+        with open(os.path.join(run_dir, 'input', 'ref', 'truth.txt')) as f:
+            self.assertEqual(f.read(), 'truth')
+        score_path = os.path.join(run_dir, 'program', 'score.py')
+        self.assertGreater(os.stat(score_path).st_nlink, 1)
+        self.assertTrue(os.access(os.path.join(run_dir, 'program'), os.W_OK))
+
+    def test_changed_blob_is_a_miss(self):
+        program_url = self._zip('program.zip', {'metadata': 'command: ls', 'score.py': 'v1'})
+        ref_url = self._zip('ref.zip', {'truth.txt': 'truth'})
+        res_url = self._zip('res.zip', {'answer.txt': 'answer'})
+        _, first_timings = self._run(self._run_url(program_url, ref_url, res_url))
+
+        self._zip('program.zip', {'metadata': 'command: ls', 'score.py': 'v2'})
+        run_dir, timings = self._run(self._run_url(program_url, ref_url, res_url))
+        self.assertEqual(timings['run/program']['cache'], 'miss')
+        self.assertNotEqual(timings['run/program']['key'], first_timings['run/program']['key'])
+        self.assertEqual(timings['run/input/ref']['cache'], 'hit')
+        self.assertEqual(timings['run/input/ref']['key'], first_timings['run/input/ref']['key'])
+        with open(os.path.join(run_dir, 'program', 'score.py')) as f:
+            self.assertEqual(f.read(), 'v2')
+
+    def test_etag_hit_skips_the_download(self):
+        program_url = self._zip('program.zip', {'metadata': 'command: ls'})
+        ref_url = self._zip('ref.zip', {'truth.txt': 'truth'})
+        run_url = self._run_url(program_url, ref_url, self._zip('res.zip', {'answer.txt': 'answer'}))
+        urlopen = urllib.urlopen
+
+        def urlopen_with_etag(url):
+            response = urlopen(url)
+            response.info()['ETag'] = '"%s"' % url
+            response.read = mock.Mock(side_effect=response.read)
+            reads.append(response.read)
+            return response
+
+        reads = []
+        with mock.patch('codalabtools.compute.worker.urllib.urlopen', side_effect=urlopen_with_etag):
+            self._run(run_url)
+            self.assertTrue(all(read.called for read in reads))
+            reads = []
+            _, timings = self._run(run_url)
+        self.assertEqual(timings['run/program']['cache'], 'hit')
+        self.assertEqual(len(reads), 2)
+        self.assertFalse(any(read.called for read in reads))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = BundleCache(self.cache_dir, 1500)
+        keys = []
+        for name in ('a', 'b', 'c'):
+            staging_dir = cache.staging_dir()
+            os.mkdir(os.path.join(staging_dir, 'tree'))
+            with open(os.path.join(staging_dir, 'tree', 'data'), 'w') as f:
+                f.write('x' * 600)
+            key = BundleCache.key(name, 'etag')
+            cache.add(key, staging_dir)
+            keys.append(key)
+            # Modification times only have a one second resolution on some file systems
+            entry = os.path.join(self.cache_dir, key)
+            os.utime(entry, (len(keys), len(keys)))
+
+        target_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, target_dir, True)
+        self.assertFalse(cache.link(keys[0], os.path.join(target_dir, 'a')))
+        self.assertTrue(cache.link(keys[1], os.path.join(target_dir, 'b')))
+        self.assertTrue(cache.link(keys[2], os.path.join(target_dir, 'c')))
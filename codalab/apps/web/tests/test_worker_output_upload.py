@@ -0,0 +1,96 @@
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+
+import mock
+from django.test import TestCase
+
+from codalabtools.compute.worker import _blocks, put_blob_stream, upload_outputs, zip_directory
+
+
+AZURE_URL = 'https://account.blob.core.windows.net/bundles/output.zip?sv=2015&sig=abc'
+S3_URL = 'https://bucket.s3.amazonaws.com/output.zip?Signature=abc'
+
+
+class OutputUploadTests(TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir, True)
+
+    def _write(self, name, content):
+        path = os.path.join(self.output_dir, name)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def _put(self, put):
+        received = []
+
+        def record(url, data=None, headers=None):
+            received.append((url, data if isinstance(data, str) else data.read()))
+            return mock.Mock(status_code=201)
+        put.side_effect = record
+        return received
+
+    def test_zip_directory_matches_the_output_folder(self):
+        self._write('scores.txt', 'score: 1')
+        self._write('nested/detail.html', '<html/>' * 1000)
+        self._write('private/secret.txt', 'secret')
+
+        archive = zipfile.ZipFile(io.BytesIO(''.join(zip_directory(self.output_dir, exclude=('private',)))))
+        self.assertEqual(sorted(archive.namelist()), ['nested/detail.html', 'scores.txt'])
+        self.assertEqual(archive.read('nested/detail.html'), '<html/>' * 1000)
+        self.assertIsNone(archive.testzip())
+
+        archive = zipfile.ZipFile(io.BytesIO(''.join(zip_directory(self.output_dir))))
+        self.assertEqual(archive.read('private/secret.txt'), 'secret')
+
+    def test_blocks(self):
+        self.assertEqual(list(_blocks(['ab', 'cde', 'f', 'ghijk'], 4)), ['abcd', 'efgh', 'ijk'])
+        self.assertEqual(list(_blocks([], 4)), [])
+
+    @mock.patch('codalabtools.compute.worker.requests.put')
+    def test_azure_uploads_are_committed_as_a_block_list(self, put):
+        received = self._put(put)
+        put_blob_stream(AZURE_URL, iter(['0123', '4567', '89']), block_size=3)
+
+        blocks = received[:-1]
+        self.assertEqual(''.join(data for _, data in blocks), '0123456789')
+        self.assertTrue(all('&comp=block&blockid=' in url for url, _ in blocks))
+        url, block_list = received[-1]
+        self.assertTrue(url.endswith('&comp=blocklist'))
+        block_ids = [re.search('blockid=([^&]+)', block_url).group(1).replace('%3D', '=') for block_url, _ in blocks]
+        self.assertEqual(re.findall('<Latest>(.*?)</Latest>', block_list), block_ids)
+        self.assertEqual(len(set(block_ids)), 4)
+
+    @mock.patch('codalabtools.compute.worker.requests.put')
+    def test_other_storages_get_a_single_put(self, put):
+        received = self._put(put)
+        put_blob_stream(S3_URL, iter(['small']))
+        put_blob_stream(S3_URL, iter(['a' * 10, 'b' * 10]), spool_size=8)
+        self.assertEqual(received, [(S3_URL, 'small'), (S3_URL, 'a' * 10 + 'b' * 10)])
+
+    def test_uploads_run_concurrently(self):
+        both_started = threading.Event()
+        started = []
+
+        def upload(name):
+            started.append(name)
+            if len(started) == 2:
+                both_started.set()
+            self.assertTrue(both_started.wait(5))
+
+        upload_outputs([(upload, ('stdout',)), (upload, ('output',))], threads=2)
+        self.assertEqual(sorted(started), ['output', 'stdout'])
+
+    def test_upload_errors_are_raised(self):
+        def fail():
+            raise IOError("Connection reset")
+
+        with self.assertRaises(IOError):
+            upload_outputs([(fail, ())])
@@ -0,0 +1,44 @@
+import sys
+import threading
+import time
+
+from subprocess import Popen
+
+from django.test import TestCase
+
+from codalabtools.compute.worker import SupervisedProcess
+
+
+class SupervisedProcessTests(TestCase):
+    def _start(self, code):
+        return SupervisedProcess(Popen([sys.executable, '-c', code]))
+
+    def test_exit_is_returned_without_waiting_for_a_poll_interval(self):
+        start = time.time()
+        process = self._start('import sys; sys.exit(3)')
+        self.assertEqual(process.wait(deadline=time.time() + 30), 3)
+        self.assertLess(time.time() - start, 0.9)
+
+    def test_deadline_returns_none_and_kill_reaps_the_process(self):
+        process = self._start('import time; time.sleep(30)')
+        start = time.time()
+        self.assertIsNone(process.wait(deadline=start + 0.2))
+        self.assertLess(time.time() - start, 5)
+        process.kill()
+        self.assertTrue(process.exited.is_set())
+        self.assertIsNotNone(process.process.returncode)
+
+    def test_processes_are_supervised_concurrently(self):
+        slow = self._start('import time; time.sleep(30)')
+        fast = self._start('pass')
+        results = {}
+
+        def wait_for_slow():
+            results['slow'] = slow.wait(deadline=time.time() + 0.5)
+
+        waiter = threading.Thread(target=wait_for_slow)
+        waiter.start()
+        self.assertEqual(fast.wait(deadline=time.time() + 30), 0)
+        waiter.join()
+        self.assertIsNone(results['slow'])
+        slow.kill()
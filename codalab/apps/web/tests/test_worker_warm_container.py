@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+from subprocess import CalledProcessError
+
+import mock
+from django.test import TestCase
+
+from codalabtools.compute.worker import ExecutionSlot, WarmContainer
+
+
+class WarmContainerTests(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        self.slot = ExecutionSlot(1, self.temp_dir, cpus='2.00', memory='1024b')
+        self.program_key = 'program-key'
+
+    @mock.patch('codalabtools.compute.worker.call', return_value=0)
+    @mock.patch('codalabtools.compute.worker.check_output')
+    def test_starts_a_container_mounting_the_slot_temp_root(self, check_output, call):
+        def docker(args, **kwargs):
+            if args[1] == 'inspect':
+                raise CalledProcessError(1, args)
+            return 'previous\n'
+        check_output.side_effect = docker
+
+        container = WarmContainer(self.slot, 'image', self.program_key)
+        self.assertFalse(container.start())
+
+        call.assert_any_call(['docker', 'rm', '--force', 'previous'])
+        run_cmd = call.call_args_list[-1][0][0]
+        self.assertEqual(run_cmd[:2], ['docker', 'run'])
+        self.assertIn('{0}:{0}'.format(self.slot.temp_root), run_cmd)
+        self.assertIn(container.name, run_cmd)
+        self.assertEqual(run_cmd[run_cmd.index('--cpus') + 1], '2.00')
+        self.assertNotIn(self.slot.label, run_cmd)
+        self.assertEqual(run_cmd[-4:], ['image', 'tail', '-f', '/dev/null'])
+        self.assertEqual(container.command(['python', 'score.py']),
+                         ['docker', 'exec', container.name, 'python', 'score.py'])
+
+    @mock.patch('codalabtools.compute.worker.call', return_value=0)
+    @mock.patch('codalabtools.compute.worker.check_output', return_value='true\n')
+    def test_running_container_is_reused_after_resetting_tmp(self, check_output, call):
+        container = WarmContainer(self.slot, 'image', self.program_key)
+        self.assertTrue(container.start())
+        reset_cmd = call.call_args[0][0]
+        self.assertEqual(reset_cmd[:4], ['docker', 'exec', container.name, 'sh'])
+        self.assertIn('rm -rf /tmp/*', reset_cmd[-1])
+
+    def test_container_changes_with_the_image_and_the_program(self):
+        name = WarmContainer(self.slot, 'image', self.program_key).name
+        self.assertEqual(WarmContainer(self.slot, 'image', self.program_key).name, name)
+        self.assertNotEqual(WarmContainer(self.slot, 'other', self.program_key).name, name)
+        self.assertNotEqual(WarmContainer(ExecutionSlot(2, self.temp_dir), 'image', self.program_key).name, name)
+        self.assertNotEqual(WarmContainer(self.slot, 'image', 'other-program-key').name, name)
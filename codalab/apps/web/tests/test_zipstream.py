@@ -0,0 +1,86 @@
+import io
+import mock
+import zipfile
+
+from django.test import TestCase
+
+from apps.web import zipstream
+from apps.web.zipstream import FileSource, missing_sources, prefetch, zip_stream
+
+
+class ChunkedFile(object):
+    """ File like object recording the sizes of the reads. """
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+        self.reads = []
+        self.closed = False
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return self.data.read(size)
+
+    def close(self):
+        self.closed = True
+
+
+class ZipStreamTests(TestCase):
+    def _read_zip(self, chunks):
+        return zipfile.ZipFile(io.BytesIO(''.join(chunks)))
+
+    def test_stream_is_a_valid_zip_archive(self):
+        big = 'x' * 100000 + 'y' * 3
+        archive = self._read_zip(zip_stream([
+            ('a.txt', 'hello'),
+            (u'unicode \u2020.txt', 'world'),
+            ('big.bin', lambda: ChunkedFile(big)),
+            ('empty.txt', ''),
+        ], chunk_size=4096))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(archive.namelist(), ['a.txt', u'unicode \u2020.txt', 'big.bin', 'empty.txt'])
+        self.assertEqual(archive.read('a.txt'), 'hello')
+        self.assertEqual(archive.read(u'unicode \u2020.txt'), 'world')
+        self.assertEqual(archive.read('big.bin'), big)
+        self.assertEqual(archive.read('empty.txt'), '')
+
+    def test_deflated_members(self):
+        data = 'compress me ' * 1000
+        archive = self._read_zip(zip_stream([('data.txt', data)], compression=zipfile.ZIP_DEFLATED))
+        info = archive.getinfo('data.txt')
+        self.assertEqual(info.compress_type, zipfile.ZIP_DEFLATED)
+        self.assertLess(info.compress_size, len(data))
+        self.assertEqual(archive.read('data.txt'), data)
+
+    def test_sources_are_read_in_chunks_and_closed(self):
+        source = ChunkedFile('z' * 10)
+        archive = self._read_zip(zip_stream([('z.txt', lambda: source)], chunk_size=3))
+        self.assertEqual(archive.read('z.txt'), 'z' * 10)
+        self.assertEqual(source.reads, [3, 3, 3, 3, 3])
+        self.assertTrue(source.closed)
+
+    def test_prefetch_keeps_the_order_of_the_members(self):
+        members = [('%d.txt' % i, lambda i=i: ChunkedFile(str(i) * 5)) for i in range(10)]
+        result = [(name, ''.join(chunks)) for name, chunks in prefetch(members, workers=3, chunk_size=2)]
+        self.assertEqual(result, [('%d.txt' % i, str(i) * 5) for i in range(10)])
+
+    def test_read_errors_are_raised_to_the_writer(self):
+        def broken():
+            raise IOError("blob not found")
+        with mock.patch.object(zipstream.logger, 'exception') as log_exception:
+            with self.assertRaises(IOError):
+                ''.join(zip_stream([('ok.txt', 'ok'), ('broken.txt', broken)]))
+        self.assertIn('broken.txt', log_exception.call_args[0])
+
+    def test_missing_sources_are_found_before_streaming(self):
+        members = [
+            ('data.txt', 'data'),
+            ('stored.zip', FileSource('stored.zip', ChunkedFile, exists=lambda: True)),
+            ('missing.zip', FileSource('missing.zip', ChunkedFile, exists=lambda: False)),
+            ('unchecked.zip', FileSource('unchecked.zip', ChunkedFile)),
+        ]
+        self.assertEqual(missing_sources(members), ['missing.zip'])
+
+    def test_zip64_end_of_central_directory(self):
+        with mock.patch.object(zipstream, 'ZIP32_MAX_ENTRIES', 2):
+            archive = self._read_zip(zip_stream([('%d.txt' % i, str(i)) for i in range(3)]))
+        self.assertEqual(archive.namelist(), ['0.txt', '1.txt', '2.txt'])
+        self.assertEqual(archive.read('2.txt'), '2')
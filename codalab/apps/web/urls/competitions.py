@@ -23,11 +23,13 @@ urlpatterns = patterns(
     url(r'^submission_delete/(?P<pk>\d+)', views.SubmissionDelete.as_view(), name="submission_delete"),
     url(r'^download_yaml/(?P<competition_pk>\d+)', views.download_competition_yaml, name="download_yaml"),
     url(r'^download/(?P<competition_pk>\d+)', views.download_competition_bundle, name="download"),
+    url(r'^download_leaderboard_results/(?P<competition_pk>\d+)/(?P<phase_pk>\d+)/status/(?P<job_pk>\d+)$', views.download_leaderboard_results_status, name="download_leaderboard_results_status"),
     url(r'^download_leaderboard_results/(?P<competition_pk>\d+)/(?P<phase_pk>\d+)', views.download_leaderboard_results, name="download_leaderboard_results"),
     url(r'^update_description/(?P<submission_pk>\d+)', views.submission_update_description, name="submission_update_description"),
     url(r'^mark_as_failed/(?P<submission_pk>\d+)', views.submission_mark_as_failed, name="submission_mark_as_failed"),
     url(r'^toggle_leaderboard/(?P<submission_pk>\d+)', views.submission_toggle_leaderboard, name="submission_toggle_leaderboard"),
     url(r'^submission_re_run/(?P<submission_pk>\d+)', views.submission_re_run, name="submission_re_run"),
+    url(r'^submission_re_run_all/(?P<phase_pk>\d+)/status/(?P<job_pk>\d+)$', views.submission_re_run_all_status, name="submission_re_run_all_status"),
     url(r'^submission_re_run_all/(?P<phase_pk>\d+)', views.submission_re_run_all, name="submission_re_run_all"),
     url(r'^submission_migrate/(?P<pk>\d+)', views.submission_migrate, name="submission_migrate"),
     url(r'^public_submissions/(?P<pk>\d+)$', views.CompetitionPublicSubmission.as_view(), name='public_submissions'),
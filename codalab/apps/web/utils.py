@@ -1,5 +1,8 @@
+import csv
 import re
 
+import requests
+
 from django.conf import settings
 from django.core.files.storage import get_storage_class
 
@@ -32,3 +35,103 @@ def docker_image_clean(image_name):
     # If any not allowed are found, replaced with second argument to sub.
     image_name = re.sub('[^0-9a-zA-Z/.:-]+', '', image_name)
     return image_name
+
+
+class Echo(object):
+    """
+    Pseudo file which returns what is written to it instead of buffering it, so a csv writer
+    hands back each formatted line.
+    """
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """
+    Yields each row of an iterable formatted as a line of CSV, for a `StreamingHttpResponse`.
+    """
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def parse_scores(text):
+    """
+    Parses the lines 'key: value' of a scores.txt file written by a scoring program.
+
+    :return: List of (key, value) with the value left as a string.
+    :raises ValueError: If a line is not made of a key and a value.
+    """
+    scores = []
+    for line in text.split("\n"):
+        if len(line) > 0:
+            label, value = line.split(":")
+            scores.append((label.strip(), value.strip()))
+    return scores
+
+
+class HttpRangeFile(object):
+    """
+    Read only file over a url whose server answers range requests, like a signed blob url. Only the parts
+    read are downloaded, so `ZipFile` can read a single member of a remote archive.
+
+    :param url: Url to read.
+    :param block_size: Minimum number of bytes fetched by each request.
+    """
+    def __init__(self, url, block_size=64 * 1024):
+        self.url = url
+        self.block_size = block_size
+        self.position = 0
+        self._size = None
+        self._buffer = ''
+        self._buffer_start = 0
+
+    def _get(self, start, end):
+        response = requests.get(self.url, headers={'Range': 'bytes=%d-%d' % (start, end)})
+        if response.status_code == 206:
+            self._size = int(response.headers['Content-Range'].split('/')[-1])
+            self._buffer, self._buffer_start = response.content, start
+        elif response.status_code == 200:
+            # Ranges are not supported, the whole content was sent
+            self._size = len(response.content)
+            self._buffer, self._buffer_start = response.content, 0
+        elif response.status_code == 416:
+            # Range not satisfiable, the file is empty
+            self._size = 0
+            self._buffer, self._buffer_start = '', 0
+        else:
+            raise IOError("Unable to read %s: HTTP %s" % (self.url.split('?')[0], response.status_code))
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._get(0, self.block_size - 1)
+        return self._size
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += self.size
+        if offset < 0:
+            raise IOError("Invalid offset %d" % offset)
+        self.position = offset
+
+    def tell(self):
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        end = min(self.position + size, self.size)
+        if self.position >= end:
+            return ''
+        buffer_end = self._buffer_start + len(self._buffer)
+        if self.position < self._buffer_start or end > buffer_end:
+            self._get(self.position, self.position + max(end - self.position, self.block_size) - 1)
+        data = self._buffer[self.position - self._buffer_start:end - self._buffer_start]
+        self.position += len(data)
+        return data
+
+    def close(self):
+        self._buffer = ''
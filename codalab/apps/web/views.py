@@ -1,13 +1,9 @@
-import csv
-import urllib
 from datetime import datetime, timedelta
 import json
 import os
-import StringIO
 import sys
 import traceback
 import yaml
-import zipfile
 
 from django.db import connection
 from django.conf import settings
@@ -27,6 +23,7 @@ from django.http import HttpResponse, HttpResponseRedirect
 from django.http import StreamingHttpResponse
 from django.shortcuts import render_to_response, render
 from django.template import RequestContext, loader
+from django.utils.dateparse import parse_date
 from django.utils.decorators import method_decorator
 from django.utils.html import strip_tags
 from django.views.generic import FormView
@@ -46,9 +43,13 @@ from apps.forums.models import Forum
 from apps.common.competition_utils import get_most_popular_competitions, get_featured_competitions
 from apps.web.forms import CompetitionS3UploadForm, SubmissionS3UploadForm
 from apps.web.models import SubmissionScore, SubmissionScoreDef
+from apps.web.utils import BundleStorage, stream_csv
+from apps.web.zipstream import missing_sources, zip_stream
 
-from tasks import evaluate_submission, re_run_all_submissions_in_phase, create_competition, _make_url_sassy
-from apps.teams.models import TeamMembership, get_user_team, get_competition_teams, get_competition_pending_teams, get_competition_deleted_teams, get_last_team_submissions, get_user_requests, get_team_pending_membership
+from tasks import (evaluate_submission, re_run_all_submissions_in_phase, create_competition, _make_url_sassy,
+                   _storage_source, build_leaderboard_results_archive, leaderboard_results_members,
+                   leaderboard_results_archive_name)
+from apps.teams.models import get_user_team, get_user_teams, get_competition_teams, get_competition_pending_teams, get_competition_deleted_teams, get_last_team_submissions, get_user_requests, get_team_pending_membership
 
 from extra_views import UpdateWithInlinesView, InlineFormSet, NamedFormsetsMixin
 
@@ -500,7 +501,8 @@ class CompetitionDetailView(DetailView):
                     best_value = Min('value')
                 qs = qs.annotate(high_score=best_value, count=Count('pk'))
                 context['graph'] = {
-                    'days': [s['day'].strftime('%d %B %Y')  # ex 24 May 2017
+                    # sqlite returns the truncated dates as strings
+                    'days': [(parse_date(s['day'][:10]) if isinstance(s['day'], basestring) else s['day']).strftime('%d %B %Y')  # ex 24 May 2017
                            for s in qs],
                     'high_scores': [s['high_score'] for s in qs],
                     'counts': [s['count'] for s in qs],
@@ -718,14 +720,7 @@ class CompetitionResultsPage(TemplateView):
             context['is_owner'] = is_owner
             context['phase'] = phase
             context['groups'] = phase.scores()
-
-            for group in context['groups']:
-                for _, scoredata in group['scores']:
-                    sub = models.CompetitionSubmission.objects.get(pk=scoredata['id'])
-                    scoredata['date'] = sub.submitted_at
-                    scoredata['count'] = sub.phase.submissions.filter(participant=sub.participant).count()
-                    if sub.team:
-                        scoredata['team_name'] = sub.team.name
+            phase.add_submission_details(context['groups'])
 
             user = self.request.user
 
@@ -806,7 +801,7 @@ class CompetitionResultsDownload(View):
     def get(self, request, *args, **kwargs):
         competition = models.Competition.objects.get(pk=self.kwargs['id'])
         phase = competition.phases.get(pk=self.kwargs['phase'])
-        response = HttpResponse(competition.get_results_csv(phase.pk, request=request), status=200, content_type="text/csv")
+        response = StreamingHttpResponse(competition.iter_results_csv(phase.pk, request=request), status=200, content_type="text/csv")
         response["Content-Disposition"] = "attachment; filename=%s results.csv" % phase.competition.title
         return response
 
@@ -818,15 +813,26 @@ class CompetitionCompleteResultsDownload(View):
         competition = models.Competition.objects.get(pk=self.kwargs['id'])
         phase = competition.phases.get(pk=self.kwargs['phase'])
 
-        groups = phase.scores(include_scores_not_on_leaderboard=True)
-        leader_board = models.PhaseLeaderBoard.objects.get(phase=phase)
+        response = StreamingHttpResponse(stream_csv(self.get_rows(phase)), status=200, content_type="text/csv")
+        response["Content-Disposition"] = "attachment; filename=competition_results.csv"
+        return response
 
-        csvfile = StringIO.StringIO()
-        csvwriter = csv.writer(csvfile)
+    def get_rows(self, phase):
+        """
+        Yields the rows of the csv file, the submissions details are read with a single query
+        instead of one per row.
+        """
+        groups = phase.scores(include_scores_not_on_leaderboard=True)
+        leader_board_entries = set(models.PhaseLeaderBoardEntry.objects.filter(board__phase=phase).values_list('result_id', flat=True))
+        submissions = models.CompetitionSubmission.objects.filter(phase=phase).values_list(
+            'pk', 'description', 'submitted_at', 'readable_filename', 'file'
+        )
+        submissions = {pk: (description, submitted_at, readable_filename or os.path.basename(file_name))
+                       for pk, description, submitted_at, readable_filename, file_name in submissions.iterator()}
 
         for group in groups:
-            csvwriter.writerow([group['label'].encode("utf-8")])
-            csvwriter.writerow([])
+            yield [group['label'].encode("utf-8")]
+            yield []
 
             headers = ["User"]
             sub_headers = [""]
@@ -842,16 +848,14 @@ class CompetitionCompleteResultsDownload(View):
             headers.append('Date')
             headers.append('Filename')
             headers.append('Is on leaderboard?')
-            csvwriter.writerow(headers)
-            csvwriter.writerow(sub_headers)
+            yield headers
+            yield sub_headers
 
             if len(group['scores']) <= 0:
-                csvwriter.writerow(["No data available"])
+                yield ["No data available"]
             else:
-                leader_board_entries = models.PhaseLeaderBoardEntry.objects.filter(board=leader_board).values_list('result__id', flat=True)
-
                 for pk, scores in group['scores']:
-                    submission = models.CompetitionSubmission.objects.get(pk=scores['id'])
+                    description, submitted_at, filename = submissions[scores['id']]
                     row = [scores['username']]
                     for v in scores['values']:
                         if 'rnk' in v:
@@ -859,22 +863,17 @@ class CompetitionCompleteResultsDownload(View):
                         else:
                             row.append("%s (%s)" % (v['val'], v['hidden_rnk']))
 
-                    row.append(submission.description)
-                    row.append(submission.submitted_at)
-                    row.append(submission.get_filename())
+                    row.append(description)
+                    row.append(submitted_at)
+                    row.append(filename)
 
-                    is_on_leaderboard = submission.pk in leader_board_entries
+                    is_on_leaderboard = scores['id'] in leader_board_entries
                     row.append(is_on_leaderboard)
 
-                    row = [unicode(r).encode("utf-8") for r in row]
-                    csvwriter.writerow(row)
+                    yield [unicode(r).encode("utf-8") for r in row]
 
-            csvwriter.writerow([])
-            csvwriter.writerow([])
-
-        response = HttpResponse(csvfile.getvalue(), status=200, content_type="text/csv")
-        response["Content-Disposition"] = "attachment; filename=competition_results.csv"
-        return response
+            yield []
+            yield []
 
 
 # Views for My Codalab
@@ -961,12 +960,15 @@ class MyCompetitionParticipantView(LoginRequiredMixin, ListView):
         context['team_columns'] = team_columns
         # retrieve participant submissions information
         participant_list = []
-        competition_participants = self.queryset.filter(competition=competition)
-        competition_participants_ids = list(participant.id for participant in competition_participants)
+        competition_participants = self.queryset.filter(competition=competition).select_related('user', 'status')
         context['pending_participants'] = filter(lambda participant_submission: participant_submission.status.codename == models.ParticipantStatus.PENDING, competition_participants)
-        participant_submissions = models.CompetitionSubmission.objects.filter(participant__in=competition_participants_ids)
+        # equivalent to counting participant.submissions for each participant but in a single query
+        participant_entries = dict(models.CompetitionSubmission.objects.filter(
+            participant__competition=competition
+        ).values_list('participant').annotate(count=Count('pk')))
+        participant_teams = get_user_teams(competition_participants, competition)
         for number, participant in enumerate(competition_participants):
-            team = get_user_team(participant, participant.competition)
+            team = participant_teams[participant.pk]
             if team is not None:
                 team_name = team.name
             else:
@@ -978,8 +980,7 @@ class MyCompetitionParticipantView(LoginRequiredMixin, ListView):
                 'user_pk': participant.user.pk,
                 'status': participant.status.codename,
                 'number': number + 1,
-                # equivalent to assigning participant.submissions.count() but without several multiple db queires
-                'entries': len(filter(lambda participant_submission: participant_submission.participant.id == participant.id, participant_submissions)),
+                'entries': participant_entries.get(participant.pk, 0),
                 'team_name': team_name,
                 'team': team
             }
@@ -990,12 +991,14 @@ class MyCompetitionParticipantView(LoginRequiredMixin, ListView):
         context['competition_id'] = self.kwargs.get('competition_id')
 
         # If teams are enabled for this competition, add team information
-        competition = models.Competition.objects.get(pk=self.kwargs.get('competition_id'))
         if competition.enable_teams:
             context['teams_enabled'] = True
-            participant_memberships = TeamMembership.objects.filter(user__in=competition_participants_ids)
+            team_entries = {}
+            for participant_pk, team in participant_teams.iteritems():
+                if team is not None:
+                    team_entries[team.pk] = team_entries.get(team.pk, 0) + participant_entries.get(participant_pk, 0)
             teams_list = []
-            for number, team in enumerate(get_competition_teams(competition)):
+            for number, team in enumerate(get_competition_teams(competition).select_related('creator', 'status')):
                 team_entry = {
                     'pk': team.pk,
                     'name': team.name,
@@ -1005,10 +1008,7 @@ class MyCompetitionParticipantView(LoginRequiredMixin, ListView):
                     'num_pending': 0,
                     'status': team.status.codename,
                     'number': number + 1,
-                    # equivalent to assigning participant.submissions.count() but without several multiple db queires
-                    'entries': len(filter(
-                        lambda participant_submission: get_user_team(participant_submission.participant,
-                                                                     competition) == team, participant_submissions)),
+                    'entries': team_entries.get(team.pk, 0),
                 }
                 teams_list.append(team_entry)
             context['team_list'] = teams_list
@@ -1209,8 +1209,9 @@ class MyCompetitionSubmissionsPage(LoginRequiredMixin, TemplateView):
 
         submissions = models.CompetitionSubmission.objects.filter(phase=active_phase).select_related('participant', 'participant__user', 'status')
         # find which submissions are in the leaderboard, if any and only if phase allows seeing results.
-        leaderboard_entries = list(models.PhaseLeaderBoardEntry.objects.filter(board__phase__competition=competition))
-        id_of_submissions_in_leaderboard = [e.result.id for e in leaderboard_entries if e.result in submissions]
+        id_of_submissions_in_leaderboard = set(models.PhaseLeaderBoardEntry.objects.filter(
+            board__phase=active_phase
+        ).values_list('result_id', flat=True))
         # create column definition
         columns = [
             {
@@ -1245,6 +1246,12 @@ class MyCompetitionSubmissionsPage(LoginRequiredMixin, TemplateView):
                 'name': 'score_' + str(score_group_index),
             }
             columns.append(column)
+            # main score of each submission in the group
+            score_group['main_scores'] = {}
+            for _, user_score in score_group['scores']:
+                for value in user_score['values']:
+                    if value['name'] == score_group['selection_key']:
+                        score_group['main_scores'][user_score['id']] = value['val']
         # map submissions to view data
         submission_info_list = []
         for submission in submissions:
@@ -1268,16 +1275,8 @@ class MyCompetitionSubmissionsPage(LoginRequiredMixin, TemplateView):
             #if (submission_info['is_in_leaderboard'] == True):
             # add score groups into data columns
             for score_group_index, score_group in enumerate(scores):
-                # Need to figure out a way to check if submission is garbage.
-                try:
-                    user_score = filter(lambda user_score: user_score[1]['id'] == submission.id, score_group['scores'])[0] # This line return error.
-                    main_score = filter(lambda main_score: main_score['name'] == score_group['selection_key'], user_score[1]['values'])[0]
-                    submission_info['score_' + str(score_group_index)] = main_score['val']
-                # If submission is garbage put in garbage data.
-                except:
-                    user_score = "---"
-                    main_score = "---"
-                    submission_info['score_' + str(score_group_index)] = "---"
+                # Submissions without scores get garbage data.
+                submission_info['score_' + str(score_group_index)] = score_group['main_scores'].get(submission.id, "---")
             submission_info_list.append(submission_info)
         # order results
         sort_data_table(self.request, context, submission_info_list)
@@ -1409,6 +1408,21 @@ class SubmissionDelete(LoginRequiredMixin, DeleteView):
         self.success_url = reverse("competitions:view", kwargs={"pk": obj.phase.competition.pk})
         return obj
 
+
+def _zip_response(members, filename):
+    """
+    Streams a zip archive of the given members, or answers with an error before sending anything when
+    one of the stored files is missing.
+    """
+    missing = missing_sources(members)
+    if missing:
+        msg = "The following files could not be found, please report the issue: %s" % ", ".join(missing)
+        return HttpResponse(msg, status=404, content_type='text/plain')
+    resp = StreamingHttpResponse(zip_stream(members), content_type="application/x-zip-compressed")
+    resp['Content-Disposition'] = 'attachment; filename=%s' % filename
+    return resp
+
+
 def download_dataset(request, dataset_key):
     """
     Downloads a dataset that belongs to authenticated user
@@ -1423,20 +1437,13 @@ def download_dataset(request, dataset_key):
     try:
         if dataset.sub_data_files.count() > 0:
             # TODO: Could refactor this to only zip this stuff up one time, maybe after dataset creation?
-            zip_buffer = StringIO.StringIO()
-
-            zip_file = zipfile.ZipFile(zip_buffer, "w")
-            file_name = ""
+            members = []
 
             for sub_dataset in dataset.sub_data_files.all():
                 file_dir, file_name = os.path.split(sub_dataset.data_file.file.name)
-                zip_file.writestr(file_name, sub_dataset.data_file.read())
+                members.append((file_name, _storage_source(sub_dataset.data_file)))
 
-            zip_file.close()
-
-            resp = HttpResponse(zip_buffer.getvalue(), mimetype = "application/x-zip-compressed")
-            resp['Content-Disposition'] = 'attachment; filename=%s.zip' % dataset.name
-            return resp
+            return _zip_response(members, '%s.zip' % dataset.name)
         else:
             return HttpResponseRedirect(_make_url_sassy(dataset.data_file.file.name))
     except:
@@ -1516,12 +1523,11 @@ def download_competition_bundle(request, competition_pk):
         raise Http404()
 
     try:
-        zip_buffer = StringIO.StringIO()
-        zip_file = zipfile.ZipFile(zip_buffer, "w")
+        members = []
         yaml_data = yaml.load(competition.original_yaml_file)
 
         # Grab logo
-        zip_file.writestr(yaml_data["image"], competition.image.file.read())
+        members.append((yaml_data["image"], _storage_source(competition.image)))
 
         # Grab html pages
         for p in competition.pagecontent.pages.all():
@@ -1532,7 +1538,7 @@ def download_competition_bundle(request, competition_pk):
                 if p.codename == 'get_data':
                     # overwrite for consistency
                     p.codename = 'data'
-                zip_file.writestr(yaml_data["html"][p.codename], p.html.encode("utf-8"))
+                members.append((yaml_data["html"][p.codename], p.html.encode("utf-8")))
 
         # Grab input data, reference data, scoring program
         file_name_cache = []
@@ -1543,25 +1549,21 @@ def download_competition_bundle(request, competition_pk):
                     if phase.reference_data and phase.reference_data.file.name not in file_name_cache:
                         yaml_data["phases"][phase_index]["reference_data"] = phase.reference_data.file.name
                         file_name_cache += phase.reference_data.file.name
-                        zip_file.writestr(phase.reference_data.file.name, phase.reference_data.file.read())
+                        members.append((phase.reference_data.file.name, _storage_source(phase.reference_data)))
 
                     if phase.input_data and phase.input_data.file.name not in file_name_cache:
                         yaml_data["phases"][phase_index]["input_data"] = phase.input_data.file.name
                         file_name_cache += phase.input_data.file.name
-                        zip_file.writestr(phase.input_data.file.name, phase.input_data.file.read())
+                        members.append((phase.input_data.file.name, _storage_source(phase.input_data)))
 
                     if phase.scoring_program and phase.scoring_program.file.name not in file_name_cache:
                         yaml_data["phases"][phase_index]["scoring_program"] = phase.scoring_program.file.name
                         file_name_cache += phase.scoring_program.file.name
-                        zip_file.writestr(phase.scoring_program.file.name, phase.scoring_program.file.read())
-
-        zip_file.writestr("competition.yaml", yaml.dump(yaml_data))
+                        members.append((phase.scoring_program.file.name, _storage_source(phase.scoring_program)))
 
-        zip_file.close()
+        members.append(("competition.yaml", yaml.dump(yaml_data)))
 
-        resp = HttpResponse(zip_buffer.getvalue(), mimetype = "application/x-zip-compressed")
-        resp['Content-Disposition'] = 'attachment; filename=%s-%s.zip' % (competition.title, competition.pk)
-        return resp
+        return _zip_response(members, '%s-%s.zip' % (competition.title, competition.pk))
     except:
         exc_type, exc_value, exc_traceback = sys.exc_info()
         print "*** print_tb:"
@@ -1577,95 +1579,91 @@ def download_competition_bundle(request, competition_pk):
         return HttpResponse(msg, status=400, content_type='text/plain')
 
 
-@login_required
-def download_leaderboard_results(request, competition_pk, phase_pk):
+def _leaderboard_results_status(competition, phase, job):
     """
-    Downloads submissions from the leaderboard table.
-
-    :param competition_pk: Competition's primary key
-    :param phase_pk: Phase's primary key
+    Returns the JSON description of a leaderboard results archive build.
     """
+    data = {
+        'status': job.get_status_code_name(),
+        'status_url': reverse("competitions:download_leaderboard_results_status", kwargs={
+            'competition_pk': competition.pk,
+            'phase_pk': phase.pk,
+            'job_pk': job.pk
+        }),
+    }
+    info = job.get_task_info()
+    if job.status == Job.FINISHED:
+        data['url'] = info['url']
+    elif job.status == Job.RUNNING and 'progress' in info:
+        data['progress'] = info['progress']
+        data['total'] = info['total']
+    return data
+
+
+def _get_leaderboard_results_phase(request, competition_pk, phase_pk):
     try:
         competition = models.Competition.objects.get(pk=competition_pk)
         if competition.creator != request.user and request.user not in competition.admins.all():
             raise Http404()
 
-        phase = models.CompetitionPhase.objects.get(pk=phase_pk)
-        leaderboard_entries = models.PhaseLeaderBoardEntry.objects.filter(board__phase=phase)
+        phase = competition.phases.get(pk=phase_pk)
     except ObjectDoesNotExist:
         raise Http404()
+    return competition, phase
 
-    try:
-        zip_buffer = StringIO.StringIO()
-        zip_file = zipfile.ZipFile(zip_buffer, "w")
-
-        # Add teach team name in an easy to read way
-        team_name_cache = {}
-        team_name_string = ""
-        for result in models.PhaseLeaderBoardEntry.objects.filter(result__participant__user__team_name__isnull=False,
-                                                                  result__participant__competition=competition):
-            user_on_team = result.result.participant.user
-            team_name_cache[user_on_team.team_name] = user_on_team.team_members
-        for name, members in team_name_cache.items():
-            team_name_string += "Team: %s; members: %s\n" % (name, members)
-
-        if team_name_string:
-            zip_file.writestr("team_names_and_members.txt", team_name_string.encode('utf8'))
-
-        # Add each submission
-        for entry in leaderboard_entries:
-            # Maps back to submission
-            submission = entry.result
-            username_or_team_name = submission.participant.user.username if not submission.participant.user.team_name else "Team %s " % submission.participant.user.team_name
-            file_name = "%s - %s submission.zip" % (username_or_team_name, submission.submission_number)
-
-            if settings.USE_AWS:
-                url = _make_url_sassy(submission.s3_file)
-                zip_file.writestr(file_name, urllib.urlopen(url).read())
-            else:
-                zip_file.writestr(file_name, submission.file.read())
-
-            output_file_name = "%s - %s output.zip" % (username_or_team_name, submission.submission_number)
-            zip_file.writestr(output_file_name, submission.output_file.read())
-
-            profile_data_file_name = "%s - %s profile.txt" % (username_or_team_name, submission.submission_number)
-            user_profile_data = {
-                'Organization': submission.participant.user.organization_or_affiliation,
-                'Team Name': submission.participant.user.team_name,
-                'Team Members': submission.participant.user.team_members,
-                'Method Name': submission.participant.user.method_name,
-                'Method Description': submission.participant.user.method_description,
-                'Contact Email': submission.participant.user.contact_email,
-                'Project URL': submission.participant.user.project_url,
-                'Publication URL': submission.participant.user.publication_url,
-                'Bibtex': submission.participant.user.bibtex,
-            }
-            user_profile_data_string = '\n'.join(['%s: %s' % (k, v) for k, v in user_profile_data.items()])
-            zip_file.writestr(profile_data_file_name, user_profile_data_string.encode('utf-8'))
 
-            metadata_fields = ['method_name', 'method_description', 'project_url', 'publication_url', 'bibtex', 'team_name', 'organization_or_affiliation']
-            submission_metadata_file_name = "%s - %s method.txt" % (username_or_team_name, submission.submission_number)
-            submission_metadata_file_string = "\n".join(["%s: %s" % (field, getattr(submission, field)) for field in metadata_fields])
-            zip_file.writestr(submission_metadata_file_name, submission_metadata_file_string.encode('utf-8'))
+@login_required
+def download_leaderboard_results(request, competition_pk, phase_pk):
+    """
+    Downloads submissions from the leaderboard table. The archive is built by a site worker and kept
+    in BundleStorage until the leaderboard changes, meanwhile the progress of the build is returned.
 
-        zip_file.close()
+    :param competition_pk: Competition's primary key
+    :param phase_pk: Phase's primary key
+    """
+    competition, phase = _get_leaderboard_results_phase(request, competition_pk, phase_pk)
+
+    archive_name = leaderboard_results_archive_name(phase, leaderboard_results_members(phase))
+    if BundleStorage.exists(archive_name):
+        data = {'status': 'finished', 'url': _make_url_sassy(archive_name)}
+    else:
+        # Reuse the build of this version of the leaderboard already started, unless it failed
+        cache_key = 'leaderboard_results_job:%s' % archive_name
+        job = None
+        job_pk = cache.get(cache_key)
+        if job_pk is not None:
+            job = Job.objects.filter(pk=job_pk).first()
+        if job is None or job.status == Job.FAILED:
+            job = Job.objects.create_job('build_leaderboard_results', {'phase_pk': phase.pk})
+            cache.set(cache_key, job.pk, 60 * 60)
+            build_leaderboard_results_archive.apply_async((job.pk, phase.pk))
+        data = _leaderboard_results_status(competition, phase, job)
+
+    if request.is_ajax():
+        return HttpResponse(json.dumps(data), content_type="application/json")
+    if data['status'] == 'finished':
+        return HttpResponseRedirect(data['url'])
+    msg = "The archive of the leaderboard submissions is being prepared, please try again in a few minutes."
+    return HttpResponse(msg, content_type='text/plain')
 
-        resp = HttpResponse(zip_buffer.getvalue(), mimetype = "application/x-zip-compressed")
-        resp['Content-Disposition'] = 'attachment; filename=%s-%s-results.zip' % (competition.title, competition.pk)
-        return resp
-    except:
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        print "*** print_tb:"
-        traceback.print_tb(exc_traceback, limit=1, file=sys.stdout)
-        print "*** print_exception:"
-        traceback.print_exception(exc_type, exc_value, exc_traceback,
-                                  limit=2, file=sys.stdout)
-        print "*** print_exc:"
-        traceback.print_exc()
-        print "*** format_exc, first and last line:"
-        formatted_lines = traceback.format_exc().splitlines()
-        msg = "There was an error retrieving the file. Please try again later or report the issue."
-        return HttpResponse(msg, status=400, content_type='text/plain')
+
+@login_required
+def download_leaderboard_results_status(request, competition_pk, phase_pk, job_pk):
+    """
+    Returns the progress of the build of a leaderboard results archive.
+
+    :param competition_pk: Competition's primary key
+    :param phase_pk: Phase's primary key
+    :param job_pk: Primary key of the job building the archive
+    """
+    competition, phase = _get_leaderboard_results_phase(request, competition_pk, phase_pk)
+    try:
+        job = Job.objects.get(pk=job_pk, task_type='build_leaderboard_results')
+    except Job.DoesNotExist:
+        raise Http404()
+    if job.get_task_args().get('phase_pk') != phase.pk:
+        raise Http404()
+    return HttpResponse(json.dumps(_leaderboard_results_status(competition, phase, job)), content_type="application/json")
 
 
 @login_required
@@ -1732,12 +1730,13 @@ def submission_toggle_leaderboard(request, submission_pk):
             if not is_on_leaderboard:
                 models.add_submission_to_leaderboard(submission)
             else:
-                entries = models.PhaseLeaderBoardEntry.objects.filter(
-                    board__phase=submission.phase,
-                    result__participant=submission.participant
-                )
-                for entry in entries:
-                    entry.delete()
+                with models.update_leaderboard(submission.phase):
+                    entries = models.PhaseLeaderBoardEntry.objects.filter(
+                        board__phase=submission.phase,
+                        result__participant=submission.participant
+                    )
+                    for entry in entries:
+                        entry.delete()
 
             return HttpResponse()
         except models.CompetitionSubmission.DoesNotExist:
@@ -1759,19 +1758,9 @@ def submission_re_run(request, submission_pk):
             if request.user.id != competition.creator_id and request.user not in competition.admins.all():
                 raise Http404()
 
-            if settings.USE_AWS:
-                file_kwarg = {'s3_file': submission.s3_file}
-            else:
-                file_kwarg = {'file': submission.file}
-
-            new_submission = models.CompetitionSubmission(
-                participant=submission.participant,
-                phase=submission.phase,
-                **file_kwarg
-            )
-            new_submission.save(ignore_submission_limits=True)
+            new_submission_pk, = models.copy_submissions([submission], submission.phase)
 
-            evaluate_submission.apply_async((new_submission.pk, submission.phase.is_scoring_only))
+            evaluate_submission.apply_async((new_submission_pk, submission.phase.is_scoring_only))
 
             return HttpResponse()
         except models.CompetitionSubmission.DoesNotExist:
@@ -1779,6 +1768,24 @@ def submission_re_run(request, submission_pk):
     raise Http404()
 
 
+def _re_run_all_status(phase, job):
+    """
+    Returns the JSON description of the re-run of all submissions in a phase.
+    """
+    data = {
+        'status': job.get_status_code_name(),
+        'status_url': reverse("competitions:submission_re_run_all_status", kwargs={
+            'phase_pk': phase.pk,
+            'job_pk': job.pk
+        }),
+    }
+    info = job.get_task_info()
+    if 'progress' in info:
+        data['progress'] = info['progress']
+        data['total'] = info['total']
+    return data
+
+
 @login_required
 def submission_re_run_all(request, phase_pk):
     """Re-runs all submissions in a phase, distinct on the file name, so a submission
@@ -1791,14 +1798,36 @@ def submission_re_run_all(request, phase_pk):
             if request.user.id != competition.creator_id and request.user not in competition.admins.all():
                 raise Http404()
 
-            re_run_all_submissions_in_phase.apply_async((phase_pk,))
+            job = Job.objects.create_job('dispatch_evaluations', {'phase_pk': phase.pk})
+            re_run_all_submissions_in_phase.apply_async((phase.pk, job.pk))
 
-            return HttpResponse()
-        except models.CompetitionSubmission.DoesNotExist:
+            return HttpResponse(json.dumps(_re_run_all_status(phase, job)), content_type="application/json")
+        except models.CompetitionPhase.DoesNotExist:
             raise Http404()
     raise Http404()
 
 
+@login_required
+def submission_re_run_all_status(request, phase_pk, job_pk):
+    """
+    Returns the progress of the re-run of all submissions in a phase.
+
+    :param phase_pk: Phase's primary key
+    :param job_pk: Primary key of the job dispatching the evaluations
+    """
+    try:
+        phase = models.CompetitionPhase.objects.select_related('competition').get(pk=phase_pk)
+        competition = phase.competition
+        if request.user.id != competition.creator_id and request.user not in competition.admins.all():
+            raise Http404()
+        job = Job.objects.get(pk=job_pk, task_type='dispatch_evaluations')
+    except (models.CompetitionPhase.DoesNotExist, Job.DoesNotExist):
+        raise Http404()
+    if job.get_task_args().get('phase_pk') != phase.pk:
+        raise Http404()
+    return HttpResponse(json.dumps(_re_run_all_status(phase, job)), content_type="application/json")
+
+
 @login_required
 def submission_migrate(request, pk):
     '''
@@ -1816,14 +1845,9 @@ def submission_migrate(request, pk):
             current_phase_phasenumber = submission.phase.phasenumber
             next_phase = competition.phases.get(phasenumber=current_phase_phasenumber+1)
 
-            new_submission = models.CompetitionSubmission(
-                participant=submission.participant,
-                file=submission.file,
-                phase=next_phase)
-
-            new_submission.save(ignore_submission_limits=True)
+            new_submission_pk, = models.copy_submissions([submission], next_phase)
 
-            evaluate_submission.apply_async((new_submission.pk, submission.phase.is_scoring_only))
+            evaluate_submission.apply_async((new_submission_pk, submission.phase.is_scoring_only))
             submission.is_migrated = True
             submission.save()
 
@@ -0,0 +1,279 @@
+"""
+Streaming construction of zip archives.
+
+The archives are written front to back without seeking: each member is preceded by a local
+header without sizes and followed by a data descriptor (general purpose flag bit 3) holding its
+CRC and sizes, the central directory is emitted once all the members are written. Members are
+read in chunks, the ones coming next are fetched by background threads while the current one
+is written so the slow reads from the blob storage overlap.
+
+Once the response started the status can't change anymore: a member which can't be read is logged
+and aborts the stream, leaving the client with an incomplete transfer instead of a truncated but
+well formed looking archive. Use `missing_sources` to refuse the download up front.
+"""
+import collections
+import hashlib
+import logging
+import Queue
+import struct
+import threading
+import time
+import zipfile
+import zlib
+
+
+CHUNK_SIZE = 1024 * 1024
+PREFETCH_WORKERS = 4
+# Chunks buffered per member fetched ahead, bounds the memory to about
+# PREFETCH_WORKERS * PREFETCH_CHUNKS * CHUNK_SIZE
+PREFETCH_CHUNKS = 4
+
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP32_MAX_ENTRIES = 0xFFFF
+DATA_DESCRIPTOR_FLAG = 0x08
+UTF8_FLAG = 0x800
+DATA_DESCRIPTOR_SIGNATURE = 'PK\x07\x08'
+
+logger = logging.getLogger(__name__)
+
+
+class FileSource(object):
+    """
+    Source of a member read from a file, identified by a name which changes with its content, like
+    the path of a blob uploaded under a unique name.
+
+    :param name: Identifier of the file.
+    :param open_file: Callable returning a file like object to read.
+    :param exists: Optional callable returning whether the file can be read.
+    """
+    def __init__(self, name, open_file, exists=None):
+        self.name = name
+        self.open_file = open_file
+        self.exists = exists
+
+    def __call__(self):
+        return self.open_file()
+
+
+def missing_sources(members):
+    """
+    Returns the names of the members whose `FileSource` reports that its file does not exist.
+    """
+    return [name for name, source in members
+            if isinstance(source, FileSource) and source.exists is not None and not source.exists()]
+
+
+def members_digest(members):
+    """
+    Returns a hash of the names and sources of members, which identifies the archive they make.
+    Byte string sources are hashed by content and `FileSource` by name.
+    """
+    digest = hashlib.sha1()
+    for name, source in members:
+        if isinstance(name, unicode):
+            name = name.encode('utf-8')
+        if isinstance(source, FileSource):
+            source = 'file:%s' % source.name
+        digest.update('%d:%s%d:%s' % (len(name), name, len(source), source))
+    return digest.hexdigest()
+
+
+class ZipStreamWriter(object):
+    """
+    Writes a zip archive as a sequence of byte strings.
+
+    Each call of `write_member` or `close` returns a generator of the bytes to emit, they must be
+    consumed in the order they are requested.
+    """
+    def __init__(self, compression=zipfile.ZIP_STORED):
+        self.compression = compression
+        self.offset = 0
+        self.entries = []
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def write_member(self, name, chunks, compression=None):
+        """
+        Yields a member of the archive.
+
+        :param name: Path of the member in the archive.
+        :param chunks: Iterable of byte strings with the content of the member.
+        :param compression: zipfile.ZIP_STORED or zipfile.ZIP_DEFLATED, defaults to the compression
+                            of the writer.
+        """
+        if compression is None:
+            compression = self.compression
+        flags = DATA_DESCRIPTOR_FLAG
+        if isinstance(name, unicode):
+            name = name.encode('utf-8')
+            flags |= UTF8_FLAG
+        date_time = time.localtime(time.time())[:6]
+        dos_date = (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2]
+        dos_time = date_time[3] << 11 | date_time[4] << 5 | (date_time[5] // 2)
+        header_offset = self.offset
+
+        # CRC and sizes are not known yet, they follow the data in the descriptor
+        yield self._emit(struct.pack(zipfile.structFileHeader, zipfile.stringFileHeader, 20, 0, flags, compression,
+                                     dos_time, dos_date, 0, 0, 0, len(name), 0) + name)
+
+        crc = 0
+        size = 0
+        compressed_size = 0
+        compressor = None
+        if compression == zipfile.ZIP_DEFLATED:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        for chunk in chunks:
+            if not chunk:
+                continue
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            if compressor is not None:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+            compressed_size += len(chunk)
+            yield self._emit(chunk)
+        if compressor is not None:
+            chunk = compressor.flush()
+            compressed_size += len(chunk)
+            yield self._emit(chunk)
+        if size > ZIP32_LIMIT or compressed_size > ZIP32_LIMIT:
+            raise zipfile.LargeZipFile("Member %s is larger than 4GB" % name)
+
+        crc &= 0xFFFFFFFF
+        yield self._emit(struct.pack('<4s3L', DATA_DESCRIPTOR_SIGNATURE, crc, compressed_size, size))
+        self.entries.append((name, flags, compression, dos_time, dos_date, crc, compressed_size, size, header_offset))
+
+    def close(self):
+        """
+        Yields the central directory, ending the archive.
+        """
+        directory_offset = self.offset
+        for name, flags, compression, dos_time, dos_date, crc, compressed_size, size, header_offset in self.entries:
+            extra = ''
+            version = 20
+            if header_offset >= ZIP32_LIMIT:
+                # Zip64 extended information holding only the offset of the local header
+                extra = struct.pack('<2HQ', 1, 8, header_offset)
+                header_offset = ZIP32_LIMIT
+                version = 45
+            yield self._emit(struct.pack(zipfile.structCentralDir, zipfile.stringCentralDir, version, 3, version, 0,
+                                         flags, compression, dos_time, dos_date, crc, compressed_size, size,
+                                         len(name), len(extra), 0, 0, 0, 0600 << 16, header_offset) + name + extra)
+        directory_size = self.offset - directory_offset
+
+        count = len(self.entries)
+        if count >= ZIP32_MAX_ENTRIES or directory_offset >= ZIP32_LIMIT or directory_size >= ZIP32_LIMIT:
+            zip64_offset = self.offset
+            yield self._emit(struct.pack(zipfile.structEndArchive64, zipfile.stringEndArchive64, 44, 45, 45, 0, 0,
+                                         count, count, directory_size, directory_offset))
+            yield self._emit(struct.pack(zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator, 0,
+                                         zip64_offset, 1))
+            count = min(count, ZIP32_MAX_ENTRIES)
+            directory_size = min(directory_size, ZIP32_LIMIT)
+            directory_offset = min(directory_offset, ZIP32_LIMIT)
+        yield self._emit(struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive, 0, 0, count, count,
+                                     directory_size, directory_offset, 0))
+
+
+class _Fetch(threading.Thread):
+    """
+    Reads a member in chunks into a bounded queue, ahead of the writer.
+    """
+    def __init__(self, source, chunk_size, queue_size, cancelled):
+        super(_Fetch, self).__init__()
+        self.daemon = True
+        self.source = source
+        self.chunk_size = chunk_size
+        self.queue = Queue.Queue(queue_size)
+        self.cancelled = cancelled
+
+    def _put(self, item):
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(item, timeout=1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+
+    def run(self):
+        try:
+            f = self.source()
+            try:
+                while True:
+                    chunk = f.read(self.chunk_size)
+                    if not chunk or not self._put(chunk):
+                        break
+            finally:
+                if hasattr(f, 'close'):
+                    f.close()
+        except Exception as e:
+            self._put(e)
+        self._put(None)
+
+    def chunks(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+
+def prefetch(members, workers=PREFETCH_WORKERS, chunk_size=CHUNK_SIZE, queue_size=PREFETCH_CHUNKS):
+    """
+    Yields (name, chunks) for each member in order, reading the next `workers` members in background
+    threads. The chunks of a member must be consumed before asking for the next member.
+
+    :param members: Iterable of (name, source) where source is either a byte string or a callable
+                    returning a file like object to read.
+    """
+    members = iter(members)
+    cancelled = threading.Event()
+    pending = collections.deque()
+
+    def fetch_next():
+        for name, source in members:
+            if callable(source):
+                fetch = _Fetch(source, chunk_size, queue_size, cancelled)
+                fetch.start()
+                pending.append((name, fetch.chunks))
+            else:
+                pending.append((name, lambda data=source: iter([data])))
+            return
+
+    try:
+        for _ in range(workers):
+            fetch_next()
+        while pending:
+            name, chunks = pending.popleft()
+            yield name, chunks()
+            fetch_next()
+    finally:
+        # Stops the fetches still running when the client goes away
+        cancelled.set()
+
+
+def zip_stream(members, compression=zipfile.ZIP_STORED, workers=PREFETCH_WORKERS, chunk_size=CHUNK_SIZE):
+    """
+    Yields a zip archive of the given members, to be sent with a `StreamingHttpResponse`.
+
+    :param members: Iterable of (name, source) where source is either a byte string or a callable
+                    returning a file like object to read, e.g. ``lambda: BundleStorage.open(name)``.
+    """
+    writer = ZipStreamWriter(compression)
+    name = None
+    try:
+        for name, chunks in prefetch(members, workers=workers, chunk_size=chunk_size):
+            for data in writer.write_member(name, chunks):
+                yield data
+    except Exception:
+        # Raising aborts the response, the archive is never ended by a central directory
+        logger.exception("Aborted zip stream after %d bytes, reading member %s failed", writer.offset, name)
+        raise
+    for data in writer.close():
+        yield data
@@ -188,6 +188,55 @@ class AzureBlockBlobFile(RawIOBase):
 PREFERRED_STORAGE_X_MS_VERSION = '2013-08-15'
 
 
+class BlobSasSigner(object):
+    """
+    Signs blob URLs of a storage account, sharing the signature and blob service clients between the URLs.
+    """
+    date_format = "%Y-%m-%dT%H:%M:%SZ"
+
+    def __init__(self, account_name, account_key):
+        self.sas = SharedAccessSignature(account_name, account_key)
+        self.blob_service = BlobService(account_name, account_key)
+
+    def sign(self, container_name, blob_names, permission='r', duration=16):
+        """
+        Generates the SAS URLs of the given blobs, which share the same access policy.
+
+        container_name: Storage container.
+        blob_names: Blob names.
+        permission: Permission granted by the URLs.
+        duration: Minutes until SAS expiration, counted from utcnow() minus five minutes.
+
+        Returns the SAS URLs, in the order of blob_names.
+        """
+        start = datetime.datetime.utcnow() - datetime.timedelta(minutes=5)
+        expiry = start + datetime.timedelta(minutes=duration)
+        sap = SharedAccessPolicy(AccessPolicy(
+                start.strftime(self.date_format),
+                expiry.strftime(self.date_format),
+                permission))
+        urls = []
+        for blob_name in blob_names:
+            resource_path = '%s/%s' % (container_name, blob_name)
+            sas_token = self.sas.generate_signed_query_string(resource_path, 'b', sap)
+            urls.append(self.blob_service.make_blob_url(container_name=container_name, blob_name=blob_name,
+                                                        sas_token=sas_token))
+        return urls
+
+
+_blob_sas_signers = {}
+
+
+def get_blob_sas_signer(account_name, account_key):
+    """
+    Returns the BlobSasSigner of a storage account, created once per process.
+    """
+    key = (account_name, account_key)
+    if key not in _blob_sas_signers:
+        _blob_sas_signers[key] = BlobSasSigner(account_name, account_key)
+    return _blob_sas_signers[key]
+
+
 def make_blob_sas_url(account_name,
                       account_key,
                       container_name,
@@ -207,19 +256,5 @@ def make_blob_sas_url(account_name,
 
     Returns the SAS URL.
     """
-    sas = SharedAccessSignature(account_name, account_key)
-    resource_path = '%s/%s' % (container_name, blob_name)
-    date_format = "%Y-%m-%dT%H:%M:%SZ"
-    start = datetime.datetime.utcnow() - datetime.timedelta(minutes=5)
-    expiry = start + datetime.timedelta(minutes=duration)
-    sap = SharedAccessPolicy(AccessPolicy(
-            start.strftime(date_format),
-            expiry.strftime(date_format),
-            permission))
-    sas_token = sas.generate_signed_query_string(resource_path, 'b', sap)
-
-    blob_url = BlobService(account_name, account_key)
-
-    url = blob_url.make_blob_url(container_name=container_name, blob_name=blob_name, sas_token=sas_token)
-
-    return url
+    signer = get_blob_sas_signer(account_name, account_key)
+    return signer.sign(container_name, [blob_name], permission=permission, duration=duration)[0]
@@ -417,10 +417,12 @@ class Base(Settings):
     # Run as *not* root
     CELERYD_USER = "workeruser"
     CELERYD_GROUP = "workeruser"
+    # Phase migrations are scheduled at the start of the phases of the next interval, see schedule_phase_migrations
+    PHASE_MIGRATION_SCHEDULE_INTERVAL = 300
     CELERYBEAT_SCHEDULE = {
         'phase_migrations': {
-            'task': 'apps.web.tasks.do_phase_migrations',
-            'schedule': timedelta(seconds=300),
+            'task': 'apps.web.tasks.schedule_phase_migrations',
+            'schedule': timedelta(seconds=PHASE_MIGRATION_SCHEDULE_INTERVAL),
         },
     }
     CELERY_TIMEZONE = 'UTC'
@@ -573,7 +575,31 @@ class Base(Settings):
     # =========================================================================
     DOCKER_DEFAULT_WORKER_IMAGE = "ckcollab/codalab-legacy"
     DOCKER_MAX_SIZE_GB = 10.0
-    
+    # Number of images used by queued submissions that compute workers pull ahead of time
+    DOCKER_PREFETCH_IMAGES = 5
+
+    # =========================================================================
+    # Coopetitions
+    # =========================================================================
+    # Minimum number of seconds between two rebuilds of the coopetition bundle of a competition, submissions
+    # scored meanwhile get the previous bundle
+    COOPETITION_REBUILD_INTERVAL = 60
+
+    # =========================================================================
+    # Signed URLs
+    # =========================================================================
+    # Cached read-only URLs of immutable blobs (scoring programs, reference data...) remain valid for at least
+    # this many seconds when handed out
+    SIGNED_URL_CACHE_MARGIN = 6 * 60 * 60
+
+    # =========================================================================
+    # Bulk evaluations
+    # =========================================================================
+    # Re-runs and migrations of whole phases start this many evaluations every EVALUATION_DISPATCH_INTERVAL
+    # seconds, so they don't flood the site worker queue
+    EVALUATION_DISPATCH_CHUNK_SIZE = 50
+    EVALUATION_DISPATCH_INTERVAL = 30
+
     # =========================================================================
     # Misc
     # =========================================================================
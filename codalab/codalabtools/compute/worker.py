@@ -3,29 +3,37 @@
 Defines the worker process which handles computations.
 """
 import urllib
+import urlparse
 
+import base64
+import contextlib
+import errno
+import fcntl
+import hashlib
 import json
 import logging.config
 import os
 import platform
 import psutil
 import pwd
+import Queue
 import grp
-import signal
-import math
 import re
 import shutil
 import socket
 import sys
 import tempfile
+import threading
 import time
 import traceback
+import zipfile
 
 import requests
 import yaml
 
 from os.path import dirname, abspath, join
-from subprocess import Popen, call
+from multiprocessing.pool import ThreadPool
+from subprocess import CalledProcessError, Popen, call, check_output
 from zipfile import ZipFile
 
 from celery.app import app_or_default
@@ -36,7 +44,8 @@ from codalab import settings
 sys.path.append(dirname(dirname(dirname(abspath(__file__)))))
 
 from codalabtools import BaseConfig
-from apps.web.utils import docker_image_clean
+from apps.web.utils import docker_image_clean, parse_scores
+from apps.web.zipstream import ZipStreamWriter
 
 logger = logging.getLogger('codalabtools')
 
@@ -57,12 +66,167 @@ def _find_only_folder_with_metadata(path):
                 return folder
 
 
-def docker_get_size():
-    return os.popen("docker system df | awk -v x=4 'FNR == 2 {print $x}'").read().strip()
+# Seconds during which the disk usage of docker images measured by `docker system df` is reused
+DOCKER_DISK_USAGE_MAX_AGE = int(os.environ.get('DOCKER_DISK_USAGE_MAX_AGE', 300))
+# Records when the images were last used, shared by the worker processes of the host
+DOCKER_IMAGE_POOL_DIR = os.environ.get('DOCKER_IMAGE_POOL_DIR', '/tmp/codalab_image_pool')
 
+_docker_size = {'value': None, 'measured_at': 0}
 
-def docker_prune():
-    """Runs a prune on docker if our images take up more than what's defined in settings."""
+
+def docker_get_size(max_age=DOCKER_DISK_USAGE_MAX_AGE):
+    """
+    Returns the size of the docker images, like '1.5GB', measured at most max_age seconds ago.
+    """
+    if _docker_size['value'] is None or time.time() - _docker_size['measured_at'] > max_age:
+        _docker_size['value'] = os.popen("docker system df | awk -v x=4 'FNR == 2 {print $x}'").read().strip()
+        _docker_size['measured_at'] = time.time()
+    return _docker_size['value']
+
+
+def docker_invalidate_size():
+    """
+    Forgets the measured size of the docker images, after pulling or removing some.
+    """
+    _docker_size['value'] = None
+
+
+def _size_in_gb(size):
+    """
+    Converts a size printed by docker, like '512MB', to GB.
+    """
+    match = re.match(r'^(-?[0-9.]+)\s*([kKMGT]?B)$', size.strip())
+    if not match:
+        raise ValueError("Unknown size %r" % size)
+    units = {'B': 1e-9, 'kB': 1e-6, 'KB': 1e-6, 'MB': 1e-3, 'GB': 1, 'TB': 1e3}
+    return float(match.group(1)) * units[match.group(2)]
+
+
+class DockerImagePool(object):
+    """
+    Docker images used by the runs of this host, pulled ahead of the runs that need them and evicted in
+    least recently used order when they take too much disk space.
+
+    The last use of each image is kept in a json file under a flock, only images recorded there are ever
+    removed so the images of the services sharing the docker daemon are left alone.
+
+    path: Directory of the usage file.
+    """
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            try:
+                os.makedirs(path)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        self.usage_path = join(path, 'usage.json')
+
+    @contextlib.contextmanager
+    def _usage(self):
+        with open(join(self.path, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.usage_path) as f:
+                        usage = json.load(f)
+                except (IOError, ValueError):
+                    usage = {}
+                yield usage
+                with open(self.usage_path + '.tmp', 'w') as f:
+                    json.dump(usage, f)
+                os.rename(self.usage_path + '.tmp', self.usage_path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def touch(self, image):
+        """
+        Records that image is being used.
+        """
+        with self._usage() as usage:
+            usage[image] = time.time()
+
+    @staticmethod
+    def is_present(image):
+        with open(os.devnull, 'w') as devnull:
+            return call(['docker', 'image', 'inspect', image], stdout=devnull, stderr=devnull) == 0
+
+    def pull(self, image):
+        """
+        Pulls image unless it is already on the host.
+        """
+        try:
+            if self.is_present(image):
+                return
+            logger.info("DockerImagePool :: Pulling %s", image)
+            start = time.time()
+            if call(['docker', 'pull', image]) != 0:
+                logger.warning("DockerImagePool :: Failed to pull %s", image)
+                return
+            logger.info("DockerImagePool :: Pulled %s in %.2fs", image, time.time() - start)
+        except OSError:
+            logger.exception("DockerImagePool :: Failed to pull %s", image)
+            return
+        docker_invalidate_size()
+        # Counts as a use, so it is not evicted before the run it was pulled for
+        self.touch(image)
+
+    def pull_async(self, images):
+        """
+        Pulls images one after the other in a background thread.
+
+        Returns: The started thread.
+        """
+        def pull_all():
+            for image in images:
+                self.pull(image)
+
+        thread = threading.Thread(target=pull_all, name="docker-pull")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def evict(self, max_size_gb, keep=()):
+        """
+        Removes the least recently used images until docker takes less than max_size_gb, except the ones
+        in keep. Images still used by a container cannot be removed and are skipped.
+        """
+        with self._usage() as usage:
+            candidates = sorted((last_use, image) for image, last_use in usage.items() if image not in keep)
+        for _, image in candidates:
+            if _size_in_gb(docker_get_size()) <= max_size_gb:
+                break
+            logger.info("DockerImagePool :: Evicting %s", image)
+            try:
+                with open(os.devnull, 'w') as devnull:
+                    removed = call(['docker', 'rmi', image], stdout=devnull, stderr=devnull) == 0
+            except OSError:
+                logger.exception("DockerImagePool :: Failed to remove %s", image)
+                break
+            if removed or not self.is_present(image):
+                with self._usage() as usage:
+                    usage.pop(image, None)
+                docker_invalidate_size()
+
+
+_image_pool = None
+
+
+def get_image_pool():
+    """
+    Returns the docker image pool of this worker.
+    """
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = DockerImagePool(DOCKER_IMAGE_POOL_DIR)
+    return _image_pool
+
+
+def docker_prune(keep=()):
+    """
+    Runs a prune on docker if our images take up more than what's defined in settings, then evicts the least
+    recently used images, except the ones in keep, while they still do.
+    """
     # May also use docker system df --format "{{.Size}}"
     image_size = docker_get_size()
     image_size_measurement = image_size[-2:]
@@ -71,6 +235,8 @@ def docker_prune():
     if image_size > settings.DOCKER_MAX_SIZE_GB and image_size_measurement == "GB":
         logger.info("Pruning")
         os.system("docker system prune --force")
+        docker_invalidate_size()
+        get_image_pool().evict(settings.DOCKER_MAX_SIZE_GB, keep=keep)
 
 # class WorkerConfig(BaseConfig):
 #     """
@@ -92,7 +258,246 @@ def docker_prune():
 #         return self._winfo['local-root'] if 'local-root' in self._winfo else None
 
 
-def get_bundle(root_dir, relative_dir, url):
+# Number of bundles downloaded at the same time by get_bundle
+BUNDLE_FETCH_THREADS = int(os.environ.get('BUNDLE_FETCH_THREADS', 4))
+
+# Metadata keys which are not bundles to fetch
+NON_BUNDLE_METADATA_KEYS = ("description", "command", "exitCode", "elapsedTime", "stdout", "stderr", "submitted-by", "submitted-at")
+
+
+# Size limit of the local cache of extracted bundles, 0 disables it
+BUNDLE_CACHE_MAX_SIZE_MB = int(os.environ.get('BUNDLE_CACHE_MAX_SIZE_MB', 10 * 1024))
+# Kept outside of SUBMISSION_TEMP_DIR which is wiped before each run, but on the same file system
+# so the cached files can be hard linked into the run directories
+BUNDLE_CACHE_DIR = os.environ.get('BUNDLE_CACHE_DIR', '/tmp/codalab_bundle_cache')
+
+
+def _link_tree(source, destination):
+    """
+    Recreates the directories of source under destination and hard links the files, copying them
+    when source and destination are not on the same file system.
+    """
+    for dir_path, dir_names, file_names in os.walk(source):
+        target_dir = join(destination, os.path.relpath(dir_path, source))
+        if not os.path.exists(target_dir):
+            os.makedirs(target_dir)
+        os.chmod(target_dir, 0777)
+        for file_name in file_names:
+            try:
+                os.link(join(dir_path, file_name), join(target_dir, file_name))
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.copy2(join(dir_path, file_name), join(target_dir, file_name))
+
+
+def _tree_size(path):
+    size = 0
+    for dir_path, dir_names, file_names in os.walk(path):
+        for file_name in file_names:
+            size += os.path.getsize(join(dir_path, file_name))
+    return size
+
+
+class BundleCache(object):
+    """
+    Size bounded LRU cache of extracted bundles, like scoring programs and reference data which are
+    the same for every submission of a phase. It is shared by the runs and processes of a worker.
+
+    Each entry is a directory named after the hash of the blob name and its ETag (or content hash)
+    holding the extracted tree and its size, its modification time records its last use.
+
+    path: Directory of the cache.
+    max_size: Size limit of the cached trees, in bytes.
+    """
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        if not os.path.exists(path):
+            try:
+                os.makedirs(path)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    @staticmethod
+    def key(name, version):
+        """
+        Returns the key of a blob given its name and its ETag or content hash.
+        """
+        return hashlib.sha1("%s\n%s" % (name, version)).hexdigest()
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(join(self.path, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def link(self, key, bundle_path):
+        """
+        Links the cached tree of key to bundle_path.
+
+        Returns: True on a hit, False if key is not cached.
+        """
+        entry = join(self.path, key)
+        with self._lock():
+            if not os.path.isdir(entry):
+                return False
+            os.utime(entry, None)
+            _link_tree(join(entry, 'tree'), bundle_path)
+        return True
+
+    def staging_dir(self):
+        """
+        Returns a new directory, inside the cache so it can be renamed into an entry, where a tree
+        is prepared before being added with `add`.
+        """
+        return tempfile.mkdtemp(prefix='.staging-', dir=self.path)
+
+    def add(self, key, staging_dir):
+        """
+        Adds the tree found in staging_dir/tree to the cache, then evicts the least recently used
+        entries over the size limit.
+        """
+        tree = join(staging_dir, 'tree')
+        size = _tree_size(tree)
+        # Runs share the cached files, they must not be modified in place
+        for dir_path, dir_names, file_names in os.walk(tree):
+            for file_name in file_names:
+                file_path = join(dir_path, file_name)
+                os.chmod(file_path, os.stat(file_path).st_mode & 0555)
+        with open(join(staging_dir, 'size'), 'w') as f:
+            f.write(str(size))
+
+        entry = join(self.path, key)
+        with self._lock():
+            if os.path.isdir(entry):
+                # Added by another run in the meantime
+                shutil.rmtree(staging_dir, ignore_errors=True)
+            else:
+                os.rename(staging_dir, entry)
+            self._prune(keep=key)
+
+    def _prune(self, keep=None):
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.path):
+            entry = join(self.path, name)
+            if name.startswith('.') or not os.path.isdir(entry):
+                continue
+            try:
+                with open(join(entry, 'size')) as f:
+                    size = int(f.read())
+            except (IOError, ValueError):
+                size = _tree_size(entry)
+            entries.append((os.path.getmtime(entry), name, size))
+            total_size += size
+        for _, name, size in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if name == keep:
+                continue
+            logger.info("BundleCache :: Evicting %s (%s bytes)", name, size)
+            shutil.rmtree(join(self.path, name), ignore_errors=True)
+            total_size -= size
+
+
+_bundle_cache = None
+
+
+def get_bundle_cache():
+    """
+    Returns the bundle cache of this worker, or None if it is disabled.
+    """
+    global _bundle_cache
+    if _bundle_cache is None and BUNDLE_CACHE_MAX_SIZE_MB > 0:
+        _bundle_cache = BundleCache(BUNDLE_CACHE_DIR, BUNDLE_CACHE_MAX_SIZE_MB * 1024 * 1024)
+    return _bundle_cache
+
+
+def _extract_bundle(bundle_file_name, bundle_path):
+    """
+    Unzips a bundle to bundle_path, moving up the content of a single folder holding the metadata.
+    """
+    logger.info("get_bundle :: Unzipping %s" % bundle_file_name)
+    # Unzip file to relative dir, if a zip
+    with ZipFile(bundle_file_name, 'r') as z:
+        z.extractall(bundle_path)
+
+    # check if we just unzipped something containing a folder and nothing else
+    metadata_folder = _find_only_folder_with_metadata(bundle_path)
+    if metadata_folder:
+        logger.info("get_bundle :: Found a submission with an extra folder, unpacking and moving up a directory")
+        # Make a temp dir and copy data there
+        temp_folder_name = "%s%s" % (bundle_path, '_tmp')
+        shutil.copytree(metadata_folder, temp_folder_name)
+
+        # Delete old dir, move copied data back
+        shutil.rmtree(bundle_path, ignore_errors=True)
+        shutil.move(temp_folder_name, bundle_path)
+
+
+def _fetch_cached_bundle(cache, root_dir, url, bundle_path, file_ext):
+    """
+    Stages a zip bundle from the bundle cache, downloading and adding it to the cache on a miss.
+    The blob is identified by its ETag when the server sends one, otherwise by the hash of its content.
+
+    Returns: (cache key of the blob, True on a cache hit, download time, extraction time)
+    """
+    name = url.split('?')[0]
+    start = time.time()
+    response = urllib.urlopen(url)
+    try:
+        if getattr(response, 'code', 200) not in (None, 200):
+            raise IOError("Failed to download %s: HTTP %s" % (name, response.code))
+        etag = response.info().getheader('ETag')
+        if etag:
+            key = BundleCache.key(name, etag)
+            if cache.link(key, bundle_path):
+                return key, True, time.time() - start, 0
+
+        content_hash = hashlib.sha1()
+        bundle_file = tempfile.NamedTemporaryFile(prefix='tmp', suffix=file_ext, dir=root_dir, delete=False)
+        with bundle_file:
+            while True:
+                chunk = response.read(1024 * 1024)
+                if not chunk:
+                    break
+                content_hash.update(chunk)
+                bundle_file.write(chunk)
+    finally:
+        response.close()
+    downloaded = time.time()
+
+    key = BundleCache.key(name, etag or content_hash.hexdigest())
+    if not etag and cache.link(key, bundle_path):
+        return key, True, downloaded - start, time.time() - downloaded
+
+    staging_dir = cache.staging_dir()
+    try:
+        _extract_bundle(bundle_file.name, join(staging_dir, 'tree'))
+        cache.add(key, staging_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    if not cache.link(key, bundle_path):
+        # Evicted right away because it is larger than the whole cache
+        _extract_bundle(bundle_file.name, bundle_path)
+    return key, False, downloaded - start, time.time() - downloaded
+
+
+def _fetch_bundle(root_dir, relative_dir, url, cache=None):
+    """
+    Downloads a single bundle and extracts it to root_dir/relative_dir, without fetching the bundles
+    it references.
+
+    cache: Optional BundleCache holding the bundle if it is a zip.
+
+    Returns: (metadata of the bundle or None, {'download': seconds, 'extract': seconds}), the timing
+        also tells whether the bundle was a cache 'hit' or 'miss' and its cache 'key' when a cache is used.
+    """
     # get file name from /test.zip?signature=!@#a/df
     url_without_params = url.split('?')[0]
     file_name = url_without_params.split('/')[-1]
@@ -100,36 +505,32 @@ def get_bundle(root_dir, relative_dir, url):
 
     logger.debug("get_bundle :: Getting %s from %s" % (file_name, url))
 
-    # Save the bundle to a temp file
-    # file_download_path = os.path.join(root_dir, file_name)
-    bundle_file = tempfile.NamedTemporaryFile(prefix='tmp', suffix=file_ext, dir=root_dir, delete=False)
-    urllib.urlretrieve(url, bundle_file.name)
-
     # Extracting files or grabbing extras
     bundle_path = join(root_dir, relative_dir)
     metadata_path = join(bundle_path, 'metadata')
 
-    if file_ext == '.zip':
-        logger.info("get_bundle :: Unzipping %s" % bundle_file.name)
-        # Unzip file to relative dir, if a zip
-        with ZipFile(bundle_file.file, 'r') as z:
-            z.extractall(bundle_path)
-
-        # check if we just unzipped something containing a folder and nothing else
-        metadata_folder = _find_only_folder_with_metadata(bundle_path)
-        if metadata_folder:
-            logger.info("get_bundle :: Found a submission with an extra folder, unpacking and moving up a directory")
-            # Make a temp dir and copy data there
-            temp_folder_name = join(root_dir, "%s%s" % (relative_dir, '_tmp'))
-            shutil.copytree(metadata_folder, temp_folder_name)
-
-            # Delete old dir, move copied data back
-            shutil.rmtree(bundle_path, ignore_errors=True)
-            shutil.move(temp_folder_name, bundle_path)
+    timing = {}
+    if cache is not None and file_ext == '.zip':
+        timing['key'], hit, timing['download'], timing['extract'] = _fetch_cached_bundle(
+            cache, root_dir, url, bundle_path, file_ext
+        )
+        timing['cache'] = 'hit' if hit else 'miss'
     else:
-        # Otherwise we have some metadata type file, like run.txt containing other bundles to fetch.
-        os.mkdir(bundle_path)
-        shutil.copyfile(bundle_file.name, metadata_path)
+        # Save the bundle to a temp file
+        # file_download_path = os.path.join(root_dir, file_name)
+        start = time.time()
+        bundle_file = tempfile.NamedTemporaryFile(prefix='tmp', suffix=file_ext, dir=root_dir, delete=False)
+        urllib.urlretrieve(url, bundle_file.name)
+        downloaded = time.time()
+
+        if file_ext == '.zip':
+            _extract_bundle(bundle_file.name, bundle_path)
+        else:
+            # Otherwise we have some metadata type file, like run.txt containing other bundles to fetch.
+            os.mkdir(bundle_path)
+            shutil.copyfile(bundle_file.name, metadata_path)
+        timing['download'] = downloaded - start
+        timing['extract'] = time.time() - downloaded
 
     os.chmod(bundle_path, 0777)
 
@@ -139,15 +540,70 @@ def get_bundle(root_dir, relative_dir, url):
         with open(metadata_path) as mf:
             metadata = yaml.load(mf)
 
-    if isinstance(metadata, dict):
-        for (k, v) in metadata.items():
-            if k not in ("description", "command", "exitCode", "elapsedTime", "stdout", "stderr", "submitted-by", "submitted-at"):
-                if isinstance(v, str):
-                    logger.debug("get_bundle :: Fetching recursive bundle %s %s %s" % (bundle_path, k, v))
-                    # Here K is the relative directory and V is the url, like
-                    # input: http://test.com/goku?sas=123
-                    metadata[k] = get_bundle(bundle_path, k, v)
-    return metadata
+    logger.info("get_bundle :: Fetched %s in %.2fs (download %.2fs, extract %.2fs%s)",
+                bundle_path, timing['download'] + timing['extract'], timing['download'], timing['extract'],
+                ", cache %s" % timing['cache'] if 'cache' in timing else "")
+    return metadata, timing
+
+
+def get_bundle(root_dir, relative_dir, url, timings=None, threads=BUNDLE_FETCH_THREADS, cache=None, cached_bundles=()):
+    """
+    Fetches a bundle and, recursively, the bundles listed in its metadata. The bundles referenced by
+    the same metadata are downloaded concurrently, each one is extracted as soon as it arrives.
+
+    root_dir: Directory under which the bundle is staged.
+    relative_dir: Path of the bundle directory relative to root_dir.
+    url: URL of the bundle, a zip file or a metadata file.
+    timings: Optional dictionary filled with the download and extraction times of each bundle,
+        keyed by the path of the bundle relative to root_dir.
+    cache: Optional BundleCache.
+    cached_bundles: Paths relative to root_dir of the bundles to stage through the cache, like
+        'run/program'.
+
+    Returns: The metadata of the bundle, where the URL of each referenced bundle is replaced by
+        its own metadata.
+    """
+    if timings is None:
+        timings = {}
+    completed = Queue.Queue()
+    pool = ThreadPool(threads)
+
+    def fetch(parent_metadata, key, bundle_root, bundle_dir):
+        try:
+            bundle_cache = None
+            if os.path.relpath(join(bundle_root, bundle_dir), root_dir) in cached_bundles:
+                bundle_cache = cache
+            metadata, timing = _fetch_bundle(bundle_root, bundle_dir, parent_metadata[key], cache=bundle_cache)
+            completed.put((parent_metadata, key, join(bundle_root, bundle_dir), metadata, timing, None))
+        except Exception:
+            completed.put((parent_metadata, key, join(bundle_root, bundle_dir), None, None, traceback.format_exc()))
+
+    # The result is stored in a fake parent so the top bundle is fetched like the referenced ones
+    top = {relative_dir: url}
+    pending = 1
+    try:
+        pool.apply_async(fetch, (top, relative_dir, root_dir, relative_dir))
+        while pending > 0:
+            parent_metadata, key, bundle_path, metadata, timing, error = completed.get()
+            pending -= 1
+            if error is not None:
+                raise Exception("Failed to fetch bundle %s:\n%s" % (bundle_path, error))
+            parent_metadata[key] = metadata
+            timings[os.path.relpath(bundle_path, root_dir)] = timing
+
+            if isinstance(metadata, dict):
+                for (k, v) in metadata.items():
+                    if k not in NON_BUNDLE_METADATA_KEYS:
+                        if isinstance(v, str):
+                            logger.debug("get_bundle :: Fetching recursive bundle %s %s %s" % (bundle_path, k, v))
+                            # Here K is the relative directory and V is the url, like
+                            # input: http://test.com/goku?sas=123
+                            pool.apply_async(fetch, (metadata, k, bundle_path, k))
+                            pending += 1
+    finally:
+        # Stops the other downloads if one of them failed
+        pool.terminate()
+    return top[relative_dir]
 
 
 # def getBundle(root_path, blob_service, container, bundle_id, bundle_rel_path, max_depth=3):
@@ -265,23 +721,400 @@ def _send_update(task_id, status, secret, virtual_host='/', extra=None):
         update_submission.apply_async((task_id, task_args, secret), connection=new_connection)
 
 
+def read_scores(output_dir):
+    """
+    Returns the (key, value) pairs of the scores.txt written by a scoring program, or None when it is missing
+    or malformed, the site then looks for it in output.zip and reports the error.
+    """
+    try:
+        with open(join(output_dir, 'scores.txt')) as f:
+            return parse_scores(f.read())
+    except (IOError, ValueError):
+        logger.info("No scores parsed from %s", output_dir, exc_info=True)
+        return None
+
+
+def write_current_user(input_dir, input_metadata):
+    """
+    Adds current_user.txt, naming the submitter, to the coopetition bundle which the site shares between the
+    submissions of a competition.
+    """
+    coopetition_dir = join(input_dir, 'coopetition')
+    if input_metadata and 'submitted-by' in input_metadata and os.path.isdir(coopetition_dir):
+        with open(join(coopetition_dir, 'current_user.txt'), 'w') as f:
+            f.write(unicode(input_metadata['submitted-by']).encode('utf-8'))
+
+
+# Number of outputs uploaded at once at the end of a run
+UPLOAD_THREADS = int(os.environ.get('UPLOAD_THREADS', 4))
+# Size of the blocks of the archives uploaded to Azure blob storage
+UPLOAD_BLOCK_SIZE = int(os.environ.get('UPLOAD_BLOCK_SIZE_MB', 4)) * 1024 * 1024
+# Archives uploaded in a single request, for storages which need their size up front, are buffered in
+# memory up to this size and in a temp file above it
+UPLOAD_SPOOL_SIZE = int(os.environ.get('UPLOAD_SPOOL_SIZE_MB', 64)) * 1024 * 1024
+
+
+def _check_upload(response, url):
+    if not 200 <= response.status_code < 300:
+        logger.error("Upload to %s failed with status %s: %s", url.split('?')[0], response.status_code,
+                     response.text)
+    return response
+
+
 def put_blob(url, file_path):
     logger.info("Putting blob %s in %s" % (file_path, url))
-    requests.put(
-        url,
-        data=open(file_path, 'rb'),
-        headers={
-            'x-ms-blob-type': 'BlockBlob',
-        }
-    )
+    with open(file_path, 'rb') as f:
+        return _check_upload(requests.put(
+            url,
+            data=f,
+            headers={
+                'x-ms-blob-type': 'BlockBlob',
+            }
+        ), url)
 
 
-class ExecutionTimeLimitExceeded(Exception):
-    pass
+def _is_azure_blob_url(url):
+    return '.blob.core.' in urlparse.urlparse(url).netloc
 
 
-def alarm_handler(signum, frame):
-    raise ExecutionTimeLimitExceeded
+def _blocks(chunks, block_size):
+    """
+    Regroups an iterable of byte strings into blocks of block_size bytes, the last one may be smaller.
+    """
+    buffered = []
+    buffered_size = 0
+    for chunk in chunks:
+        buffered.append(chunk)
+        buffered_size += len(chunk)
+        while buffered_size >= block_size:
+            data = ''.join(buffered)
+            yield data[:block_size]
+            buffered = [data[block_size:]]
+            buffered_size = len(buffered[0])
+    if buffered_size:
+        yield ''.join(buffered)
+
+
+def put_blob_stream(url, chunks, block_size=UPLOAD_BLOCK_SIZE, spool_size=UPLOAD_SPOOL_SIZE):
+    """
+    Uploads the content given by an iterable of byte strings to a signed PUT url, as it is produced.
+
+    Azure blobs are uploaded block by block with Put Block then Put Block List. Other storages need the size
+    of the content in their single PUT, it is spooled first.
+    """
+    if _is_azure_blob_url(url):
+        block_ids = []
+        for block in _blocks(chunks, block_size):
+            block_id = base64.b64encode('%08d' % len(block_ids))
+            _check_upload(requests.put(url + '&comp=block&blockid=%s' % urllib.quote(block_id), data=block), url)
+            block_ids.append(block_id)
+        block_list = '<?xml version="1.0" encoding="utf-8"?><BlockList>%s</BlockList>' % ''.join(
+            '<Latest>%s</Latest>' % block_id for block_id in block_ids
+        )
+        return _check_upload(requests.put(url + '&comp=blocklist', data=block_list), url)
+
+    with tempfile.SpooledTemporaryFile(max_size=spool_size) as spool:
+        for chunk in chunks:
+            spool.write(chunk)
+        size = spool.tell()
+        spool.seek(0)
+        # In memory spools have no file descriptor to get their size from
+        data = spool.read() if size <= spool_size else spool
+        return _check_upload(requests.put(url, data=data, headers={'x-ms-blob-type': 'BlockBlob'}), url)
+
+
+def _read_chunks(file_path, chunk_size=1024 * 1024):
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            yield chunk
+
+
+def zip_directory(path, exclude=()):
+    """
+    Yields a deflated zip archive of the files under path, like shutil.make_archive, without writing it to
+    disk.
+
+    exclude: Paths relative to path of the directories left out of the archive.
+    """
+    writer = ZipStreamWriter(zipfile.ZIP_DEFLATED)
+    for dir_path, dir_names, file_names in os.walk(path):
+        dir_names[:] = sorted(name for name in dir_names
+                              if os.path.relpath(join(dir_path, name), path) not in exclude)
+        for file_name in sorted(file_names):
+            file_path = join(dir_path, file_name)
+            for data in writer.write_member(os.path.relpath(file_path, path), _read_chunks(file_path)):
+                yield data
+    for data in writer.close():
+        yield data
+
+
+def upload_outputs(uploads, threads=UPLOAD_THREADS):
+    """
+    Runs the given uploads concurrently and waits for all of them.
+
+    uploads: List of (function, arguments) calls doing an upload.
+    """
+    pool = ThreadPool(max(1, min(threads, len(uploads))))
+    try:
+        results = [pool.apply_async(function, arguments) for function, arguments in uploads]
+        for result in results:
+            result.get()
+    finally:
+        pool.terminate()
+
+
+class SupervisedProcess(object):
+    """
+    Child process whose exit is awaited by a background thread, so the run waits on its exit event
+    with a deadline instead of polling it, and without signals which are process wide: several
+    processes can be supervised at once from different threads.
+
+    process: The Popen object of the child.
+    """
+    def __init__(self, process):
+        self.process = process
+        self.exit_code = None
+        self.exited = threading.Event()
+        self._waiter = threading.Thread(target=self._wait, name="wait-%s" % process.pid)
+        self._waiter.daemon = True
+        self._waiter.start()
+
+    def _wait(self):
+        try:
+            self.exit_code = self.process.wait()
+        except OSError:
+            # Already reaped
+            self.exit_code = self.process.returncode
+        finally:
+            self.exited.set()
+
+    def wait(self, deadline=None):
+        """
+        Waits for the process to exit, until the given time.time() deadline if any.
+
+        Returns: The exit code, or None if the process is still running at the deadline.
+        """
+        timeout = None
+        if deadline is not None:
+            timeout = max(0, deadline - time.time())
+        if self.exited.wait(timeout):
+            return self.exit_code
+        return None
+
+    def kill(self):
+        """
+        Kills the process and waits for it to be reaped.
+        """
+        try:
+            self.process.kill()
+        except OSError:
+            pass  # exited in the meantime
+        self.exited.wait()
+
+
+# Number of runs executed at once by this worker, the celery concurrency of the compute worker must match it
+WORKER_SLOTS = int(os.environ.get('WORKER_SLOTS', 1))
+# CPUs and memory given to the containers of each slot, e.g. '2' and '4g'. They default to an even share of
+# the host when the worker has several slots, and to no limits otherwise.
+WORKER_SLOT_CPUS = os.environ.get('WORKER_SLOT_CPUS')
+WORKER_SLOT_MEMORY = os.environ.get('WORKER_SLOT_MEMORY')
+
+
+class ExecutionSlot(object):
+    """
+    Isolated place to execute a run: a temp root of its own, resource limits for its containers and an
+    exclusive lock, so the cleanup before a run only touches what the previous run of the same slot left.
+
+    index: Number of the slot on this host.
+    temp_dir: Directory holding the temp roots and locks of all the slots.
+    """
+    def __init__(self, index, temp_dir, cpus=None, memory=None):
+        self.index = index
+        self.temp_root = join(temp_dir, 'slot-%d' % index)
+        self.lock_path = join(temp_dir, 'slot-%d.lock' % index)
+        self.cpus = cpus
+        self.memory = memory
+        # Labels the containers of the slot, the docker daemon may be shared with other worker containers
+        self.label = 'codalab-slot=%s-%d' % (socket.gethostname(), index)
+        self._lock_file = None
+
+    def try_acquire(self, blocking=False):
+        """
+        Locks the slot, returns False if it is used by another run and blocking is False.
+        """
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError as e:
+            lock_file.close()
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                return False
+            raise
+        self._lock_file = lock_file
+        return True
+
+    def release(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def resource_args(self):
+        """
+        Returns the arguments of `docker run` limiting the resources of a container to the ones of the slot.
+        """
+        args = []
+        if self.cpus:
+            args += ['--cpus', str(self.cpus)]
+        if self.memory:
+            args += ['--memory', str(self.memory)]
+        return args
+
+    def docker_args(self):
+        """
+        Returns the arguments of `docker run` confining a container to the slot.
+        """
+        return ['--label', self.label] + self.resource_args()
+
+    def remove_containers(self):
+        """
+        Stops and removes the containers started in this slot.
+        """
+        try:
+            containers = check_output(['docker', 'ps', '--all', '--quiet', '--filter', 'label=%s' % self.label])
+            if containers.split():
+                call(['docker', 'rm', '--force'] + containers.split())
+        except (CalledProcessError, OSError):
+            logger.exception("Unable to remove the containers of slot %s", self.index)
+
+    def cleanup(self):
+        """
+        Removes what a previous run of this slot left behind: its containers, processes and files.
+        """
+        self.remove_containers()
+        if not os.path.exists(self.temp_root):
+            os.makedirs(self.temp_root)
+            return
+        # Kill running processes in the temp dir
+        try:
+            call(["fuser", "-k", self.temp_root])
+        except OSError:
+            pass
+        for the_file in os.listdir(self.temp_root):
+            file_path = os.path.join(self.temp_root, the_file)
+            if os.path.isdir(file_path) and not os.path.islink(file_path):
+                shutil.rmtree(file_path, ignore_errors=True)
+            else:
+                os.unlink(file_path)
+
+
+class WarmContainer(object):
+    """
+    Long lived container of a slot executing, with `docker exec`, the scoring program of the successive
+    submissions of a phase, so the container start is paid once per phase and slot instead of once per
+    submission.
+
+    The temp root of the slot is mounted in the container, the run directories created in it afterwards are
+    visible from the container. /tmp of the container is emptied before each submission and the container is
+    removed when a command is killed, the run directories are new for each submission.
+
+    slot: The ExecutionSlot running the container.
+    image: The docker image of the scoring program.
+    program_key: BundleCache key of the scoring program bundle, the container is replaced when it changes.
+    """
+    def __init__(self, slot, image, program_key):
+        self.slot = slot
+        self.image = image
+        key = hashlib.sha1("%s\n%s" % (image, program_key)).hexdigest()
+        # Slot containers are removed before each run, warm ones have a label of their own
+        self.label = 'codalab-warm-slot=%s-%d' % (socket.gethostname(), slot.index)
+        self.name = 'codalab-warm-%s-%d-%s' % (re.sub('[^a-zA-Z0-9_.-]', '', socket.gethostname()),
+                                               slot.index, key[:12])
+
+    def _is_running(self):
+        try:
+            with open(os.devnull, 'w') as devnull:
+                state = check_output(['docker', 'inspect', '--format', '{{.State.Running}}', self.name], stderr=devnull)
+        except CalledProcessError:
+            return False
+        return state.strip() == 'true'
+
+    def _remove_others(self):
+        containers = check_output(['docker', 'ps', '--all', '--quiet', '--filter', 'label=%s' % self.label]).split()
+        if containers:
+            call(['docker', 'rm', '--force'] + containers)
+
+    def start(self):
+        """
+        Starts the container, replacing the previous warm container of the slot, or resets the scratch
+        directories of the running one.
+
+        Returns: True if the container was already running.
+        """
+        if self._is_running():
+            logger.info("WarmContainer :: Reusing %s", self.name)
+            call(['docker', 'exec', self.name, 'sh', '-c', 'rm -rf /tmp/* /tmp/.[!.]* /tmp/..?*'])
+            return True
+        logger.info("WarmContainer :: Starting %s", self.name)
+        self._remove_others()
+        docker_cmd = [
+            'docker',
+            'run',
+            '--detach',
+            '--name', self.name,
+            '--label', self.label,
+            # Run directories are created in the temp root of the slot
+            '-v', '{0}:{0}'.format(self.slot.temp_root),
+        ]
+        docker_cmd += self.slot.resource_args()
+        docker_cmd += [self.image, 'tail', '-f', '/dev/null']
+        if call(docker_cmd) != 0:
+            raise Exception("Unable to start the scoring container %s" % self.name)
+        return False
+
+    def command(self, prog_cmd):
+        """
+        Returns the command executing prog_cmd in the container.
+        """
+        return ['docker', 'exec', self.name] + prog_cmd
+
+    def remove(self):
+        call(['docker', 'rm', '--force', self.name])
+
+
+def _slot_resources(slots):
+    """
+    Returns the (cpus, memory) limits of the containers of each slot.
+    """
+    cpus, memory = WORKER_SLOT_CPUS, WORKER_SLOT_MEMORY
+    if slots > 1:
+        if cpus is None:
+            cpus = "%.2f" % (float(psutil.cpu_count()) / slots)
+        if memory is None:
+            memory = "%db" % (psutil.virtual_memory().total // slots)
+    return cpus, memory
+
+
+def acquire_slot(temp_dir, slots=WORKER_SLOTS):
+    """
+    Locks a free execution slot of this host.
+
+    When all of them are taken, e.g. by the runs of another worker sharing temp_dir, waits for the slot
+    picked by the process id to be released.
+
+    Returns: The locked ExecutionSlot, to release once the run is done.
+    """
+    if not os.path.exists(temp_dir):
+        os.makedirs(temp_dir)
+    cpus, memory = _slot_resources(slots)
+    for index in range(slots):
+        slot = ExecutionSlot(index, temp_dir, cpus, memory)
+        if slot.try_acquire():
+            return slot
+    slot = ExecutionSlot(os.getpid() % slots, temp_dir, cpus, memory)
+    logger.info("All %d slots are busy, waiting for slot %d", slots, slot.index)
+    slot.try_acquire(blocking=True)
+    return slot
 
 
 def demote(user='workeruser'):
@@ -299,11 +1132,25 @@ def get_run_func():
     """
 
     def run(task_id, task_args):
+        """
+        Performs a Run in a free execution slot.
+
+        task_id: The tracking ID for this task.
+        task_args: The input arguments for this task:
+        """
+        slot = acquire_slot(os.environ.get('SUBMISSION_TEMP_DIR', '/tmp/codalab'))
+        try:
+            run_in_slot(task_id, task_args, slot)
+        finally:
+            slot.release()
+
+    def run_in_slot(task_id, task_args, slot):
         """
         Performs a Run.
 
         task_id: The tracking ID for this task.
         task_args: The input arguments for this task:
+        slot: The ExecutionSlot locked for this task.
         """
         logger.info("Entering run task; task_id=%s, task_args=%s", task_id, task_args)
         # run_id = task_args['bundle_id']
@@ -323,7 +1170,7 @@ def get_run_func():
         secret = task_args['secret']
         root_dir = None
         current_dir = os.getcwd()
-        temp_dir = os.environ.get('SUBMISSION_TEMP_DIR', '/tmp/codalab')
+        temp_dir = slot.temp_root
         # try:
         #     running_processes = subprocess.check_output(["fuser", temp_dir])
         # except:
@@ -341,24 +1188,27 @@ def get_run_func():
             "end_virtual_memory_usage": None,
             "end_swap_memory_usage": None,
             "end_cpu_usage": None,
+
+            # download and extraction times of each bundle, filled in once they are fetched
+            "bundle_timings": None,
+            # bundles staged from the local bundle cache and bundles downloaded into it
+            "bundle_cache_hits": None,
+            "bundle_cache_misses": None,
+            # whether the commands ran in a warm container kept from a previous submission of the phase
+            "warm_container_reused": None,
         }
 
-        docker_prune()
+        # Pull the image of this run and the ones of the queued submissions while the bundles are fetched
+        image_pool = get_image_pool()
+        image_pool.touch(sanitized_docker_image)
+        prefetch_docker_images = [docker_image_clean(image) for image in task_args.get('prefetch_docker_images', [])]
+        docker_prune(keep=[sanitized_docker_image] + prefetch_docker_images)
+        image_pull = image_pool.pull_async([sanitized_docker_image])
+        image_pool.pull_async([image for image in prefetch_docker_images if image != sanitized_docker_image])
 
         try:
-            # Cleanup dir in case any processes didn't clean up properly
-            for the_file in os.listdir(temp_dir):
-                file_path = os.path.join(temp_dir, the_file)
-                if os.path.isfile(file_path):
-                    os.unlink(file_path)
-                elif os.path.isdir(file_path):
-                    shutil.rmtree(file_path, ignore_errors=True)
-
-            # Kill running processes in the temp dir
-            try:
-                call(["fuser", "-k", temp_dir])
-            except:
-                pass
+            # Cleanup the slot in case any processes didn't clean up properly
+            slot.cleanup()
 
             _send_update(task_id, 'running', secret, extra={
                 'metadata': debug_metadata
@@ -370,12 +1220,25 @@ def get_run_func():
             logger.info("Fetching bundles...")
             start = time.time()
 
-            bundles = get_bundle(root_dir, 'run', bundle_url)
+            bundle_timings = {}
+            # Scoring programs and reference data, or the input data of prediction runs, are shared by
+            # the submissions of a phase
+            if is_predict_step:
+                cached_bundles = ('run/input',)
+            else:
+                cached_bundles = ('run/program', 'run/input/ref')
+            bundles = get_bundle(root_dir, 'run', bundle_url, timings=bundle_timings,
+                                 cache=get_bundle_cache(), cached_bundles=cached_bundles)
 
             logger.info("Metadata: %s" % bundles)
 
             end = time.time() - start
             logger.info("Fetched bundles in %s", end)
+            bundle_timings['total'] = end
+            debug_metadata['bundle_timings'] = json.dumps(bundle_timings)
+            cache_results = [timing.get('cache') for timing in bundle_timings.values() if isinstance(timing, dict)]
+            debug_metadata['bundle_cache_hits'] = cache_results.count('hit')
+            debug_metadata['bundle_cache_misses'] = cache_results.count('miss')
             # Verify we have an input folder: create one if it's not in the bundle.
             input_rel_path = 'input'
             if input_rel_path not in bundles:
@@ -383,6 +1246,8 @@ def get_run_func():
                 if os.path.exists(input_dir) == False:
                     os.mkdir(input_dir)
                     os.chmod(input_dir, 0777)
+            else:
+                write_current_user(join(root_dir, 'run', 'input'), bundles[input_rel_path])
             # Verify we have a program
             prog_rel_path = 'program'
             if prog_rel_path not in bundles:
@@ -431,6 +1296,17 @@ def get_run_func():
             stdout = open(stdout_file, "a+")
             stderr = open(stderr_file, "a+")
             prog_status = []
+            image_pull.join()
+
+            warm_container = None
+            if task_args.get('warm_container'):
+                # Named from the identity of the program blob, reading the staged program would cost more
+                program_key = bundle_timings.get('run/program', {}).get('key')
+                if program_key is None:
+                    logger.info("WarmContainer :: The program bundle was not cached, running it in a new container")
+                else:
+                    warm_container = WarmContainer(slot, sanitized_docker_image, program_key)
+                    debug_metadata['warm_container_reused'] = warm_container.start()
 
             for prog_cmd_counter, prog_cmd in enumerate(prog_cmd_list):
                 # Update command-line with the real paths
@@ -442,17 +1318,22 @@ def get_run_func():
                                     .replace("/", os.path.sep) \
                                     .replace("\\", os.path.sep)
                 prog_cmd = prog_cmd.split(' ')
-                docker_cmd = [
-                    'docker',
-                    'run',
-                    # Remove it after run,
-                    '--rm',
-                    # Set the right volume
-                    '-v', '{0}:{0}'.format(run_dir),
+                if warm_container is not None:
+                    prog_cmd = warm_container.command(prog_cmd)
+                else:
+                    docker_cmd = [
+                        'docker',
+                        'run',
+                        # Remove it after run,
+                        '--rm',
+                        # Set the right volume
+                        '-v', '{0}:{0}'.format(run_dir),
+                    ]
+                    # Confine it to the slot
+                    docker_cmd += slot.docker_args()
                     # Set the right image
-                    sanitized_docker_image,
-                ]
-                prog_cmd = docker_cmd + prog_cmd
+                    docker_cmd.append(sanitized_docker_image)
+                    prog_cmd = docker_cmd + prog_cmd
                 logger.info("Invoking program: %s", " ".join(prog_cmd))
 
                 startTime = time.time()
@@ -479,29 +1360,19 @@ def get_run_func():
 
                 logger.info("Started process, pid=%s" % evaluator_process.pid)
 
-                time_difference = time.time() - startTime
-                signal.signal(signal.SIGALRM, alarm_handler)
-                signal.alarm(int(math.fabs(math.ceil(execution_time_limit - time_difference))))
-
-                exit_code = None
-
-                logger.info("Checking process, exit_code = %s" % exit_code)
-
-                try:
-                    while exit_code == None:
-                        time.sleep(1)
-                        exit_code = evaluator_process.poll()
-                except (ValueError, OSError):
-                    pass  # tried to communicate with dead process
-                except ExecutionTimeLimitExceeded:
+                supervised_process = SupervisedProcess(evaluator_process)
+                exit_code = supervised_process.wait(deadline=startTime + execution_time_limit)
+                if exit_code is None:
                     exit_code = -1
                     logger.info("Killed process for running too long!")
                     stderr.write("Execution time limit exceeded!")
-                    evaluator_process.kill()
+                    supervised_process.kill()
+                    # Killing the docker client leaves the container running
+                    if warm_container is not None:
+                        warm_container.remove()
+                    slot.remove_containers()
                     timed_out = True
 
-                signal.alarm(0)
-
                 logger.info("Exit Code: %d", exit_code)
 
                 endTime = time.time()
@@ -527,35 +1398,31 @@ def get_run_func():
 
             logger.info("Saving output files")
 
-            put_blob(stdout_url, stdout_file)
-            put_blob(stderr_url, stderr_file)
+            uploads = [
+                (put_blob, (stdout_url, stdout_file)),
+                (put_blob, (stderr_url, stderr_file)),
+            ]
 
+            # Results are zipped while they are uploaded
             private_dir = join(output_dir, 'private')
             if os.path.exists(private_dir):
                 logger.info("Packing private results...")
-                private_output_file = join(root_dir, 'run', 'private_output.zip')
-                shutil.make_archive(os.path.splitext(private_output_file)[0], 'zip', output_dir)
-                put_blob(private_output_url, private_output_file)
-                shutil.rmtree(private_dir, ignore_errors=True)
+                uploads.append((put_blob_stream, (private_output_url, zip_directory(output_dir))))
 
-            # Pack results and send them to Blob storage
             logger.info("Packing results...")
-            output_file = join(root_dir, 'run', 'output.zip')
-            shutil.make_archive(os.path.splitext(output_file)[0], 'zip', output_dir)
-            put_blob(output_url, output_file)
+            uploads.append((put_blob_stream, (output_url, zip_directory(output_dir, exclude=('private',)))))
 
             # Check if the output folder contain an "html file" and copy the html file as detailed_results.html
             # traverse root directory, and list directories as dirs and files as files
-            html_found = False
             for root, dirs, files in os.walk(output_dir):
-                if not (html_found):
-                    path = root.split('/')
-                    for file in files:
-                        file_to_upload = os.path.join(root,file)
-                        file_ext = os.path.splitext(file_to_upload)[1]
-                        if file_ext.lower() ==".html":
-                            put_blob(detailed_results_url, file_to_upload)
-                            html_found = True
+                if root == output_dir and 'private' in dirs:
+                    dirs.remove('private')
+                html_files = [file for file in files if os.path.splitext(file)[1].lower() == ".html"]
+                if html_files:
+                    uploads.append((put_blob, (detailed_results_url, os.path.join(root, html_files[-1]))))
+                    break
+
+            upload_outputs(uploads)
 
             # Save extra metadata
             debug_metadata["end_virtual_memory_usage"] = json.dumps(psutil.virtual_memory()._asdict())
@@ -575,9 +1442,15 @@ def get_run_func():
                     'metadata': debug_metadata
                 })
             else:
-                _send_update(task_id, 'finished', secret, extra={
+                extra = {
                     'metadata': debug_metadata
-                })
+                }
+                if not is_predict_step:
+                    # Spares the site from downloading output.zip to read them
+                    scores = read_scores(output_dir)
+                    if scores is not None:
+                        extra['scores'] = scores
+                _send_update(task_id, 'finished', secret, extra=extra)
         except Exception:
             if debug_metadata['end_virtual_memory_usage'] == None:
                 # We didnt' make it far enough to save end metadata... so do it!